@@ -1,62 +1,359 @@
-import socket
-from fastapi import APIRouter, HTTPException
-from fastapi.concurrency import run_in_threadpool
-from pydantic import BaseModel
-
-from backend.app.services.network_monitor import (
-    discover_devices_once,
-    get_network_stats,
+import asyncio
+import hashlib
+import hmac
+import time
+from typing import Literal
+
+from fastapi import APIRouter, HTTPException, Query, Request, Response
+from fastapi.responses import StreamingResponse
+from pydantic import BaseModel, Field
+
+from backend.app.config import (
+    BULK_MAX_UPDATES,
+    COLLECTOR_MAX_BATCH_BYTES,
+    COLLECTOR_TOKEN,
+    PROFILE_MAX_SECONDS,
+    PROFILE_TRACE_HISTORY,
+    PROFILING_ENABLED,
+    PROFILING_TOKEN,
+)
+from backend.app.services import (
+    agent,
+    alert_rules,
+    bandwidth,
+    collector,
+    events,
+    export,
+    fingerprint,
+    profiling,
+    snapshot,
+    topology,
 )
+from backend.app.services.snapshot import render_json
+from backend.app.services.network_monitor import get_network_stats
+from backend.app.services.resolver import resolver as dns_resolver
 from backend.app.database import (
-    get_all_devices,
+    device_exists,
+    iter_alerts,
+    iter_devices,
     rename_device,
+    update_devices,
     get_alerts,
+    get_pool_stats,
+    get_device_uptime,
+    get_online_counts,
+    get_fingerprint,
+    get_fingerprints,
 )
 
 router = APIRouter()
 
-_local_ip = None
+def _etag_matches(request: Request, etag: str) -> bool:
+    header = request.headers.get("if-none-match")
+    if not header:
+        return False
+    tags = {t.strip().removeprefix("W/") for t in header.split(",")}
+    return "*" in tags or etag in tags
+
+
+def _json_response(request: Request, body: bytes, etag: str) -> Response:
+    """Serve pre-rendered JSON, or a bodiless 304 if the client already has it."""
+    headers = {"ETag": etag, "Cache-Control": "no-cache"}
+    if _etag_matches(request, etag):
+        return Response(status_code=304, headers=headers)
+    return Response(body, media_type="application/json", headers=headers)
+
+
+@router.get("/stats")
+async def fetch_stats(request: Request):
+    snap = snapshot.current()
+    body = render_json(get_network_stats(snap.devices))
+    return _json_response(request, body, f'"{hashlib.blake2b(body, digest_size=8).hexdigest()}"')
+
+
+@router.get("/topology")
+async def get_topology(request: Request):
+    """
+    Nodes (with stable x/y positions and subnet group), gateway links and
+    group clusters. The ETag only changes when the graph does.
+    """
+    body, etag = topology.current().body()
+    return _json_response(request, body, etag)
+
+
+@router.get("/topology/diff")
+async def get_topology_diff(since: str):
+    """
+    Nodes and links added, changed or removed since version ``since``.
+    If that version is unknown (too old, or from before a restart) the
+    full graph is returned instead, flagged with ``reset``.
+    """
+    model = topology.current()
+    diff = model.diff(since)
+    if diff is None:
+        return {**model.full(), "reset": True}
+    return diff
+
+
+@router.get("/debug/devices")
+async def get_all_devices_debug(request: Request):
+    snap = snapshot.current()
+    return _json_response(request, snap.derive("devices", lambda devices: devices.to_json()), snap.etag)
+
+
+@router.get("/events")
+async def stream_events(request: Request, since: str | None = None):
+    """
+    Server-Sent Events stream of per-sweep deltas. Reconnecting clients
+    resume from ``Last-Event-ID`` (or ``?since=``); if that point has
+    aged out of the buffer they get a ``reset`` event with full state.
+    """
+    last_id = since or request.headers.get("last-event-id")
+    return StreamingResponse(
+        events.stream(last_id, request.is_disconnected),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+@router.get("/debug/scan")
+async def get_scan_metrics(request: Request):
+    leader = getattr(request.app.state, "scanner", None)
+    if leader is None or leader.engine is None:
+        raise HTTPException(503, "Scan engine not running in this process")
+    return leader.engine.metrics()
+
+
+@router.get("/debug/scanner")
+async def get_scanner_role(request: Request):
+    leader = getattr(request.app.state, "scanner", None)
+    if leader is None:
+        raise HTTPException(503, "Scanner coordination not running")
+    return await asyncio.to_thread(leader.metrics)
+
+
+@router.get("/debug/sniffer")
+async def get_sniffer_metrics(request: Request):
+    leader = getattr(request.app.state, "scanner", None)
+    if leader is None or leader.sniffer is None:
+        raise HTTPException(503, "Passive sniffer not running in this process")
+    return leader.sniffer.metrics()
+
+
+@router.get("/debug/alert-rules")
+async def get_alert_rules_state():
+    """Devices pending offline or muted as flapping, and the rate limiter (scanner process only)."""
+    return alert_rules.rules.state()
+
+
+@router.get("/debug/fingerprint")
+async def get_fingerprint_stats():
+    """Probe counts and the last run's rate (scanner process only)."""
+    return fingerprint.fingerprinter.metrics()
+
+
+@router.get("/debug/agent")
+async def get_agent_stats():
+    """Spool depth and push results of this site's agent (scanner process only)."""
+    return agent.agent.metrics()
+
+
+@router.get("/debug/collector")
+async def get_collector_stats():
+    return collector.collector.metrics()
+
+
+def _require_profiling(request: Request):
+    if not PROFILING_ENABLED:
+        raise HTTPException(403, "Profiling is disabled")
+    if PROFILING_TOKEN and not hmac.compare_digest(request.headers.get("authorization", ""),
+                                                   f"Bearer {PROFILING_TOKEN}"):
+        raise HTTPException(401, "Bad profiling token")
+
+
+def _download(body, media_type: str, name: str) -> Response:
+    return Response(body, media_type=media_type, headers={"Content-Disposition": f'attachment; filename="{name}"'})
+
 
+@router.post("/debug/profile/trace")
+async def arm_sweep_trace(request: Request, cycles: int = Query(1, ge=0, le=PROFILE_TRACE_HISTORY),
+                          kind: list[Literal["full", "liveness", "priority", "passive"]] = Query(None)):
+    """Record a span trace of the next ``cycles`` scan cycles (of the given kinds); 0 cancels."""
+    _require_profiling(request)
+    leader = getattr(request.app.state, "scanner", None)
+    if leader is None or leader.engine is None:
+        raise HTTPException(503, "Scan engine not running in this process")
+    profiling.tracer.arm(cycles, kind)
+    return profiling.tracer.state()
 
-def set_local_ip():
-    global _local_ip
-    s = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+
+@router.get("/debug/profile/traces")
+async def list_sweep_traces(request: Request):
+    _require_profiling(request)
+    return profiling.tracer.state()
+
+
+@router.get("/debug/profile/traces/{id}")
+async def get_sweep_trace(request: Request, id: int, format: Literal["json", "chrome", "folded"] = "json"):
+    """One recorded trace: spans as JSON, Trace Event Format (Perfetto) or collapsed stacks (flamegraphs)."""
+    _require_profiling(request)
+    trace = profiling.tracer.get(id)
+    if trace is None:
+        raise HTTPException(404, "No such trace (only the last few are kept)")
+    if format == "folded":
+        return _download(trace.folded(), "text/plain", f"sweep-{id}.folded")
+    body = render_json(trace.chrome() if format == "chrome" else trace.to_dict())
+    return _download(body, "application/json", f"sweep-{id}{'.trace' if format == 'chrome' else ''}.json")
+
+
+@router.post("/debug/profile/cpu")
+async def profile_cpu(request: Request, seconds: float = Query(10, gt=0, le=PROFILE_MAX_SECONDS),
+                      format: Literal["json", "folded"] = "json"):
+    """Sample every thread's stack for ``seconds``; collapsed stacks feed flamegraph.pl or speedscope."""
+    _require_profiling(request)
     try:
-        s.connect(("8.8.8.8", 80))
-        _local_ip = s.getsockname()[0]
-    finally:
-        s.close()
+        profile = await asyncio.to_thread(profiling.sample_stacks, seconds)
+    except profiling.Busy as e:
+        raise HTTPException(409, str(e))
+    if format == "folded":
+        return _download(profiling.folded(profile), "text/plain", "cpu.folded")
+    return profile
 
 
-def get_local_ip() -> str:
-    s = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+@router.post("/debug/profile/memory")
+async def profile_memory(request: Request, seconds: float = Query(10, gt=0, le=PROFILE_MAX_SECONDS),
+                         top: int = Query(25, ge=1, le=500)):
+    """Allocations made and still held over ``seconds``, by source line (tracemalloc)."""
+    _require_profiling(request)
     try:
-        s.connect(("8.8.8.8", 80))
-        return s.getsockname()[0]
-    finally:
-        s.close()
+        return await asyncio.to_thread(profiling.trace_allocations, seconds, top)
+    except profiling.Busy as e:
+        raise HTTPException(409, str(e))
 
 
-@router.get("/stats")
-def fetch_stats():
-    devices = discover_devices_once()
-    return get_network_stats(devices)
+@router.get("/debug/dns")
+async def get_dns_stats():
+    return dns_resolver.stats()
 
 
-@router.get("/topology")
-async def get_topology():
-    devices = await run_in_threadpool(discover_devices_once)
-    return generate_topology(devices, _local_ip)
+@router.get("/debug/db")
+async def get_db_pool_stats():
+    return get_pool_stats()
 
 
-@router.get("/debug/devices")
-async def get_all_devices_debug():
-    return get_all_devices()
+def _time_range(start: float | None, end: float | None, default: float) -> tuple[float, float]:
+    end = time.time() if end is None else end
+    start = end - default if start is None else start
+    if start >= end:
+        raise HTTPException(400, "start must be before end")
+    return start, end
+
+
+@router.get("/history/devices/{mac}/uptime")
+async def device_uptime(mac: str, start: float | None = None, end: float | None = None):
+    """Online time of one device between unix timestamps (default: last 24h)."""
+    start, end = _time_range(start, end, 86400)
+    return await asyncio.to_thread(get_device_uptime, mac.lower(), start, end)
+
+
+@router.get("/bandwidth")
+async def bandwidth_summary():
+    """Current rate, moving averages and peaks per interface ("total" excludes loopback)."""
+    return {nic: bandwidth.sampler.summary(nic) for nic in bandwidth.sampler.interfaces()}
+
+
+@router.get("/bandwidth/history")
+async def bandwidth_history(request: Request, interface: str = bandwidth.TOTAL,
+                            seconds: int = Query(300, ge=1), step: int = Query(1, ge=1, le=3600)):
+    """Rate series for plotting: the last ``seconds``, averaged over ``step`` samples."""
+    rendered = bandwidth.sampler.history_json(interface, seconds, step)
+    if rendered is None:
+        raise HTTPException(404, "No samples for that interface")
+    return _json_response(request, *rendered)
+
+
+@router.get("/history/online")
+async def online_history(start: float | None = None, end: float | None = None,
+                         resolution: Literal["minute", "hour", "day"] | None = None):
+    """Online-device count over time (default: last 24h, resolution picked from the range)."""
+    start, end = _time_range(start, end, 86400)
+    return await asyncio.to_thread(get_online_counts, start, end, resolution)
 
 
 @router.get("/alerts")
-async def api_get_alerts():
-    return get_alerts()
+async def api_get_alerts(
+    response: Response,
+    limit: int = Query(500, ge=1, le=1000),
+    before_id: int | None = None,
+    since_id: int | None = None,
+    type: str | None = None,
+    mac: str | None = None,
+    start: float | None = None,
+    end: float | None = None,
+):
+    """
+    Alerts newest first, one page at a time. When there are more, the
+    ``X-Next-Cursor`` header holds the ``before_id`` for the next page.
+    """
+    rows = await asyncio.to_thread(
+        get_alerts, limit + 1, before_id, since_id, type, mac and mac.lower(), start, end
+    )
+    if len(rows) > limit:
+        rows = rows[:limit]
+        response.headers["X-Next-Cursor"] = str(rows[-1]["id"])
+    return rows
+
+
+@router.get("/fingerprints")
+async def api_get_fingerprints():
+    """Open ports, banners, discovered names and OS guess of every probed device."""
+    return list((await asyncio.to_thread(get_fingerprints)).values())
+
+
+@router.get("/devices/{mac}/fingerprint")
+async def api_get_fingerprint(mac: str):
+    fp = await asyncio.to_thread(get_fingerprint, mac.lower())
+    if fp is None:
+        raise HTTPException(404, "Device has not been fingerprinted")
+    return fp
+
+
+@router.post("/collector/ingest")
+async def collector_ingest(request: Request):
+    """
+    Deltas pushed by a site agent: gzip-compressed NDJSON, oldest first.
+    Answers with the last sequence number applied and whether the agent
+    must send a full copy of its site next.
+    """
+    if not collector.collector.running:
+        raise HTTPException(503, "This instance is not a collector")
+    if not COLLECTOR_TOKEN or not hmac.compare_digest(request.headers.get("authorization", ""),
+                                                       f"Bearer {COLLECTOR_TOKEN}"):
+        raise HTTPException(401, "Bad collector token")
+    try:
+        declared = int(request.headers.get("content-length") or 0)
+    except ValueError:
+        raise HTTPException(400, "Bad Content-Length")
+    if declared > COLLECTOR_MAX_BATCH_BYTES:
+        raise HTTPException(413, "Push too large")
+    # the header is missing from chunked requests: count what actually arrives
+    body = bytearray()
+    async for chunk in request.stream():
+        body += chunk
+        if len(body) > COLLECTOR_MAX_BATCH_BYTES:
+            raise HTTPException(413, "Push too large")
+    body = bytes(body)
+    try:
+        deltas = await asyncio.to_thread(collector.decode_batch, body)
+        return await asyncio.to_thread(collector.collector.ingest, deltas)
+    except (ValueError, KeyError, TypeError) as e:
+        raise HTTPException(400, f"Malformed push: {e}")
+
+
+@router.get("/sites")
+async def api_get_sites():
+    """Sites reporting to this collector: agent, last sequence number and contact, device counts."""
+    return collector.collector.sites()
 
 
 class RenameRequest(BaseModel):
@@ -65,26 +362,63 @@ class RenameRequest(BaseModel):
 
 @router.put("/devices/{mac}/rename", response_model=dict)
 async def api_rename_device(mac: str, req: RenameRequest):
-    devices = get_all_devices()
-    if not any(d["mac"].lower() == mac.lower() for d in devices):
+    if not await asyncio.to_thread(device_exists, mac.lower()):
         raise HTTPException(404, "Device not found")
-    rename_device(mac.lower(), req.name or "")
+    await asyncio.to_thread(rename_device, mac.lower(), req.name or "")
+    await asyncio.to_thread(snapshot.refresh)
     return {"mac": mac.lower(), "name": req.name}
 
 
-def generate_topology(devices, local_ip):
-    nodes = [
-        {
-            "id":       d["ip"],
-            "label":    d["name"] or d.get("hostname") or d["ip"],
-            "online":   bool(d["online"]),
-            "mac":      d["mac"],
-            "hostname": d.get("hostname"),
-            "vendor":   d.get("vendor"),
-            "is_gateway": (d["ip"] == local_ip),
-        }
-        for d in devices
-    ]
-
-    links = [{"source": local_ip, "target": d["ip"]} for d in devices]
-    return {"nodes": nodes, "links": links}
+class DeviceUpdate(BaseModel):
+    mac: str
+    name: str | None = None
+    notes: str | None = None
+    tags: list[str] | None = None
+    add_tags: list[str] = []
+    remove_tags: list[str] = []
+
+
+class BulkUpdateRequest(BaseModel):
+    updates: list[DeviceUpdate] = Field(min_length=1, max_length=BULK_MAX_UPDATES)
+
+
+@router.post("/devices/bulk")
+async def api_bulk_update(req: BulkUpdateRequest):
+    """
+    Rename, tag and annotate many devices in one transaction. Only the
+    fields given are changed; ``tags`` replaces, ``add_tags`` and
+    ``remove_tags`` edit. If any MAC is unknown nothing is applied.
+    """
+    updates = [{**u.model_dump(exclude_unset=True), "mac": u.mac.lower()} for u in req.updates]
+    missing = await asyncio.to_thread(update_devices, updates)
+    if missing:
+        raise HTTPException(404, {"message": "Devices not found", "missing": missing})
+    await asyncio.to_thread(snapshot.refresh)
+    return {"updated": len({u["mac"] for u in updates})}
+
+
+def _export(chunks, format: str, name: str) -> StreamingResponse:
+    return StreamingResponse(
+        chunks,
+        media_type=export.MEDIA_TYPES[format],
+        headers={"Content-Disposition": f'attachment; filename="{name}.{format}"'},
+    )
+
+
+@router.get("/export/devices")
+async def export_devices(format: Literal["ndjson", "csv"] = "ndjson"):
+    """Every device, streamed straight from the DB."""
+    return _export(export.devices(iter_devices(), format), format, "devices")
+
+
+@router.get("/export/alerts")
+async def export_alerts(
+    format: Literal["ndjson", "csv"] = "ndjson",
+    type: str | None = None,
+    mac: str | None = None,
+    start: float | None = None,
+    end: float | None = None,
+):
+    """Alert history newest first, streamed straight from the DB."""
+    rows = iter_alerts(type, mac and mac.lower(), start, end)
+    return _export(export.alerts(rows, format), format, "alerts")
@@ -1,3 +1,126 @@
 # backend/app/config.py
 
 SYNC_INTERVAL_SECONDS = 10  # Universal sync time
+
+# Scan scheduling: slow full sweeps, fast targeted checks in between
+FULL_SWEEP_INTERVAL_SECONDS = 300  # broadcast discovery of the whole subnet
+LIVENESS_INTERVAL_SECONDS = SYNC_INTERVAL_SECONDS  # unicast ARP to known-online devices
+LIVENESS_RETRIES = 1
+PRIORITY_INTERVAL_SECONDS = 3  # recheck flapping / recently changed devices
+FLAP_WINDOW_SECONDS = 300
+FLAP_THRESHOLD = 3  # state changes within the window that count as flapping
+RECENT_CHANGE_SECONDS = 60
+
+# Multi-worker deployments: one process scans, the others serve its snapshots
+SCANNER_EMBEDDED = True  # API processes contend to run the scanner; False = run `python -m backend.app.scanner`
+SCANNER_LEASE_SECONDS = 30  # a scanner that has not renewed its lease for this long is replaced
+SNAPSHOT_PATH = None  # file the scanner shares each snapshot through; None = next to the DB
+SNAPSHOT_POLL_SECONDS = 1.0  # how often other processes stat() it for changes
+
+# Multi-site: agents scan their own segment and ship per-sweep deltas to one collector
+COLLECTOR_ENABLED = False  # this instance stores and serves the agents' sites instead of scanning
+COLLECTOR_URL = None  # agents: e.g. "http://netview-hq:8000"
+COLLECTOR_TOKEN = None  # shared secret agents send and the collector requires; a collector will not start without it
+COLLECTOR_PUBLISH_SECONDS = 2.0  # ingested deltas are folded into the served snapshot at most this often
+COLLECTOR_MAX_BATCH_BYTES = 16 * 1024 * 1024  # size of one push, as sent and decompressed
+SITE_NAME = None  # agents: the name this site's devices are filed under at the collector
+AGENT_SPOOL_DIR = None  # deltas waiting for the collector; None = "spool" next to the DB
+AGENT_SPOOL_MAX_BYTES = 64 * 1024 * 1024  # beyond this the queue is dropped and a full resync sent
+AGENT_PUSH_SECONDS = 2.0
+AGENT_BATCH_MAX = 500  # deltas per push
+AGENT_HEARTBEAT_SECONDS = 30  # an unchanged sweep is still reported this often
+AGENT_RETRY_MAX_SECONDS = 60  # backoff cap while the collector is unreachable
+AGENT_TIMEOUT = 10  # seconds per push
+
+DB_READERS = 4  # Read-only SQLite connections kept open for API requests
+BULK_MAX_UPDATES = 10_000  # device edits accepted in one /api/devices/bulk request
+PRUNE_INTERVAL_SECONDS = 3600  # how often old history/alerts are deleted
+
+# Alert rules, applied in memory to each cycle's state changes
+ALERT_OFFLINE_AFTER_MISSES = 3  # consecutive missed checks before "went offline" is raised
+ALERT_FLAP_WINDOW_SECONDS = FLAP_WINDOW_SECONDS
+ALERT_FLAP_THRESHOLD = 4  # state changes within the window that mute a device as flapping
+ALERT_COALESCE_THRESHOLD = 5  # more alerts of one type in one cycle become a single summary
+ALERT_RATE_PER_MINUTE = 30
+ALERT_RATE_BURST = 30
+ALERT_MUTED_TYPES = set()  # e.g. {"new_device"}
+
+# Alerts retention (applied by the background prune, not on insert)
+ALERT_RETENTION_DAYS = 30
+ALERT_MAX_ROWS = 100_000
+
+# Device history (presence intervals + online-count roll-ups)
+HISTORY_RETENTION_DAYS = 365  # closed presence intervals
+HISTORY_ROLLUP_RETENTION_DAYS = {"minute": 7, "hour": 90, "day": 5 * 365}
+
+# Background latency prober (feeds /api/stats)
+LATENCY_TARGETS = ["8.8.8.8"]
+LATENCY_INTERVAL_SECONDS = 5
+LATENCY_TIMEOUT_SECONDS = 2
+LATENCY_WINDOW = 60  # samples kept per target
+
+# Background throughput sampler (feeds /api/stats and /api/bandwidth)
+BANDWIDTH_INTERVAL_SECONDS = 1.0
+BANDWIDTH_HISTORY = 3600  # samples kept per interface
+BANDWIDTH_AVERAGES = (10, 60, 300)  # moving-average windows, seconds
+BANDWIDTH_LOW_TRAFFIC_BPS = 100  # below this (bytes/s over a minute, both ways) health drops
+
+# Vendor lookups: offline OUI index first, api.macvendors.com only for misses
+VENDOR_REMOTE_LOOKUP = True
+VENDOR_REMOTE_RATE = 1.0  # requests/second (macvendors.com free tier)
+VENDOR_REMOTE_BURST = 5
+VENDOR_REMOTE_TIMEOUT = 2  # seconds
+VENDOR_CACHE_TTL = 30 * 24 * 3600  # seconds
+VENDOR_NEGATIVE_TTL = 24 * 3600  # seconds
+
+# Topology model served by /api/topology
+TOPOLOGY_GROUP_PREFIX = 24  # devices are clustered by subnet of this size
+TOPOLOGY_HISTORY = 64  # versions of node/link changes kept for /api/topology/diff
+
+# Reverse-DNS resolver cache
+DNS_CACHE_SIZE = 4096  # entries
+DNS_CACHE_TTL = 3600  # seconds a resolved hostname is reused
+DNS_NEGATIVE_TTL = 300  # seconds a missing PTR record/timeout is remembered
+DNS_TIMEOUT = 2  # seconds per query
+DNS_CONCURRENCY = 32
+
+# ARP sweep planning
+SCAN_INTERFACES = []  # interface names to sweep; empty = every up IPv4 interface
+SCAN_SUBNETS = []  # explicit CIDRs ("10.0.0.0/22" or "eth1=10.0.0.0/22"); overrides interfaces
+SCAN_MAX_PREFIX = 16  # never sweep anything larger than a /16 per interface
+SCAN_CHUNK_PREFIX = 25  # broadcast /25 (128 hosts) at a time
+SCAN_PARALLEL_CHUNKS = 4
+SCAN_RATE_PPS = 1000  # ARP requests per second across all chunks
+SCAN_TIMEOUT_MIN = 0.5  # seconds; the timeout adapts to observed reply times
+SCAN_TIMEOUT_MAX = 3.0
+SCAN_MAX_RETRIES = 2
+
+# Passive discovery: watch ARP/DHCP traffic instead of (or alongside) sweeping
+SNIFF_ENABLED = False
+SNIFF_INTERFACE = None  # None = scapy's default interface
+SNIFF_PCAP = None  # read from a capture file instead of a live interface
+SNIFF_QUEUE_SIZE = 10_000  # packets buffered for the writer; more are dropped
+SNIFF_BATCH_SIZE = 500  # observations per DB transaction
+SNIFF_FLUSH_SECONDS = 0.5  # max delay before a sighting is handed to the scan engine
+SNIFF_PUBLISH_SECONDS = 5.0  # sightings between sweeps are written and published at most this often
+
+# Service fingerprinting: TCP/banner/name probes of discovered devices, after full sweeps
+FINGERPRINT_ENABLED = False
+FINGERPRINT_PORTS = (21, 22, 23, 25, 53, 80, 110, 139, 143, 443, 445, 548, 554, 631, 1883, 3389,
+                     5000, 8008, 8080, 8443, 9100, 62078)
+FINGERPRINT_NAME_QUERIES = ("mdns", "netbios", "ssdp")  # UDP name queries sent to each device
+FINGERPRINT_CONCURRENCY = 512  # probes in flight across all devices
+FINGERPRINT_PER_HOST = 8  # probes in flight to any one device
+FINGERPRINT_RATE_PPS = 1000  # probes started per second
+FINGERPRINT_TIMEOUT = 1.0  # seconds per connect / name query
+FINGERPRINT_BANNER_TIMEOUT = 1.0  # seconds to wait for a banner once connected
+FINGERPRINT_BANNER_BYTES = 256
+FINGERPRINT_TTL = 24 * 3600  # seconds before a device is probed again (sooner if its IP changes)
+
+# Profiling (admin routes under /api/debug/profile); sweep tracing only runs when requested
+PROFILING_ENABLED = False  # off = the routes answer 403; they can read code paths and load the server
+PROFILING_TOKEN = None  # if set, the routes require "Authorization: Bearer <token>"
+PROFILE_TRACE_HISTORY = 8  # sweep traces kept for download
+PROFILE_MAX_SPANS = 50_000  # per trace; later spans are counted, not kept
+PROFILE_MAX_SECONDS = 120  # longest CPU/memory profiling window
+PROFILE_SAMPLE_INTERVAL = 0.005  # seconds between CPU profile samples
@@ -2,35 +2,192 @@
 
 import sqlite3
 import datetime
+import json
 import os
+import pathlib
+import queue
+import secrets
+import threading
+import time
+from contextlib import closing, contextmanager
+
+from backend.app import history
+from backend.app.metrics import DB_SECONDS
+from backend.app.registry import DeviceRegistry
+from backend.app.tracing import span, traced
+from backend.app.config import (
+    DB_READERS,
+    HISTORY_RETENTION_DAYS,
+    HISTORY_ROLLUP_RETENTION_DAYS,
+    ALERT_RETENTION_DAYS,
+    ALERT_MAX_ROWS,
+)
 
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
 DB_PATH = os.path.join(BASE_DIR, "devices.db")
 
 
-def _get_conn():
+# Tuned once per connection at open time
+_PRAGMAS = (
+    "PRAGMA busy_timeout = 5000;",
+    "PRAGMA synchronous = NORMAL;",       # safe with WAL, one fsync per checkpoint
+    "PRAGMA mmap_size = 268435456;",      # 256 MiB memory-mapped reads
+    "PRAGMA cache_size = -16000;",        # 16 MiB page cache
+    "PRAGMA temp_store = MEMORY;",
+)
+
+
+def _connect(path, read_only=False):
     """
-    Create a SQLite connection with:
-     - WAL journal mode (better concurrent reads/writes)
+    Open a SQLite connection with:
      - busy timeout of 5s before “database is locked” error
-     - thread‐safety disabled check so you can share across threads
+     - thread‐safety disabled check so the pool can hand it across threads
+     - the pool PRAGMAs above; readers are also opened ``mode=ro``
     """
     conn = sqlite3.connect(
-        DB_PATH,
+        f"{pathlib.Path(path).resolve().as_uri()}?mode=ro" if read_only else path,
         timeout=5.0,
         check_same_thread=False,
         detect_types=sqlite3.PARSE_DECLTYPES | sqlite3.PARSE_COLNAMES,
+        uri=read_only,
     )
-    # ensure our busy timeout
-    conn.execute("PRAGMA busy_timeout = 5000;")
-    # ensure WAL journaling
-    conn.execute("PRAGMA journal_mode = WAL;")
+    for pragma in _PRAGMAS:
+        conn.execute(pragma)
+    if read_only:
+        conn.execute("PRAGMA query_only = 1;")
+    else:
+        # ensure WAL journaling so readers never block the writer
+        conn.execute("PRAGMA journal_mode = WAL;")
     return conn
 
 
+class PoolExhausted(RuntimeError):
+    """No reader connection came free in time; the API answers 503."""
+
+
+class ConnectionPool:
+    """
+    One long-lived writer connection (serialised by a lock) plus up to
+    ``max_readers`` read-only connections handed out through a queue.
+    """
+
+    def __init__(self, path, max_readers=DB_READERS, reader_timeout=5.0):
+        self.path = path
+        self.max_readers = max_readers
+        self.reader_timeout = reader_timeout
+        self._writer = _connect(path)
+        self._write_lock = threading.Lock()
+        self._readers = queue.LifoQueue()
+        self._opened = 0
+        self._open_lock = threading.Lock()
+        self._stats = {
+            "writer_checkouts": 0,
+            "writer_wait_seconds": 0.0,
+            "reader_checkouts": 0,
+            "reader_waits": 0,
+            "reader_timeouts": 0,
+        }
+
+    @contextmanager
+    def writer(self):
+        """Check out the writer; the block runs as one transaction."""
+        start = time.perf_counter()
+        with self._write_lock:
+            self._stats["writer_checkouts"] += 1
+            self._stats["writer_wait_seconds"] += time.perf_counter() - start
+            with DB_SECONDS.time("write"), span("db write"), self._writer:
+                yield traced(self._writer)
+
+    @contextmanager
+    def reader(self):
+        conn = self._checkout_reader()
+        try:
+            with DB_SECONDS.time("read"), span("db read"):
+                yield traced(conn)
+        finally:
+            self._readers.put(conn)
+
+    def _checkout_reader(self):
+        try:
+            conn = self._readers.get_nowait()
+        except queue.Empty:
+            conn = None
+            with self._open_lock:
+                if self._opened < self.max_readers:
+                    conn = _connect(self.path, read_only=True)
+                    self._opened += 1  # only once it exists: a failed open must not use up a slot
+            if conn is None:
+                self._stats["reader_waits"] += 1
+                try:
+                    conn = self._readers.get(timeout=self.reader_timeout)
+                except queue.Empty:
+                    self._stats["reader_timeouts"] += 1
+                    raise PoolExhausted(f"all {self.max_readers} DB readers busy for {self.reader_timeout}s") from None
+        self._stats["reader_checkouts"] += 1
+        return conn
+
+    def stats(self):
+        return {
+            **self._stats,
+            "readers_open": self._opened,
+            "readers_idle": self._readers.qsize(),
+            "max_readers": self.max_readers,
+        }
+
+    def close(self):
+        with self._write_lock:
+            self._writer.close()
+        while True:
+            try:
+                self._readers.get_nowait().close()
+            except queue.Empty:
+                break
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def _get_pool():
+    """Return the process-wide pool, reopening it if DB_PATH has moved."""
+    global _pool
+    pool = _pool
+    if pool is None or pool.path != DB_PATH:
+        with _pool_lock:
+            if _pool is None or _pool.path != DB_PATH:
+                if _pool is not None:
+                    _pool.close()
+                _pool = ConnectionPool(DB_PATH)
+            pool = _pool
+    return pool
+
+
+def _writer():
+    return _get_pool().writer()
+
+
+def _reader():
+    return _get_pool().reader()
+
+
+def get_pool_stats():
+    return _get_pool().stats()
+
+
+def close_pool():
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.close()
+            _pool = None
+
+
 def init_db():
-    conn = _get_conn()
-    cursor = conn.cursor()
+    with _writer() as conn:
+        _create_tables(conn.cursor())
+
+
+def _create_tables(cursor):
 
     # devices table
     cursor.execute("""
@@ -42,9 +199,12 @@ def init_db():
         last_seen TIMESTAMP,
         name TEXT,
         hostname TEXT,
-        vendor TEXT
+        vendor TEXT,
+        tags TEXT,
+        notes TEXT
     )
     """)
+    _add_missing_columns(cursor, "devices", {"tags": "TEXT", "notes": "TEXT"})
 
     # alerts table
     cursor.execute("""
@@ -57,135 +217,466 @@ def init_db():
         message TEXT
     )
     """)
+    # dedupe check on insert; type/mac filters page by the implicit rowid
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_alerts_mac_type_ts ON alerts (mac, type, timestamp)")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_alerts_type ON alerts (type)")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_alerts_timestamp ON alerts (timestamp)")
 
-    conn.commit()
-    conn.close()
+    # vendor lookups that needed the remote API; NULL vendor = negative entry
+    cursor.execute("""
+    CREATE TABLE IF NOT EXISTS vendor_cache (
+        oui TEXT PRIMARY KEY,
+        vendor TEXT,
+        expires_at REAL
+    )
+    """)
 
+    # leader election between processes (e.g. which one runs the scanner)
+    cursor.execute("""
+    CREATE TABLE IF NOT EXISTS leases (
+        name TEXT PRIMARY KEY,
+        holder TEXT NOT NULL,
+        expires_at REAL NOT NULL
+    )
+    """)
+
+    # one row: snapshots are numbered here so every worker agrees on ETags and event ids;
+    # the epoch is new with the DB, as the numbering is
+    cursor.execute("""
+    CREATE TABLE IF NOT EXISTS snapshot_version (
+        id INTEGER PRIMARY KEY CHECK (id = 1),
+        epoch TEXT NOT NULL,
+        version INTEGER NOT NULL
+    )
+    """)
+
+    # collector: devices of every agent site, and how far each agent's deltas have been applied
+    cursor.execute("""
+    CREATE TABLE IF NOT EXISTS site_devices (
+        site TEXT NOT NULL,
+        mac TEXT NOT NULL,
+        ip TEXT,
+        online INTEGER,
+        first_seen TIMESTAMP,
+        last_seen TIMESTAMP,
+        name TEXT,
+        hostname TEXT,
+        vendor TEXT,
+        tags TEXT,
+        notes TEXT,
+        PRIMARY KEY (site, mac)
+    )
+    """)
+    cursor.execute("""
+    CREATE TABLE IF NOT EXISTS agents (
+        site TEXT PRIMARY KEY,
+        agent TEXT NOT NULL,
+        seq INTEGER NOT NULL,
+        last_contact REAL
+    )
+    """)
 
-def get_all_devices():
-    conn = _get_conn()
-    cursor = conn.cursor()
+    # service fingerprints of devices; ports/names are JSON
     cursor.execute("""
-        SELECT mac, ip, online, first_seen, last_seen, name, hostname, vendor
-        FROM devices
+    CREATE TABLE IF NOT EXISTS fingerprints (
+        mac TEXT PRIMARY KEY,
+        ip TEXT,
+        probed_at REAL,
+        ports TEXT,
+        names TEXT,
+        os_guess TEXT
+    )
     """)
-    rows = cursor.fetchall()
-    conn.close()
 
-    keys = ["mac", "ip", "online", "first_seen", "last_seen", "name", "hostname", "vendor"]
-    return [dict(zip(keys, row)) for row in rows]
+    history.create_tables(cursor)
+
+
+def _add_missing_columns(cursor, table, columns):
+    """Bring a DB created by an older version up to date."""
+    existing = {row[1] for row in cursor.execute(f"PRAGMA table_info({table})")}
+    for name, decl in columns.items():
+        if name not in existing:
+            cursor.execute(f"ALTER TABLE {table} ADD COLUMN {name} {decl}")
+
+
+_DEVICE_COLUMNS = "mac, ip, online, first_seen, last_seen, name, hostname, vendor, tags, notes"
+
+
+def get_all_devices() -> DeviceRegistry:
+    with _reader() as conn:
+        rows = conn.execute(f"SELECT {_DEVICE_COLUMNS} FROM devices").fetchall()
+    return DeviceRegistry.from_rows(rows)
+
+
+def device_exists(mac: str) -> bool:
+    with _reader() as conn:
+        return conn.execute("SELECT 1 FROM devices WHERE mac = ?", (mac,)).fetchone() is not None
+
+
+_UPSERT_DEVICE_SQL = """
+    INSERT INTO devices (
+        mac, ip, online,
+        first_seen, last_seen,
+        hostname, vendor
+    ) VALUES (?, ?, 1, ?, ?, ?, ?)
+    ON CONFLICT(mac) DO UPDATE
+    SET ip        = excluded.ip,
+        online    = 1,
+        last_seen = excluded.last_seen,
+        hostname  = COALESCE(excluded.hostname, devices.hostname),
+        vendor    = COALESCE(excluded.vendor, devices.vendor)
+"""
+
+# Inserts unless the same type+mac+message was raised in the last 5s
+_INSERT_ALERT_SQL = """
+    INSERT INTO alerts (type, mac, ip, timestamp, message)
+    SELECT ?, ?, ?, ?, ?
+    WHERE NOT EXISTS (
+        SELECT 1 FROM alerts
+        WHERE mac = ?
+          AND type = ?
+          AND message = ?
+          AND timestamp > datetime(?, '-5 seconds')
+    )
+"""
+
+def _alert_params(type, mac, ip, message, now):
+    return (type, mac, ip, now, message, mac, type, message, now.isoformat())
 
 
 def upsert_device(mac, ip, hostname=None, vendor=None):
     now = datetime.datetime.now(datetime.timezone.utc)
-    conn = _get_conn()
-    cursor = conn.cursor()
+    with _writer() as conn:
+        conn.execute(_UPSERT_DEVICE_SQL, (mac, ip, now, now, hostname, vendor))
+
+
+def mark_offline(online_macs: set[str]):
+    with _writer() as conn:
+        # Step 1: Mark everything offline
+        conn.execute("UPDATE devices SET online = 0")
 
-    cursor.execute("SELECT 1 FROM devices WHERE mac = ?", (mac,))
-    exists = cursor.fetchone()
+        # Step 2: Mark only known MACs back online
+        if online_macs:
+            conn.executemany(
+                "UPDATE devices SET online = 1 WHERE mac = ?",
+                [(mac,) for mac in online_macs if mac]
+            )
 
-    if exists:
-        cursor.execute("""
+
+def rename_device(mac: str, new_name: str):
+    with _writer() as conn:
+        conn.execute("""
             UPDATE devices
-            SET ip        = ?,
-                online    = 1,
-                last_seen = ?,
-                hostname  = COALESCE(?, hostname),
-                vendor    = COALESCE(?, vendor)
+            SET name = ?
             WHERE mac = ?
-        """, (ip, now, hostname, vendor, mac))
-    else:
-        cursor.execute("""
-            INSERT INTO devices (
-                mac, ip, online,
-                first_seen, last_seen,
-                hostname, vendor
-            ) VALUES (?, ?, 1, ?, ?, ?, ?)
-        """, (mac, ip, now, now, hostname, vendor))
+        """, (new_name or None, mac))
 
-    conn.commit()
-    conn.close()
 
+def update_devices(updates) -> list[str]:
+    """
+    Apply per-device edits in one transaction. Each update is a dict with
+    ``mac`` and any of ``name``, ``notes``, ``tags`` (replace),
+    ``add_tags`` and ``remove_tags``. If any MAC is unknown nothing is
+    changed and the unknown MACs are returned.
+    """
+    macs = list(dict.fromkeys(u["mac"] for u in updates))
+    with _writer() as conn:
+        tags = {}
+        for i in range(0, len(macs), 500):
+            chunk = macs[i:i + 500]
+            tags.update(conn.execute(
+                f"SELECT mac, tags FROM devices WHERE mac IN ({','.join('?' * len(chunk))})", chunk
+            ).fetchall())
+        missing = [m for m in macs if m not in tags]
+        if missing:
+            return missing
+
+        rows = {}
+        for u in updates:
+            mac = u["mac"]
+            row = rows.setdefault(mac, {})
+            current = row.get("tags", json.loads(tags[mac]) if tags[mac] else [])
+            if "tags" in u or "add_tags" in u or "remove_tags" in u:
+                new = dict.fromkeys((u["tags"] or ()) if "tags" in u else current)
+                new.update(dict.fromkeys(u.get("add_tags", ())))
+                remove = set(u.get("remove_tags", ()))
+                row["tags"] = [t for t in new if t not in remove]
+            for field in ("name", "notes"):
+                if field in u:
+                    row[field] = u[field] or None
+        for mac, row in rows.items():
+            if not row:
+                continue
+            values = [(json.dumps(v) if v else None) if k == "tags" else v for k, v in row.items()]
+            conn.execute(
+                f"UPDATE devices SET {', '.join(f'{k} = ?' for k in row)} WHERE mac = ?", (*values, mac)
+            )
+    return []
+
+
+def _export_connection():
+    # exports stream for as long as the client reads; keep them off the pool's readers
+    return closing(_connect(DB_PATH, read_only=True))
+
+
+# each in its table's primary-key order, so SQLite streams them without a temp sort
+_EXPORT_DEVICES_SQL = (
+    f"SELECT {_DEVICE_COLUMNS}, NULL AS site FROM devices ORDER BY mac",
+    f"SELECT {_DEVICE_COLUMNS}, site FROM site_devices ORDER BY site, mac",
+)
+
+
+def iter_devices(batch_size=500):
+    """
+    All devices as lists of rows (columns as in registry.FIELDS): this
+    instance's in MAC order, then each collected site's in MAC order.
+    """
+    with _export_connection() as conn:
+        conn.execute("BEGIN")  # one read snapshot across both tables
+        for sql in _EXPORT_DEVICES_SQL:
+            cursor = conn.execute(sql)
+            while batch := cursor.fetchmany(batch_size):
+                yield batch
 
-def mark_offline(online_macs: set[str]):
-    conn = _get_conn()
-    cursor = conn.cursor()
 
-    # Step 1: Mark everything offline
-    cursor.execute("UPDATE devices SET online = 0")
+def add_alert(type: str, mac: str, ip: str, message: str):
+    now = datetime.datetime.now(datetime.timezone.utc)
+    with _writer() as conn:
+        conn.execute(_INSERT_ALERT_SQL, _alert_params(type, mac, ip, message, now))
 
-    # Step 2: Mark only known MACs back online
-    if online_macs:
-        cursor.executemany(
-            "UPDATE devices SET online = 1 WHERE mac = ?",
-            [(mac,) for mac in online_macs if mac]
+
+def apply_sweep(devices, alerts=(), offline=None):
+    """
+    Write one sweep in a single transaction:
+     - on a full sweep (``offline`` is None) every device not answering
+       goes offline; a targeted check passes the MACs it found offline
+     - ``devices`` (mac, ip, hostname, vendor) tuples are upserted as online
+     - ``alerts`` (type, mac, ip, message) tuples are appended (old ones
+       are removed by prune_alerts, not here)
+     - presence intervals and online-count roll-ups are updated
+    """
+    now = datetime.datetime.now(datetime.timezone.utc)
+    with _writer() as conn:
+        if offline is None:
+            conn.execute("UPDATE devices SET online = 0 WHERE online = 1")
+        else:
+            conn.executemany("UPDATE devices SET online = 0 WHERE mac = ?", [(mac,) for mac in offline])
+        conn.executemany(
+            _UPSERT_DEVICE_SQL,
+            [(mac, ip, now, now, hostname, vendor) for mac, ip, hostname, vendor in devices],
         )
+        if alerts:
+            conn.executemany(
+                _INSERT_ALERT_SQL,
+                [_alert_params(type, mac, ip, message, now) for type, mac, ip, message in alerts],
+            )
+        history.record(conn, [d[0] for d in devices], now.timestamp())
 
-    conn.commit()
-    conn.close()
 
+def get_device_uptime(mac: str, start: float, end: float) -> dict:
+    with _reader() as conn:
+        return history.device_uptime(conn, mac, start, end)
 
-def rename_device(mac: str, new_name: str):
-    conn = _get_conn()
-    cursor = conn.cursor()
-    cursor.execute("""
-        UPDATE devices
-        SET name = ?
-        WHERE mac = ?
-    """, (new_name or None, mac))
-    conn.commit()
-    conn.close()
 
+def get_online_counts(start: float, end: float, resolution: str | None = None) -> dict:
+    resolution = resolution or history.pick_resolution(start, end)
+    with _reader() as conn:
+        points = history.online_counts(conn, start, end, resolution)
+    return {"start": start, "end": end, "resolution": resolution, "points": points}
 
-def add_alert(type: str, mac: str, ip: str, message: str):
-    now = datetime.datetime.now(datetime.timezone.utc)
-    conn = _get_conn()
-    cursor = conn.cursor()
 
-    # Dedupe any alert of the same type+mac+message in the last 5s
-    cursor.execute("""
-        SELECT 1 FROM alerts
-        WHERE type = ?
-          AND mac = ?
-          AND message = ?
-          AND timestamp > datetime(?, '-5 seconds')
-        LIMIT 1
-    """, (type, mac, message, now.isoformat()))
-    if cursor.fetchone():
-        conn.close()
-        return
+def prune_history(now: float | None = None) -> int:
+    with _writer() as conn:
+        return history.prune(conn, time.time() if now is None else now,
+                             HISTORY_RETENTION_DAYS, HISTORY_ROLLUP_RETENTION_DAYS)
 
-    cursor.execute("""
-        INSERT INTO alerts (type, mac, ip, timestamp, message)
-        VALUES (?, ?, ?, ?, ?)
-    """, (type, mac, ip, now, message))
 
-    # keep only most recent 100
-    cursor.execute("""
-        DELETE FROM alerts
-        WHERE id NOT IN (
-            SELECT id FROM alerts
-            ORDER BY timestamp DESC
-            LIMIT 500
-        )
-    """)
-    conn.commit()
-    conn.close()
+def get_vendor_cache():
+    with _reader() as conn:
+        return conn.execute("SELECT oui, vendor, expires_at FROM vendor_cache").fetchall()
 
 
-def get_alerts():
-    conn = _get_conn()
-    cursor = conn.cursor()
-    cursor.execute("""
-        SELECT id, type, mac, ip, timestamp, message
-        FROM alerts
-        ORDER BY timestamp DESC
-    """)
-    rows = cursor.fetchall()
-    conn.close()
+def put_vendor_cache(rows):
+    """Persist (oui, vendor, expires_at) rows in one transaction."""
+    with _writer() as conn:
+        conn.executemany("""
+            INSERT INTO vendor_cache (oui, vendor, expires_at) VALUES (?, ?, ?)
+            ON CONFLICT(oui) DO UPDATE
+            SET vendor = excluded.vendor, expires_at = excluded.expires_at
+        """, rows)
+
+
+def get_alerts(limit=None, before_id=None, since_id=None, type=None, mac=None, start=None, end=None):
+    """
+    Alerts newest first, keyset-paginated on id: pass the last id of a
+    page as ``before_id`` for the next one, or the newest id already seen
+    as ``since_id`` to fetch only what came after it. ``start``/``end``
+    are unix timestamps.
+    """
+    sql, params = _alerts_query(before_id, since_id, type, mac, start, end)
+    if limit is not None:
+        sql += " LIMIT ?"
+        params.append(limit)
+
+    with _reader() as conn:
+        rows = conn.execute(sql, params).fetchall()
+
+    return [dict(zip(ALERT_COLUMNS, row)) for row in rows]
+
+
+ALERT_COLUMNS = ("id", "type", "mac", "ip", "timestamp", "message")
+
+
+def _alerts_query(before_id=None, since_id=None, type=None, mac=None, start=None, end=None):
+    where, params = [], []
+    for clause, value in (("id < ?", before_id), ("id > ?", since_id), ("type = ?", type), ("mac = ?", mac)):
+        if value is not None:
+            where.append(clause)
+            params.append(value)
+    for clause, ts in (("timestamp >= ?", start), ("timestamp < ?", end)):
+        if ts is not None:
+            where.append(clause)
+            params.append(datetime.datetime.fromtimestamp(ts, datetime.timezone.utc))
+    sql = f"SELECT {', '.join(ALERT_COLUMNS)} FROM alerts"
+    if where:
+        sql += " WHERE " + " AND ".join(where)
+    return sql + " ORDER BY id DESC", params
+
+
+def iter_alerts(type=None, mac=None, start=None, end=None, batch_size=500):
+    """Matching alerts newest first, as lists of rows (columns as in ALERT_COLUMNS)."""
+    sql, params = _alerts_query(type=type, mac=mac, start=start, end=end)
+    with _export_connection() as conn:
+        cursor = conn.execute(sql, params)
+        while batch := cursor.fetchmany(batch_size):
+            yield batch
+
+
+def prune_alerts(now: float | None = None) -> int:
+    """Drop alerts older than ALERT_RETENTION_DAYS, then all but the newest ALERT_MAX_ROWS."""
+    now = time.time() if now is None else now
+    cutoff = datetime.datetime.fromtimestamp(now - ALERT_RETENTION_DAYS * 86400, datetime.timezone.utc)
+    with _writer() as conn:
+        removed = conn.execute("DELETE FROM alerts WHERE timestamp < ?", (cutoff,)).rowcount
+        row = conn.execute(
+            "SELECT id FROM alerts ORDER BY id DESC LIMIT 1 OFFSET ?", (ALERT_MAX_ROWS,)
+        ).fetchone()
+        if row is not None:
+            removed += conn.execute("DELETE FROM alerts WHERE id <= ?", (row[0],)).rowcount
+    return removed
+
+
+def acquire_lease(name: str, holder: str, ttl: float, now: float | None = None) -> bool:
+    """
+    Take or renew lease ``name`` for ``ttl`` seconds. Succeeds if nobody
+    holds it, ``holder`` already does, or the current lease has expired.
+    """
+    now = time.time() if now is None else now
+    with _writer() as conn:
+        conn.execute("""
+            INSERT INTO leases (name, holder, expires_at) VALUES (?, ?, ?)
+            ON CONFLICT(name) DO UPDATE
+            SET holder = excluded.holder, expires_at = excluded.expires_at
+            WHERE leases.holder = excluded.holder OR leases.expires_at < ?
+        """, (name, holder, now + ttl, now))
+        row = conn.execute("SELECT holder FROM leases WHERE name = ?", (name,)).fetchone()
+    return row is not None and row[0] == holder
+
+
+def release_lease(name: str, holder: str):
+    with _writer() as conn:
+        conn.execute("DELETE FROM leases WHERE name = ? AND holder = ?", (name, holder))
 
-    keys = ["id", "type", "mac", "ip", "timestamp", "message"]
-    return [dict(zip(keys, row)) for row in rows]
+
+def get_lease(name: str) -> tuple[str, float] | None:
+    """(holder, expires_at) of lease ``name``, or None."""
+    with _reader() as conn:
+        return conn.execute("SELECT holder, expires_at FROM leases WHERE name = ?", (name,)).fetchone()
+
+
+def next_snapshot_version() -> tuple[str, int]:
+    """(epoch, version) for the next snapshot published by any process."""
+    with _writer() as conn:
+        conn.execute("INSERT OR IGNORE INTO snapshot_version (id, epoch, version) VALUES (1, ?, 0)",
+                     (secrets.token_hex(4),))
+        conn.execute("UPDATE snapshot_version SET version = version + 1 WHERE id = 1")
+        epoch, version = conn.execute("SELECT epoch, version FROM snapshot_version WHERE id = 1").fetchone()
+    return epoch, version
+
+
+def get_site_devices() -> list[tuple]:
+    """Every agent site's devices, as rows with the columns in registry.FIELDS."""
+    with _reader() as conn:
+        return conn.execute(f"SELECT {_DEVICE_COLUMNS}, site FROM site_devices").fetchall()
+
+
+def get_agents() -> dict[str, tuple]:
+    """site -> (agent, seq, last_contact) of the last delta applied."""
+    with _reader() as conn:
+        return {row[0]: row[1:] for row in conn.execute("SELECT site, agent, seq, last_contact FROM agents")}
+
+
+def apply_site_batch(site, agent, seq, devices=(), removed=(), alerts=(), seen_at=None):
+    """
+    Apply one push from an agent in a single transaction: delete the
+    ``removed`` MACs, write ``devices`` (rows in registry.FIELDS order,
+    site last) as they now are, stamp the site's online devices with
+    ``seen_at``, append ``alerts`` and record ``seq`` as applied.
+    """
+    now = datetime.datetime.now(datetime.timezone.utc)
+    with _writer() as conn:
+        conn.executemany("DELETE FROM site_devices WHERE site = ? AND mac = ?", [(site, mac) for mac in removed])
+        conn.executemany(
+            f"INSERT OR REPLACE INTO site_devices ({_DEVICE_COLUMNS}, site) VALUES ({', '.join('?' * 11)})",
+            [(*row[:8], json.dumps(list(row[8])) if row[8] else None, *row[9:]) for row in devices],
+        )
+        if seen_at is not None:
+            conn.execute("UPDATE site_devices SET last_seen = ? WHERE site = ? AND online = 1", (seen_at, site))
+        if alerts:
+            conn.executemany(
+                _INSERT_ALERT_SQL,
+                [_alert_params(type, mac, ip, message, now) for type, mac, ip, message in alerts],
+            )
+        conn.execute("""
+            INSERT INTO agents (site, agent, seq, last_contact) VALUES (?, ?, ?, ?)
+            ON CONFLICT(site) DO UPDATE
+            SET agent = excluded.agent, seq = excluded.seq, last_contact = excluded.last_contact
+        """, (site, agent, seq, now.timestamp()))
+
+
+FINGERPRINT_COLUMNS = ("mac", "ip", "probed_at", "ports", "names", "os_guess")
+
+
+def _fingerprint(row) -> dict:
+    fp = dict(zip(FINGERPRINT_COLUMNS, row))
+    fp["ports"] = json.loads(fp["ports"] or "[]")
+    fp["names"] = json.loads(fp["names"] or "{}")
+    return fp
+
+
+def get_fingerprints() -> dict[str, dict]:
+    with _reader() as conn:
+        rows = conn.execute(f"SELECT {', '.join(FINGERPRINT_COLUMNS)} FROM fingerprints").fetchall()
+    return {row[0]: _fingerprint(row) for row in rows}
+
+
+def get_fingerprint(mac: str) -> dict | None:
+    with _reader() as conn:
+        row = conn.execute(
+            f"SELECT {', '.join(FINGERPRINT_COLUMNS)} FROM fingerprints WHERE mac = ?", (mac,)
+        ).fetchone()
+    return _fingerprint(row) if row else None
+
+
+def put_fingerprints(rows):
+    """Store (mac, ip, probed_at, ports, names, os_guess) rows in one transaction."""
+    with _writer() as conn:
+        conn.executemany("""
+            INSERT INTO fingerprints (mac, ip, probed_at, ports, names, os_guess) VALUES (?, ?, ?, ?, ?, ?)
+            ON CONFLICT(mac) DO UPDATE
+            SET ip = excluded.ip, probed_at = excluded.probed_at, ports = excluded.ports,
+                names = excluded.names, os_guess = excluded.os_guess
+        """, [(mac, ip, at, json.dumps(ports), json.dumps(names), os) for mac, ip, at, ports, names, os in rows])
 
 
 if __name__ == "__main__":
@@ -0,0 +1,143 @@
+# backend/app/history.py
+"""
+Device history kept next to the devices table, without a row per device
+per sweep:
+
+ - presence_intervals: one row per continuous online run of a device
+   (``end`` is NULL while it is still online), so a device that stays up
+   for a month costs one row
+ - online_counts: the number of online devices per sweep, folded into
+   minute/hour/day buckets (samples, sum, min, max)
+
+Everything here takes an open connection; database.py owns the pool and
+calls in from its transactions. Timestamps are unix seconds.
+"""
+
+RESOLUTIONS = {"minute": 60, "hour": 3600, "day": 86400}
+
+
+def create_tables(cursor):
+    cursor.execute("""
+    CREATE TABLE IF NOT EXISTS presence_intervals (
+        id INTEGER PRIMARY KEY,
+        mac TEXT NOT NULL,
+        start REAL NOT NULL,
+        end REAL
+    )
+    """)
+    # per-device range queries, and open intervals (end IS NULL sorts first)
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_presence_mac_end ON presence_intervals (mac, end)")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_presence_end ON presence_intervals (end)")
+
+    cursor.execute("""
+    CREATE TABLE IF NOT EXISTS online_counts (
+        resolution INTEGER NOT NULL,
+        bucket INTEGER NOT NULL,
+        samples INTEGER NOT NULL,
+        total INTEGER NOT NULL,
+        min_online INTEGER NOT NULL,
+        max_online INTEGER NOT NULL,
+        PRIMARY KEY (resolution, bucket)
+    ) WITHOUT ROWID
+    """)
+
+
+_CLOSE_INTERVALS_SQL = """
+UPDATE presence_intervals SET end = ?
+WHERE end IS NULL AND mac IN (SELECT mac FROM devices WHERE online = 0)
+"""
+
+_OPEN_INTERVAL_SQL = """
+INSERT INTO presence_intervals (mac, start)
+SELECT ?, ? WHERE NOT EXISTS (
+    SELECT 1 FROM presence_intervals WHERE mac = ? AND end IS NULL
+)
+"""
+
+_ADD_COUNT_SQL = """
+INSERT INTO online_counts (resolution, bucket, samples, total, min_online, max_online)
+VALUES (?, ?, 1, ?, ?, ?)
+ON CONFLICT (resolution, bucket) DO UPDATE SET
+    samples = samples + 1,
+    total = total + excluded.total,
+    min_online = MIN(min_online, excluded.min_online),
+    max_online = MAX(max_online, excluded.max_online)
+"""
+
+
+def record(conn, online_macs, now: float):
+    """
+    Record one cycle, after its device updates: close the intervals of
+    devices now offline, open one for each of ``online_macs`` that has
+    none, and add the online count to every roll-up.
+    """
+    conn.execute(_CLOSE_INTERVALS_SQL, (now,))
+    conn.executemany(_OPEN_INTERVAL_SQL, [(mac, now, mac) for mac in online_macs])
+    online = conn.execute("SELECT COUNT(*) FROM devices WHERE online = 1").fetchone()[0]
+    conn.executemany(
+        _ADD_COUNT_SQL,
+        [(res, int(now // res) * res, online, online, online) for res in RESOLUTIONS.values()],
+    )
+
+
+def device_uptime(conn, mac: str, start: float, end: float) -> dict:
+    """Seconds online within [start, end] and the intervals (clipped to it)."""
+    rows = conn.execute(
+        """
+        SELECT start, end FROM presence_intervals WHERE mac = ? AND end > ? AND start < ?
+        UNION ALL
+        SELECT start, end FROM presence_intervals WHERE mac = ? AND end IS NULL AND start < ?
+        ORDER BY start
+        """,
+        (mac, start, end, mac, end),
+    ).fetchall()
+    intervals = [(max(s, start), min(e if e is not None else end, end)) for s, e in rows]
+    online = sum(e - s for s, e in intervals if e > s)
+    span = end - start
+    return {
+        "mac": mac,
+        "start": start,
+        "end": end,
+        "online_seconds": online,
+        "uptime": online / span if span > 0 else None,
+        "intervals": intervals,
+    }
+
+
+def pick_resolution(start: float, end: float) -> str:
+    """Finest roll-up that keeps a range to a few hundred points."""
+    span = end - start
+    if span <= 6 * 3600:
+        return "minute"
+    if span <= 31 * 86400:
+        return "hour"
+    return "day"
+
+
+def online_counts(conn, start: float, end: float, resolution: str) -> list[dict]:
+    res = RESOLUTIONS[resolution]
+    rows = conn.execute(
+        """
+        SELECT bucket, samples, total, min_online, max_online FROM online_counts
+        WHERE resolution = ? AND bucket >= ? AND bucket < ?
+        ORDER BY bucket
+        """,
+        (res, int(start // res) * res, end),
+    ).fetchall()
+    return [
+        {"t": bucket, "avg": total / samples, "min": lo, "max": hi, "samples": samples}
+        for bucket, samples, total, lo, hi in rows
+    ]
+
+
+def prune(conn, now: float, interval_days: float, rollup_days: dict):
+    """Drop closed intervals and roll-up buckets older than their retention."""
+    removed = conn.execute(
+        "DELETE FROM presence_intervals WHERE end < ?", (now - interval_days * 86400,)
+    ).rowcount
+    for name, days in rollup_days.items():
+        removed += conn.execute(
+            "DELETE FROM online_counts WHERE resolution = ? AND bucket < ?",
+            (RESOLUTIONS[name], now - days * 86400),
+        ).rowcount
+    return removed
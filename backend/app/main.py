@@ -1,12 +1,53 @@
-from fastapi import FastAPI
+import asyncio
+from contextlib import asynccontextmanager
+
+from fastapi import FastAPI, Request, Response
 from fastapi.middleware.cors import CORSMiddleware
-from backend.app.api.routes import router, set_local_ip
-from backend.app.database import init_db
-from backend.app.services.network_monitor import _discover_and_update
-import threading
-import time
+from fastapi.responses import JSONResponse
+from backend.app.api.routes import router
+from backend.app.config import COLLECTOR_ENABLED, COLLECTOR_TOKEN, SCANNER_EMBEDDED
+from backend.app.database import PoolExhausted, init_db, close_pool
+from backend.app.metrics import CONTENT_TYPE, HttpMetricsMiddleware, registry
+from backend.app.services.bandwidth import sampler
+from backend.app.services.collector import collector
+from backend.app.services.latency import prober
+from backend.app.services.leader import ScannerLeader
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """
+    Run the latency prober and bandwidth sampler, and either contend for the scanner lease (only
+    one worker scans) or, with SCANNER_EMBEDDED off, follow a separate
+    ``python -m backend.app.scanner`` process. A collector (run it as a single worker) serves what
+    its site agents push instead of scanning, and leaves probing the sites' devices to them.
+    """
+    if COLLECTOR_ENABLED and not COLLECTOR_TOKEN:
+        # CORS lets any page post here; without a token anyone could write sites
+        raise RuntimeError("COLLECTOR_ENABLED needs a COLLECTOR_TOKEN for the agents to send")
+    init_db()
+    sampler.start()
+    if COLLECTOR_ENABLED:
+        scanner = None
+        await asyncio.to_thread(collector.start)
+    else:
+        prober.start()
+        scanner = ScannerLeader(contend=SCANNER_EMBEDDED)
+        scanner.start()
+    app.state.scanner = scanner
+    try:
+        yield
+    finally:
+        if scanner is None:
+            await asyncio.to_thread(collector.stop)
+        else:
+            await scanner.stop()
+            prober.stop()
+        sampler.stop()
+        close_pool()
 
-app = FastAPI()
+
+app = FastAPI(lifespan=lifespan)
 
 # Allow frontend to talk to us
 app.add_middleware(
@@ -15,29 +56,22 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor"],
 )
 
+app.add_middleware(HttpMetricsMiddleware)
+
 # Mount our API routes under /api
 app.include_router(router, prefix="/api")
 
-# Ensure the SQLite DB and tables exist
-init_db()
-
 
-def _scan_loop():
-    """Continuously re-scan in the background."""
-    from backend.app.config import SYNC_INTERVAL_SECONDS
-    while True:
-        try:
-            _discover_and_update()
-        except Exception:
-            pass
-        time.sleep(SYNC_INTERVAL_SECONDS)
+@app.exception_handler(PoolExhausted)
+async def pool_exhausted(request: Request, exc: PoolExhausted):
+    """Every DB reader stayed busy: tell clients to come back rather than failing with a bare 500."""
+    return JSONResponse({"detail": str(exc)}, status_code=503, headers={"Retry-After": "1"})
 
 
-@app.on_event("startup")
-async def startup_scanner():
-    """Spawn a daemon thread that continuously rescans the network."""
-    set_local_ip()
-    t = threading.Thread(target=_scan_loop, daemon=True)
-    t.start()
+@app.get("/metrics", include_in_schema=False)
+def metrics():
+    """Prometheus text exposition of the scanner/API instrumentation."""
+    return Response(registry.render(), media_type=CONTENT_TYPE)
@@ -0,0 +1,225 @@
+# backend/app/registry.py
+
+import gc
+import json
+import socket
+import sys
+import threading
+from json.encoder import encode_basestring_ascii as _quote
+
+FIELDS = ("mac", "ip", "online", "first_seen", "last_seen", "name", "hostname", "vendor", "tags", "notes", "site")
+
+_site_ids = {None: 0}  # site name -> small int folded into registry keys; None = this instance's own segment
+_site_lock = threading.Lock()
+
+
+def mac_to_int(mac: str) -> int:
+    try:
+        return int(mac.replace(":", ""), 16)  # the form stored in the DB
+    except ValueError:
+        return int(mac.replace("-", "").replace(".", ""), 16)
+
+
+def int_to_mac(value: int) -> str:
+    return value.to_bytes(6, "big").hex(":")
+
+
+def ip_to_int(ip: str | None) -> int | None:
+    if not ip:
+        return None
+    try:
+        return int.from_bytes(socket.inet_aton(ip), "big")
+    except OSError:
+        return None
+
+
+def int_to_ip(value: int | None) -> str | None:
+    return None if value is None else socket.inet_ntoa(value.to_bytes(4, "big"))
+
+
+def site_id(site: str | None) -> int:
+    id = _site_ids.get(site)
+    if id is None:
+        with _site_lock:
+            id = _site_ids.setdefault(site, len(_site_ids))
+    return id
+
+
+# vendors (and many hostnames) repeat across devices; keep one copy
+_intern_str = sys.intern
+
+
+def _tags(value) -> tuple:
+    # stored as a JSON array in the DB, a list in the shared snapshot file
+    if not value:
+        return ()
+    if isinstance(value, str):
+        value = json.loads(value)
+    return tuple(sys.intern(t) for t in value)
+
+
+def _json_time(value) -> str:
+    if value is None:
+        return "null"
+    return _quote(value.isoformat() if hasattr(value, "isoformat") else str(value))
+
+
+def _json_str(value) -> str:
+    return "null" if value is None else _quote(value)
+
+
+class Device:
+    """
+    One device, stored compactly: the MAC as a 48-bit int, the IPv4
+    address as a 32-bit int and repeated strings interned. Read it like
+    the dict rows it replaces (``dev["mac"]``, ``dev.get("vendor")``);
+    the string forms are produced on access. ``site`` is None for devices
+    on this instance's own segment, or the agent site they came from.
+    """
+
+    __slots__ = ("mac_int", "ip_int", "online", "first_seen", "last_seen", "name", "hostname", "vendor",
+                 "tags", "notes", "site")
+
+    def __init__(self, mac, ip, online, first_seen=None, last_seen=None, name=None, hostname=None, vendor=None,
+                 tags=None, notes=None, site=None):
+        # built for every row on every load: the common cases are inlined
+        self.mac_int = mac if mac.__class__ is int else mac_to_int(mac)
+        self.ip_int = ip if ip is None or ip.__class__ is int else ip_to_int(ip)
+        self.online = 1 if online else 0
+        # a sweep stamps every device it saw with the same time
+        self.first_seen = _intern_str(first_seen) if first_seen.__class__ is str else first_seen
+        self.last_seen = _intern_str(last_seen) if last_seen.__class__ is str else last_seen
+        self.name = name
+        self.hostname = _intern_str(hostname) if hostname else hostname
+        self.vendor = _intern_str(vendor) if vendor else vendor
+        self.tags = _tags(tags) if tags else ()
+        self.notes = notes
+        self.site = _intern_str(site) if site else site
+
+    @property
+    def key(self) -> int:
+        """Registry key: the MAC, qualified by site so one MAC can exist at several sites."""
+        return self.mac_int | site_id(self.site) << 48
+
+    @property
+    def mac(self) -> str:
+        return int_to_mac(self.mac_int)
+
+    @property
+    def ip(self) -> str | None:
+        return int_to_ip(self.ip_int)
+
+    def __getitem__(self, key):
+        if key not in FIELDS:
+            raise KeyError(key)
+        return getattr(self, key)
+
+    def get(self, key, default=None):
+        return getattr(self, key) if key in FIELDS else default
+
+    def keys(self):
+        return FIELDS
+
+    def to_dict(self) -> dict:
+        return {key: getattr(self, key) for key in FIELDS}
+
+    def to_json(self) -> str:
+        return (
+            f'{{"mac":"{self.mac}","ip":{_json_str(self.ip)},"online":{self.online},'
+            f'"first_seen":{_json_time(self.first_seen)},"last_seen":{_json_time(self.last_seen)},'
+            f'"name":{_json_str(self.name)},"hostname":{_json_str(self.hostname)},'
+            f'"vendor":{_json_str(self.vendor)},"tags":[{",".join(map(_quote, self.tags))}],'
+            f'"notes":{_json_str(self.notes)},"site":{_json_str(self.site)}}}'
+        )
+
+    def __repr__(self):
+        return f"Device({self.mac}, {self.ip}, online={self.online})"
+
+
+class DeviceRegistry:
+    """
+    The device table in memory, shared by the DB layer, the scanner and
+    the API. Iterates as Device records and indexes them by MAC; the IP
+    index is only built if by_ip() is used. Lookups take the usual
+    string forms and are per site (``site=None``, this instance's own
+    segment, unless given).
+    """
+
+    def __init__(self, devices=()):
+        self._by_mac = {dev.mac_int if dev.site is None else dev.key: dev for dev in devices}
+        self._by_ip = None
+
+    @classmethod
+    def from_rows(cls, rows) -> "DeviceRegistry":
+        """Build from rows with the columns in FIELDS order."""
+        # tens of thousands of acyclic records: collections during the
+        # build would only re-walk them, so hold the collector off
+        paused = gc.isenabled()
+        gc.disable()
+        try:
+            return cls([Device(*row) for row in rows])
+        finally:
+            if paused:
+                gc.enable()
+
+    @classmethod
+    def of(cls, devices) -> "DeviceRegistry":
+        """``devices`` as a registry, converting dict rows if needed."""
+        if isinstance(devices, cls):
+            return devices
+        return cls(d if isinstance(d, Device) else Device(*(d.get(f) for f in FIELDS)) for d in devices)
+
+    def add(self, dev: Device):
+        self._by_mac[dev.key] = dev
+        self._by_ip = None
+
+    def get(self, mac: str, default=None, site=None):
+        try:
+            return self._by_mac.get(mac_to_int(mac) | site_id(site) << 48, default)
+        except (ValueError, AttributeError):
+            return default
+
+    def find(self, dev: Device) -> Device | None:
+        """This registry's entry for ``dev``'s MAC and site, if any."""
+        return self._by_mac.get(dev.key)
+
+    def __getitem__(self, mac: str) -> Device:
+        dev = self.get(mac)
+        if dev is None:
+            raise KeyError(mac)
+        return dev
+
+    def __contains__(self, mac) -> bool:
+        return self.get(mac) is not None
+
+    def __iter__(self):
+        return iter(self._by_mac.values())
+
+    def __len__(self):
+        return len(self._by_mac)
+
+    def __bool__(self):
+        return bool(self._by_mac)
+
+    def by_ip(self, ip: str, site=None) -> Device | None:
+        ip_int = ip_to_int(ip)
+        if ip_int is None:
+            return None
+        if self._by_ip is None:
+            by_ip = {}
+            for dev in self._by_mac.values():
+                if dev.ip_int is not None:
+                    # an IP reused by a device that is offline yields to the online one
+                    ip_key = dev.ip_int | site_id(dev.site) << 32
+                    holder = by_ip.get(ip_key)
+                    if holder is None or dev.online and not holder.online:
+                        by_ip[ip_key] = dev
+            self._by_ip = by_ip
+        return self._by_ip.get(ip_int | site_id(site) << 32)
+
+    def online_macs(self, site=None) -> set[str]:
+        return {dev.mac for dev in self._by_mac.values() if dev.online and dev.site == site}
+
+    def to_json(self) -> bytes:
+        """The registry as a JSON array, without building intermediate dicts."""
+        return ("[" + ",".join(dev.to_json() for dev in self._by_mac.values()) + "]").encode()
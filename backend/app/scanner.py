@@ -0,0 +1,47 @@
+# backend/app/scanner.py
+"""
+Standalone scanner for multi-worker deployments:
+
+    python -m backend.app.scanner
+    uvicorn backend.app.main:app --workers 8   # with SCANNER_EMBEDDED = False
+
+Holds the scanner lease (waiting for it if another scanner has it), runs
+the scan engine and writes each snapshot to the shared file the API
+workers follow.
+"""
+import asyncio
+import logging
+import signal
+
+from backend.app.database import close_pool, init_db
+from backend.app.services.leader import ScannerLeader
+
+
+async def run():
+    init_db()
+    stop = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        try:
+            loop.add_signal_handler(sig, stop.set)
+        except NotImplementedError:  # Windows: Ctrl+C raises KeyboardInterrupt instead
+            pass
+    scanner = ScannerLeader(contend=True)
+    scanner.start()
+    try:
+        await stop.wait()
+    finally:
+        await scanner.stop()
+        close_pool()
+
+
+def main():
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(name)s %(levelname)s %(message)s")
+    try:
+        asyncio.run(run())
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,315 @@
+# backend/app/services/agent.py
+
+import gzip
+import json
+import logging
+import os
+import secrets
+import threading
+import time
+
+from backend.app import database
+from backend.app.config import (
+    AGENT_BATCH_MAX,
+    AGENT_HEARTBEAT_SECONDS,
+    AGENT_PUSH_SECONDS,
+    AGENT_RETRY_MAX_SECONDS,
+    AGENT_SPOOL_DIR,
+    AGENT_SPOOL_MAX_BYTES,
+    AGENT_TIMEOUT,
+    COLLECTOR_TOKEN,
+    COLLECTOR_URL,
+    SITE_NAME,
+)
+from backend.app.registry import FIELDS
+from backend.app.services import snapshot
+from backend.app.services.events import diff_devices
+from backend.app.services.snapshot import render_json
+
+log = logging.getLogger(__name__)
+
+_SUFFIX = ".ndjson.gz"
+_ROW_FIELDS = FIELDS[:-1]  # the collector files rows under the pushing site
+
+
+def spool_dir() -> str:
+    return AGENT_SPOOL_DIR or os.path.join(os.path.dirname(os.path.abspath(database.DB_PATH)), "spool")
+
+
+def make_delta(site, agent, seq, previous, snap, alerts=None) -> dict:
+    """
+    One sweep as the collector takes it: every device if ``previous`` is
+    None, else what changed since, with ``alerts`` (default: the
+    snapshot's own).
+    """
+    if previous is None:
+        devices, offline, removed = list(snap.devices), [], []
+    else:
+        diff = diff_devices(previous.devices, snap.devices)
+        devices, offline = diff["added"] + diff["changed"], diff["offline"]
+        removed = [dev.mac for dev in previous.devices if snap.devices.find(dev) is None]
+    return {
+        "site": site,
+        "agent": agent,
+        "seq": seq,
+        "at": snap.published_at,
+        "full": previous is None,
+        "devices": [[dev.get(f) for f in _ROW_FIELDS] for dev in devices],
+        "offline": offline,
+        "removed": removed,
+        "alerts": [list(alert) for alert in (snap.alerts if alerts is None else alerts)],
+    }
+
+
+def _http_post(url, body, headers, timeout) -> dict:
+    """requests.post, imported on first use."""
+    import requests
+    resp = requests.post(url, data=body, headers=headers, timeout=timeout)
+    resp.raise_for_status()
+    return resp.json()
+
+
+class DeltaSpool:
+    """
+    Deltas waiting for the collector, one gzip file each, named by
+    sequence number so they go out in order and survive restarts. The
+    agent id and the last sequence number the collector acknowledged are
+    kept beside them in ``state.json``.
+    """
+
+    def __init__(self, path=None, max_bytes=AGENT_SPOOL_MAX_BYTES):
+        self.path = path or spool_dir()
+        self.max_bytes = max_bytes
+        os.makedirs(self.path, exist_ok=True)
+        self._state_path = os.path.join(self.path, "state.json")
+        try:
+            with open(self._state_path) as f:
+                state = json.load(f)
+        except (OSError, ValueError):
+            state = {}
+        self.agent = state.get("agent") or secrets.token_hex(8)
+        self.acked = state.get("acked", 0)
+        self._files = {}  # seq -> compressed size
+        for name in os.listdir(self.path):
+            if name.endswith(_SUFFIX):
+                self._files[int(name[:-len(_SUFFIX)])] = os.path.getsize(os.path.join(self.path, name))
+        self.bytes = sum(self._files.values())
+        self.last_seq = max(self._files, default=self.acked)
+        if not state:
+            self._save()
+
+    def __len__(self):
+        return len(self._files)
+
+    def _file(self, seq) -> str:
+        return os.path.join(self.path, f"{seq:012d}{_SUFFIX}")
+
+    def _save(self):
+        tmp = f"{self._state_path}.tmp"
+        with open(tmp, "w") as f:
+            json.dump({"agent": self.agent, "acked": self.acked}, f)
+        os.replace(tmp, self._state_path)
+
+    def append(self, seq: int, delta: dict) -> bool:
+        """Spool ``delta``; False (and nothing written) if it would take the spool past ``max_bytes``."""
+        data = gzip.compress(render_json(delta) + b"\n", compresslevel=6, mtime=0)
+        if self._files and self.bytes + len(data) > self.max_bytes:
+            return False
+        path = self._file(seq)
+        with open(f"{path}.tmp", "wb") as f:
+            f.write(data)
+        os.replace(f"{path}.tmp", path)
+        self._files[seq] = len(data)
+        self.bytes += len(data)
+        self.last_seq = seq
+        return True
+
+    def pending(self, limit: int) -> tuple[int, bytes]:
+        """The oldest ``limit`` deltas as one body (concatenated gzip members) and the last seq in it."""
+        seqs = sorted(self._files)[:limit]
+        chunks = []
+        for seq in seqs:
+            with open(self._file(seq), "rb") as f:
+                chunks.append(f.read())
+        return (seqs[-1] if seqs else self.acked), b"".join(chunks)
+
+    def ack(self, seq: int):
+        for done in [s for s in self._files if s <= seq]:
+            self._remove(done)
+        if seq > self.acked:
+            self.acked = seq
+            self._save()
+
+    def clear(self) -> int:
+        dropped = len(self._files)
+        for seq in list(self._files):
+            self._remove(seq)
+        return dropped
+
+    def _remove(self, seq):
+        try:
+            os.remove(self._file(seq))
+        except FileNotFoundError:
+            pass
+        self.bytes -= self._files.pop(seq)
+
+
+class Agent:
+    """
+    Ships this instance's sweeps to a collector. Each published snapshot
+    becomes a delta against the last one spooled (a full copy after
+    start-up or whenever the collector asks for one); the spool is pushed
+    every ``push_interval`` in batches of up to ``batch_max`` and only
+    trimmed once the collector acknowledges it, so nothing is lost while
+    the collector is unreachable — pushes just back off. Sweeps that
+    changed nothing are reported every ``heartbeat`` seconds.
+    """
+
+    def __init__(self, site=SITE_NAME, url=COLLECTOR_URL, token=COLLECTOR_TOKEN, spool=None,
+                 push_interval=AGENT_PUSH_SECONDS, batch_max=AGENT_BATCH_MAX, heartbeat=AGENT_HEARTBEAT_SECONDS,
+                 retry_max=AGENT_RETRY_MAX_SECONDS, timeout=AGENT_TIMEOUT, post=None):
+        self.site = site
+        self.url = url
+        self.token = token
+        self.spool = spool
+        self.push_interval = push_interval
+        self.batch_max = batch_max
+        self.heartbeat = heartbeat
+        self.retry_max = retry_max
+        self.timeout = timeout
+        self._post = post or _http_post
+        self._base = None  # last snapshot spooled
+        self._resync = True
+        self._pending = None  # latest snapshot published since the loop last ran
+        self._pending_alerts = []  # and the alerts of every snapshot published since
+        self._lock = threading.Lock()
+        self._pending_lock = threading.Lock()  # publishers never wait behind a delta being built
+        self._wake = threading.Event()
+        self._stop = False
+        self._thread = None
+        self._stats = {"deltas": 0, "heartbeats_skipped": 0, "pushes": 0, "push_failures": 0, "bytes_sent": 0,
+                       "resyncs": 0, "last_push": None, "last_error": None}
+
+    def record(self, snap, alerts=None) -> bool:
+        """
+        Spool the delta from the last recorded snapshot to ``snap``, with
+        ``alerts`` if given (snapshots skipped in between still had theirs);
+        False if there was nothing to send yet.
+        """
+        with self._lock:
+            base = None if self._resync else self._base
+            seq = self.spool.last_seq + 1
+            delta = make_delta(self.site, self.spool.agent, seq, base, snap, alerts)
+            if (base is not None and not (delta["devices"] or delta["offline"] or delta["removed"] or delta["alerts"])
+                    and snap.published_at - base.published_at < self.heartbeat):
+                self._stats["heartbeats_skipped"] += 1
+                return False
+            if not self.spool.append(seq, delta):
+                dropped = self.spool.clear()
+                log.warning("Agent spool passed %d bytes; dropped %d deltas, sending a full copy instead",
+                            self.spool.max_bytes, dropped)
+                self._stats["resyncs"] += 1
+                self.spool.append(seq, make_delta(self.site, self.spool.agent, seq, None, snap, alerts))
+            self._base = snap
+            self._resync = False
+            self._stats["deltas"] += 1
+            return True
+
+    def push_once(self) -> bool:
+        """Send the oldest spooled deltas; False if the collector could not be reached."""
+        last, body = self.spool.pending(self.batch_max)
+        if not body:
+            return True
+        headers = {"Content-Type": "application/x-ndjson", "Content-Encoding": "gzip"}
+        if self.token:
+            headers["Authorization"] = f"Bearer {self.token}"
+        try:
+            reply = self._post(f"{self.url.rstrip('/')}/api/collector/ingest", body, headers, self.timeout)
+        except (OSError, ValueError) as e:  # requests.RequestException included
+            self._stats["push_failures"] += 1
+            self._stats["last_error"] = f"{type(e).__name__}: {e}"
+            log.warning("Push to collector %s failed: %s", self.url, e)
+            return False
+        self.spool.ack(min(reply.get("acked", 0), last))
+        self._stats["pushes"] += 1
+        self._stats["bytes_sent"] += len(body)
+        self._stats["last_push"] = time.time()
+        if reply.get("resync"):
+            with self._lock:
+                self.spool.clear()
+                self._resync = True
+                self._stats["resyncs"] += 1
+            self.record(self._base or snapshot.current(), [])  # its alerts went out with it already
+        return True
+
+    def _on_publish(self, previous, snap):
+        if self._thread is not None:
+            with self._pending_lock:
+                self._pending = snap
+                self._pending_alerts.extend(snap.alerts)
+            self._wake.set()
+
+    def _take_pending(self):
+        with self._pending_lock:
+            snap, self._pending = self._pending, None
+            alerts, self._pending_alerts = self._pending_alerts, []
+        return snap, alerts
+
+    def _run(self):
+        delay = self.push_interval
+        next_push = time.monotonic() + delay
+        while not self._stop:
+            self._wake.wait(max(0.0, next_push - time.monotonic()))
+            self._wake.clear()
+            snap, alerts = self._take_pending()
+            try:
+                if snap is not None:
+                    self.record(snap, alerts)
+                if time.monotonic() < next_push:
+                    continue
+                if self.push_once():
+                    delay = 0 if len(self.spool) else self.push_interval  # drain a backlog without waiting
+                else:
+                    delay = min(self.retry_max, max(delay, self.push_interval) * 2)
+            except Exception:
+                log.exception("Agent loop failed")
+                delay = self.push_interval
+            next_push = time.monotonic() + delay
+
+    def start(self):
+        if self._thread is not None:
+            return
+        if not self.site or not self.url:
+            raise ValueError("an agent needs a site name and the collector URL")
+        if self.spool is None:
+            self.spool = DeltaSpool()
+        self._resync = True
+        self.record(snapshot.current())
+        self._stop = False
+        self._thread = threading.Thread(target=self._run, name="collector-agent", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        if self._thread is None:
+            return
+        self._stop = True
+        self._wake.set()
+        self._thread.join()
+        self._thread = None
+        self.push_once()  # best effort; whatever is left stays spooled for next time
+
+    def metrics(self) -> dict:
+        return {
+            **self._stats,
+            "running": self._thread is not None,
+            "site": self.site,
+            "collector": self.url,
+            "agent": self.spool.agent if self.spool is not None else None,
+            "spooled": len(self.spool) if self.spool is not None else 0,
+            "spool_bytes": self.spool.bytes if self.spool is not None else 0,
+            "acked": self.spool.acked if self.spool is not None else 0,
+        }
+
+
+agent = Agent()
+snapshot.subscribe(agent._on_publish)
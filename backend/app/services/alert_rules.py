@@ -0,0 +1,194 @@
+# backend/app/services/alert_rules.py
+
+import threading
+import time
+from collections import deque
+
+from backend.app.config import (
+    ALERT_OFFLINE_AFTER_MISSES,
+    ALERT_FLAP_WINDOW_SECONDS,
+    ALERT_FLAP_THRESHOLD,
+    ALERT_COALESCE_THRESHOLD,
+    ALERT_RATE_PER_MINUTE,
+    ALERT_RATE_BURST,
+    ALERT_MUTED_TYPES,
+)
+from backend.app.metrics import registry
+
+ALERTS = registry.counter("netview_alerts_total", "Alerts raised by scans, by what the rules did with them",
+                          ("type", "outcome"))
+
+_SUMMARY = {
+    "new_device": "{n} new devices detected",
+    "device_offline": "{n} devices went offline",
+    "device_back_online": "{n} devices back online",
+}
+_LISTED = 5  # MACs named in a coalesced alert's message
+
+
+class AlertRules:
+    """
+    Turns the raw state changes of each scan cycle into the alerts worth
+    storing, in memory, before anything is written:
+
+     - hysteresis: a device must be missed by ``offline_after`` checks in
+       a row before "went offline" is raised; if it answers first, neither
+       that nor its "back online" is reported
+     - flap suppression: a device changing state ``flap_threshold`` times
+       within ``flap_window`` seconds raises one "device_flapping" alert
+       and nothing more until it has been stable for a whole window
+     - coalescing: more than ``coalesce_threshold`` alerts of one type in
+       a cycle become a single summary alert ("40 devices went offline")
+     - rate limiting: a token bucket caps alerts per minute; what it drops
+       is counted and reported in one alert once tokens are available
+
+    Device state in the DB is not delayed; only the alerts are.
+    """
+
+    def __init__(self, offline_after=ALERT_OFFLINE_AFTER_MISSES, flap_window=ALERT_FLAP_WINDOW_SECONDS,
+                 flap_threshold=ALERT_FLAP_THRESHOLD, coalesce_threshold=ALERT_COALESCE_THRESHOLD,
+                 rate_per_minute=ALERT_RATE_PER_MINUTE, burst=ALERT_RATE_BURST, muted=ALERT_MUTED_TYPES):
+        self.offline_after = offline_after
+        self.flap_window = flap_window
+        self.flap_threshold = flap_threshold
+        self.coalesce_threshold = coalesce_threshold
+        self.rate = rate_per_minute / 60
+        self.burst = burst
+        self.muted = set(muted)
+        self._pending = {}  # mac -> [misses, offline alert]
+        self._announced_offline = set()
+        self._transitions = {}  # mac -> deque of raw state-change times
+        self._flapping = set()
+        self._tokens = float(burst)
+        self._refilled = None
+        self._dropped = 0
+        self._lock = threading.Lock()
+
+    def evaluate(self, raw, seen, checked=None, now=None) -> list[tuple]:
+        """
+        Alerts to store for one cycle. ``raw`` are (type, mac, ip,
+        message) tuples as build_writes makes them, ``seen`` the MACs that
+        answered and ``checked`` the MACs that were probed (None = all of
+        them, a full sweep).
+        """
+        now = time.monotonic() if now is None else now
+        with self._lock:
+            alerts = self._hysteresis(raw, seen, checked)
+            alerts = self._flaps(raw, alerts, now)
+            alerts = self._mute(alerts)
+            alerts = self._coalesce(alerts)
+            return self._limit(alerts, now)
+
+    def _hysteresis(self, raw, seen, checked):
+        alerts = []
+        went_off = {}
+        for alert in raw:
+            type, mac = alert[0], alert[1]
+            if type == "device_offline":
+                went_off[mac] = alert
+            elif type == "device_back_online":
+                if mac in self._pending:
+                    del self._pending[mac]
+                    ALERTS.inc(type, "hysteresis")
+                else:
+                    # announced offline, or offline since before this process started
+                    self._announced_offline.discard(mac)
+                    alerts.append(alert)
+            else:
+                alerts.append(alert)
+
+        for mac in [m for m in self._pending if m in seen]:
+            del self._pending[mac]  # answered while still within the grace period
+        for mac, entry in list(self._pending.items()):
+            if checked is None or mac in checked:
+                entry[0] += 1
+        for mac, alert in went_off.items():
+            self._pending[mac] = [1, alert]
+        for mac, (misses, alert) in list(self._pending.items()):
+            if misses >= self.offline_after:
+                del self._pending[mac]
+                self._announced_offline.add(mac)
+                alerts.append(alert)
+        return alerts
+
+    def _flaps(self, raw, alerts, now):
+        for mac in [m for m, times in self._transitions.items() if now - times[-1] > self.flap_window]:
+            del self._transitions[mac]
+            self._flapping.discard(mac)
+
+        out = []
+        # counted on raw changes, so blips hidden by the hysteresis still count
+        for type, mac, ip, _ in raw:
+            if type not in ("device_offline", "device_back_online"):
+                continue
+            times = self._transitions.setdefault(mac, deque(maxlen=self.flap_threshold))
+            times.append(now)
+            if (mac not in self._flapping and len(times) >= self.flap_threshold
+                    and now - times[0] <= self.flap_window):
+                self._flapping.add(mac)
+                out.append(("device_flapping", mac, ip,
+                            f"Device flapping: {mac} changed state {len(times)} times in "
+                            f"{int(now - times[0])}s; further changes muted"))
+        for alert in alerts:
+            if alert[0] in ("device_offline", "device_back_online") and alert[1] in self._flapping:
+                ALERTS.inc(alert[0], "flapping")
+            else:
+                out.append(alert)
+        return out
+
+    def _mute(self, alerts):
+        out = []
+        for alert in alerts:
+            if alert[0] in self.muted:
+                ALERTS.inc(alert[0], "muted")
+            else:
+                out.append(alert)
+        return out
+
+    def _coalesce(self, alerts):
+        by_type = {}
+        for alert in alerts:
+            by_type.setdefault(alert[0], []).append(alert)
+        out = []
+        for type, group in by_type.items():
+            if len(group) <= self.coalesce_threshold or type not in _SUMMARY:
+                out.extend(group)
+                continue
+            ALERTS.inc(type, "coalesced", amount=len(group))
+            macs = ", ".join(a[1] for a in group[:_LISTED])
+            more = f" and {len(group) - _LISTED} more" if len(group) > _LISTED else ""
+            out.append((type, None, None, f"{_SUMMARY[type].format(n=len(group))}: {macs}{more}"))
+        return out
+
+    def _limit(self, alerts, now):
+        if self._refilled is not None:
+            self._tokens = min(self.burst, self._tokens + (now - self._refilled) * self.rate)
+        self._refilled = now
+        out = []
+        if self._dropped and self._tokens >= 1:
+            self._tokens -= 1
+            out.append(("alerts_suppressed", None, None,
+                        f"{self._dropped} alerts dropped by the rate limit"))
+            self._dropped = 0
+        for alert in alerts:
+            if self._tokens >= 1:
+                self._tokens -= 1
+                out.append(alert)
+                ALERTS.inc(alert[0], "stored")
+            else:
+                self._dropped += 1
+                ALERTS.inc(alert[0], "rate_limited")
+        return out
+
+    def state(self) -> dict:
+        with self._lock:
+            return {
+                "pending_offline": sorted(self._pending),
+                "announced_offline": len(self._announced_offline),
+                "flapping": sorted(self._flapping),
+                "tokens": round(self._tokens, 1),
+                "dropped_pending_report": self._dropped,
+            }
+
+
+rules = AlertRules()
@@ -0,0 +1,209 @@
+# backend/app/services/bandwidth.py
+
+import logging
+import secrets
+import threading
+import time
+import zlib
+from array import array
+
+from backend.app.config import BANDWIDTH_AVERAGES, BANDWIDTH_HISTORY, BANDWIDTH_INTERVAL_SECONDS
+from backend.app.services.snapshot import render_json
+
+log = logging.getLogger(__name__)
+
+TOTAL = "total"  # every interface except loopback, summed
+
+# every worker samples on its own: history ETags from another process or run must never match
+_RUN = secrets.token_hex(4)
+
+
+def _read_counters():
+    import psutil
+    return psutil.net_io_counters(pernic=True)
+
+
+def _is_loopback(nic: str) -> bool:
+    return nic == "lo" or nic.startswith("lo0") or "loopback" in nic.lower()
+
+
+class RateRing:
+    """
+    Fixed-size ring of (time, rx bytes/s, tx bytes/s) samples in three
+    ``array('d')`` columns: 24 bytes a sample, no per-sample objects.
+    """
+
+    def __init__(self, size: int):
+        self.size = size
+        self.t = array("d", bytes(8 * size))
+        self.rx = array("d", bytes(8 * size))
+        self.tx = array("d", bytes(8 * size))
+        self.count = 0
+        self._head = 0  # next slot to write
+
+    def append(self, t: float, rx: float, tx: float):
+        i = self._head
+        self.t[i], self.rx[i], self.tx[i] = t, rx, tx
+        self._head = (i + 1) % self.size
+        self.count = min(self.count + 1, self.size)
+
+    def _ordered(self, column: array, n: int) -> array:
+        """The newest ``n`` values of ``column``, oldest first (two slice copies, no Python loop)."""
+        n = min(n, self.count)
+        start = self._head - n
+        if start >= 0:
+            return column[start:self._head]
+        return column[start:] + column[:self._head]
+
+    def window(self, n: int) -> tuple[array, array, array]:
+        return self._ordered(self.t, n), self._ordered(self.rx, n), self._ordered(self.tx, n)
+
+    def summary(self, interval: float, averages=BANDWIDTH_AVERAGES) -> dict:
+        _, rx, tx = self.window(self.count)
+        if not rx:
+            return {"rx_bps": None, "tx_bps": None, "averages": {}, "peak_rx_bps": None, "peak_tx_bps": None}
+        avg = {}
+        for seconds in averages:
+            n = max(1, min(len(rx), round(seconds / interval)))
+            avg[f"{seconds}s"] = {"rx_bps": round(sum(rx[-n:]) / n, 1), "tx_bps": round(sum(tx[-n:]) / n, 1)}
+        return {
+            "rx_bps": round(rx[-1], 1),
+            "tx_bps": round(tx[-1], 1),
+            "averages": avg,
+            "peak_rx_bps": round(max(rx), 1),
+            "peak_tx_bps": round(max(tx), 1),
+        }
+
+
+def _downsample(values: array, step: int) -> list[float]:
+    if step <= 1:
+        return [round(v, 1) for v in values]
+    return [round(sum(values[i:i + step]) / len(values[i:i + step]), 1) for i in range(0, len(values), step)]
+
+
+class BandwidthSampler:
+    """
+    Reads per-interface byte counters every ``interval`` seconds and
+    keeps a ring of rates per interface (plus a loopback-free total), so
+    API requests and dashboards read memory instead of calling psutil.
+    Counter resets (interface re-created, 32-bit wrap) produce a gap
+    rather than a bogus spike, in the total too: it would under-count.
+    """
+
+    def __init__(self, interval=BANDWIDTH_INTERVAL_SECONDS, history=BANDWIDTH_HISTORY, counters=None):
+        self.interval = interval
+        self.history = history
+        self._counters = counters or _read_counters
+        self._rings = {}
+        self._last = None  # (time, {nic: (recv, sent)})
+        self.totals = None  # latest cumulative (bytes_recv, bytes_sent) across non-loopback interfaces
+        self.samples = 0
+        self._rendered = {}  # summaries and history bodies for the latest sample
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+        self._failing = False
+
+    def sample(self, now=None):
+        now = time.time() if now is None else now
+        counters = {nic: (c.bytes_recv, c.bytes_sent) for nic, c in self._counters().items()}
+        external = [c for nic, c in counters.items() if not _is_loopback(nic)]
+        with self._lock:
+            self.totals = (sum(c[0] for c in external), sum(c[1] for c in external))
+            last, self._last = self._last, (now, counters)
+            if last is None or now <= last[0]:
+                return
+            dt = now - last[0]
+            total_rx = total_tx = 0.0
+            reset = False
+            for nic, (recv, sent) in counters.items():
+                prev = last[1].get(nic)
+                if prev is None:
+                    continue
+                if recv < prev[0] or sent < prev[1]:
+                    reset = reset or not _is_loopback(nic)
+                    continue
+                rx, tx = (recv - prev[0]) / dt, (sent - prev[1]) / dt
+                self._ring(nic).append(now, rx, tx)
+                if not _is_loopback(nic):
+                    total_rx += rx
+                    total_tx += tx
+            if not reset:
+                self._ring(TOTAL).append(now, total_rx, total_tx)
+            self.samples += 1
+            self._rendered.clear()
+
+    def _ring(self, nic) -> RateRing:
+        ring = self._rings.get(nic)
+        if ring is None:
+            ring = self._rings[nic] = RateRing(self.history)
+        return ring
+
+    def _run(self):
+        while not self._stop.is_set():
+            started = time.monotonic()
+            try:
+                self.sample()
+                self._failing = False
+            except Exception:
+                # counters unavailable this tick; try again next one, but say so once per outage
+                if not self._failing:
+                    log.exception("Reading the interface counters failed")
+                self._failing = True
+            self._stop.wait(max(0.0, self.interval - (time.monotonic() - started)))
+
+    def start(self):
+        if self._thread is None:
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name="bandwidth-sampler", daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=self.interval + 1)
+            self._thread = None
+
+    def interfaces(self) -> list[str]:
+        with self._lock:
+            return sorted(self._rings)
+
+    def summary(self, nic=TOTAL) -> dict | None:
+        with self._lock:
+            cached = self._rendered.get(nic)
+            if cached is None:
+                ring = self._rings.get(nic)
+                if ring is None:
+                    return None
+                cached = self._rendered[nic] = ring.summary(self.interval)
+            return cached
+
+    def history_json(self, nic=TOTAL, seconds=300, step=1) -> tuple[bytes, str] | None:
+        """
+        The last ``seconds`` of rates for ``nic`` as JSON, averaged into
+        buckets of ``step`` samples, and its ETag. Rendered once per
+        (query, sample).
+        """
+        key = (nic, seconds, step)
+        with self._lock:
+            cached = self._rendered.get(key)
+            if cached is not None:
+                return cached
+            ring = self._rings.get(nic)
+            if ring is None:
+                return None
+            t, rx, tx = ring.window(max(1, round(seconds / self.interval)))
+            body = render_json({
+                "interface": nic,
+                "interval": self.interval * step,
+                "t": [round(v, 3) for v in t[::step]],
+                "rx_bps": _downsample(rx, step),
+                "tx_bps": _downsample(tx, step),
+                "summary": ring.summary(self.interval),
+            })
+            etag = f'"{_RUN}-bw-{self.samples}-{zlib.crc32(repr(key).encode()):x}"'
+            self._rendered[key] = (body, etag)
+            return body, etag
+
+
+sampler = BandwidthSampler()
@@ -0,0 +1,237 @@
+# backend/app/services/collector.py
+
+import datetime
+import json
+import logging
+import threading
+import time
+import zlib
+
+from backend.app.config import COLLECTOR_MAX_BATCH_BYTES, COLLECTOR_PUBLISH_SECONDS
+from backend.app.database import apply_site_batch, get_agents, get_all_devices, get_site_devices
+from backend.app.metrics import registry
+from backend.app.registry import FIELDS, Device, DeviceRegistry
+from backend.app.services import snapshot
+
+log = logging.getLogger(__name__)
+
+DELTAS = registry.counter("netview_collector_deltas_total", "Agent deltas received, by what was done with them",
+                          ("outcome",))
+PUSH_BYTES = registry.counter("netview_collector_push_bytes_total", "Compressed bytes pushed by agents")
+
+# last_seen of a site's unchanged online devices is refreshed in memory only
+# this often (the DB rows are updated on every push): a new Device per device
+# per push would defeat the identity checks that keep publishing incremental
+_LAST_SEEN_RESOLUTION = 60
+
+
+def decode_batch(body: bytes, limit=COLLECTOR_MAX_BATCH_BYTES) -> list[dict]:
+    """
+    The deltas in one push: NDJSON, gzip-compressed as one stream or as
+    concatenated members (agents send their spool files back to back).
+    Raises ValueError if it is malformed or inflates past ``limit``.
+    """
+    PUSH_BYTES.inc(amount=len(body))
+    chunks, size = [], 0
+    try:
+        while body:
+            inflater = zlib.decompressobj(wbits=31)
+            chunk = inflater.decompress(body, limit - size + 1)
+            size += len(chunk)
+            if size > limit or inflater.unconsumed_tail:
+                raise ValueError(f"push inflates past {limit} bytes")
+            if not inflater.eof:
+                raise ValueError("truncated gzip stream")
+            chunks.append(chunk)
+            body = inflater.unused_data
+    except zlib.error as e:
+        raise ValueError(f"bad gzip stream: {e}") from None
+    deltas = [json.loads(line) for line in b"".join(chunks).splitlines() if line.strip()]
+    if not deltas or not all(isinstance(d, dict) for d in deltas):
+        raise ValueError("no deltas")
+    return deltas
+
+
+def _time(value):
+    if value is None or isinstance(value, datetime.datetime):
+        return value
+    if isinstance(value, (int, float)):
+        return datetime.datetime.fromtimestamp(value, datetime.timezone.utc)
+    return datetime.datetime.fromisoformat(value)
+
+
+def _device(site, row) -> Device:
+    mac, ip, online, first_seen, last_seen, name, hostname, vendor, tags, notes = row
+    return Device(mac.lower(), ip, online, _time(first_seen), _time(last_seen), name, hostname, vendor,
+                  tags, notes, site)
+
+
+def _replace(dev: Device, **changes) -> Device:
+    # published registries share Device objects: never modify one in place
+    return Device(*(changes[f] if f in changes else getattr(dev, f) for f in FIELDS))
+
+
+class Collector:
+    """
+    Central side of multi-site mode. Agents push their sweeps as
+    sequenced deltas; a push is checked against the last sequence number
+    applied for its site (replays are skipped, a gap or an unknown agent
+    gets a request for a full resync), applied to the in-memory site
+    tables and written in one transaction. The snapshot the API serves
+    is rebuilt from all sites at most every ``publish_interval`` seconds,
+    however many agents push in between.
+    """
+
+    def __init__(self, publish_interval=COLLECTOR_PUBLISH_SECONDS):
+        self.publish_interval = publish_interval
+        self._sites = {}  # site -> {mac: Device}; replaced, never modified, on ingest
+        self._agents = {}  # site -> [agent, seq, last_contact]
+        self._alerts = []  # applied since the last publish
+        self._seen = {}  # site -> when its devices' last_seen was last refreshed in memory
+        self._dirty = False
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+        self._stats = {"pushes": 0, "deltas": 0, "replays": 0, "resyncs_requested": 0, "publishes": 0,
+                       "last_publish_seconds": None}
+
+    @property
+    def running(self) -> bool:
+        return self._thread is not None
+
+    def load(self):
+        """Pick up where the last run left off: site devices and agent positions from the DB."""
+        sites = {}
+        for row in get_site_devices():
+            dev = Device(*row)
+            sites.setdefault(dev.site, {})[dev.mac] = dev
+        agents = {site: list(state) for site, state in get_agents().items()}
+        with self._lock:
+            self._sites, self._agents = sites, agents
+
+    def registry(self) -> DeviceRegistry:
+        with self._lock:
+            sites = list(self._sites.values())
+        return DeviceRegistry(dev for devices in sites for dev in devices.values())
+
+    def ingest(self, deltas) -> dict:
+        """
+        Apply one push, all from one site. Returns the last sequence
+        number applied for the pushing agent and whether it must send a
+        full copy next.
+        """
+        site = deltas[0]["site"]
+        if not isinstance(site, str) or not site or any(d["site"] != site for d in deltas):
+            raise ValueError("a push must come from one named site")
+        pushing = deltas[-1]["agent"]
+        with self._lock:
+            agent, seq, _ = self._agents.get(site) or (None, 0, None)
+            devices = dict(self._sites.get(site, {}))
+            changed, removed, alerts = {}, set(), []
+            at, seen_at = 0.0, None
+            resync = False
+            applied = 0
+            for delta in sorted(deltas, key=lambda d: d["seq"]):
+                if delta["agent"] == agent and delta["seq"] <= seq:
+                    DELTAS.inc("replayed")
+                    self._stats["replays"] += 1
+                    continue
+                if not delta["full"] and (delta["agent"] != agent or delta["seq"] != seq + 1):
+                    resync = True  # deltas were lost, or this agent's history is unknown here
+                    break
+                if delta["full"]:
+                    removed.update(devices)
+                    devices = {}
+                for row in delta["devices"]:
+                    dev = _device(site, row)
+                    devices[dev.mac] = changed[dev.mac] = dev
+                    removed.discard(dev.mac)
+                for mac in delta.get("removed", ()):
+                    if devices.pop(mac, None) is not None:
+                        changed.pop(mac, None)
+                        removed.add(mac)
+                for mac in delta["offline"]:
+                    dev = devices.get(mac)
+                    if dev is not None and dev.online:
+                        devices[mac] = changed[mac] = _replace(dev, online=0)
+                alerts.extend((type, mac, ip, f"[{site}] {message}") for type, mac, ip, message in delta["alerts"])
+                agent, seq = delta["agent"], delta["seq"]
+                at = delta["at"]
+                applied += 1
+
+            if applied:
+                seen_at = _time(at)
+                if at - self._seen.get(site, 0) >= _LAST_SEEN_RESOLUTION:
+                    self._seen[site] = at
+                    for mac, dev in devices.items():
+                        if dev.online:
+                            devices[mac] = _replace(dev, last_seen=seen_at)
+                apply_site_batch(site, agent, seq, [[getattr(d, f) for f in FIELDS] for d in changed.values()],
+                                 removed, alerts, seen_at)
+                self._sites[site] = devices
+                self._alerts.extend(alerts)
+                self._dirty = True
+                DELTAS.inc("applied", amount=applied)
+            if agent is not None:
+                self._agents[site] = [agent, seq, time.time()]
+            if resync:
+                DELTAS.inc("resync_requested")
+                self._stats["resyncs_requested"] += 1
+            self._stats["pushes"] += 1
+            self._stats["deltas"] += applied
+        return {"acked": seq if agent == pushing else 0, "resync": resync}
+
+    def publish(self):
+        with self._lock:
+            alerts, self._alerts = self._alerts, []
+            self._dirty = False
+        started = time.perf_counter()
+        snapshot.publish(self.registry(), alerts)
+        self._stats["publishes"] += 1
+        self._stats["last_publish_seconds"] = round(time.perf_counter() - started, 4)
+
+    def _run(self):
+        while not self._stop.wait(self.publish_interval):
+            if self._dirty:
+                try:
+                    self.publish()
+                except Exception:
+                    log.exception("Publishing the collected sites failed")
+
+    def start(self):
+        if self._thread is not None:
+            return
+        self.load()
+        snapshot.set_source(self.registry)
+        self.publish()
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="collector-publisher", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        if self._thread is None:
+            return
+        self._stop.set()
+        self._thread.join()
+        self._thread = None
+        if self._dirty:
+            self.publish()
+        snapshot.set_source(get_all_devices)
+
+    def sites(self) -> list[dict]:
+        with self._lock:
+            sites, agents = dict(self._sites), {site: list(state) for site, state in self._agents.items()}
+        return [{
+            "site": site,
+            "agent": agents.get(site, (None,))[0],
+            "seq": agents.get(site, (None, 0))[1],
+            "last_contact": agents.get(site, (None, 0, None))[2],
+            "devices": len(sites.get(site, ())),
+            "online": sum(1 for d in sites.get(site, {}).values() if d.online),
+        } for site in sorted(sites.keys() | agents.keys())]
+
+    def metrics(self) -> dict:
+        return {**self._stats, "running": self.running, "sites": len(self._sites), "pending_publish": self._dirty}
+
+
+collector = Collector()
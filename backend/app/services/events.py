@@ -0,0 +1,173 @@
+# backend/app/services/events.py
+
+import asyncio
+import threading
+from collections import deque
+
+from backend.app.registry import DeviceRegistry
+from backend.app.services import snapshot
+from backend.app.services.snapshot import render_json
+
+_BUFFER_SIZE = 256  # deltas kept for resuming clients
+_KEEPALIVE_SECONDS = 15
+
+# Fields whose change is worth pushing; last_seen moves every sweep
+_TRACKED_FIELDS = ("ip", "online", "name", "hostname", "vendor", "tags", "notes")
+
+
+def diff_devices(old: list[dict], new: list[dict]) -> dict:
+    """Devices added, changed (incl. back online) or gone offline between two lists."""
+    if isinstance(old, DeviceRegistry) and isinstance(new, DeviceRegistry):
+        find = old.find
+    else:
+        before = {(d.get("site"), d["mac"]): d for d in old}
+
+        def find(d):
+            return before.get((d.get("site"), d["mac"]))
+    added, changed, offline = [], [], []
+    for dev in new:
+        prev = find(dev)
+        if prev is dev:  # registries built from the same objects (collector mode)
+            continue
+        if prev is None:
+            added.append(dev)
+        elif prev["online"] and not dev["online"]:
+            offline.append(dev["mac"])
+        elif any(prev.get(f) != dev.get(f) for f in _TRACKED_FIELDS):
+            changed.append(dev)
+    return {"added": added, "changed": changed, "offline": offline}
+
+
+class EventLog:
+    """
+    Ring buffer of pre-rendered SSE frames. A frame's sequence number is
+    the version of the snapshot it describes, so the number skips the
+    publishes that changed nothing and every worker gives one event the
+    same id. Written from the scan thread, read by any number of asyncio
+    stream handlers.
+    """
+
+    def __init__(self, size=_BUFFER_SIZE):
+        self.epoch = None
+        self._frames = deque(maxlen=size)  # (seq, frame)
+        self._seq = 0
+        self._floor = 0  # the frames hold every change after this seq
+        self._lock = threading.Lock()
+        self._waiters = set()  # (loop, asyncio.Event)
+
+    @property
+    def seq(self) -> int:
+        return self._seq
+
+    def restart(self, epoch: str, seq: int):
+        """Forget every frame; resuming is only possible from ``seq`` on."""
+        with self._lock:
+            self.epoch = epoch
+            self._frames.clear()
+            self._seq = self._floor = seq
+
+    def advance(self, seq: int):
+        """Note a version that changed nothing."""
+        with self._lock:
+            self._seq = max(self._seq, seq)
+
+    def append(self, event: str, payload: dict, seq: int | None = None) -> int:
+        with self._lock:
+            seq = self._seq + 1 if seq is None else seq
+            if len(self._frames) == self._frames.maxlen:
+                self._floor = self._frames[0][0]  # about to be dropped
+            self._seq = seq
+            self._frames.append((seq, _frame(self.epoch, seq, event, {"seq": seq, **payload})))
+            waiters = list(self._waiters)
+        for loop, waiter in waiters:
+            loop.call_soon_threadsafe(waiter.set)
+        return seq
+
+    def since(self, seq: int) -> list[tuple[int, bytes]] | None:
+        """Frames after ``seq``, or None if some have been dropped or ``seq`` was never reached."""
+        with self._lock:
+            if seq == self._seq:
+                return []
+            if seq > self._seq or seq < self._floor:
+                return None
+            return [f for f in self._frames if f[0] > seq]
+
+    def subscribe(self) -> tuple:
+        waiter = (asyncio.get_running_loop(), asyncio.Event())
+        with self._lock:
+            self._waiters.add(waiter)
+        return waiter
+
+    def unsubscribe(self, waiter):
+        with self._lock:
+            self._waiters.discard(waiter)
+
+
+def _frame(epoch: str | None, seq: int, event: str, payload: dict) -> bytes:
+    return b"id: %s-%d\nevent: %s\ndata: %s\n\n" % ((epoch or "").encode(), seq, event.encode(), render_json(payload))
+
+
+log = EventLog()
+
+
+def _on_publish(previous, snap):
+    if previous is None or previous.epoch != snap.epoch:
+        # nothing a client holds can be resumed against this process's first snapshot
+        log.restart(snap.epoch, snap.version)
+        return
+    delta = diff_devices(previous.devices, snap.devices)
+    alerts = [
+        {"type": type, "mac": mac, "ip": ip, "message": message}
+        for type, mac, ip, message in snap.alerts
+    ]
+    if alerts or any(delta.values()):
+        log.append("delta", {"version": snap.version, **delta, "alerts": alerts}, snap.version)
+    else:
+        log.advance(snap.version)
+
+
+snapshot.subscribe(_on_publish)
+
+
+def _parse_last_id(last_id: str | None) -> int | None:
+    """Sequence number to resume after, or None if it came from another run."""
+    if not last_id:
+        return log.seq
+    epoch, _, seq = last_id.rpartition("-")
+    if epoch and epoch != log.epoch:
+        return None
+    try:
+        return int(seq)
+    except ValueError:
+        return None
+
+
+def _reset_frame() -> tuple[int, bytes]:
+    snap = snapshot.current()
+    seq = snap.version
+    return seq, _frame(snap.epoch, seq, "reset", {"seq": seq, "version": seq, "devices": snap.devices})
+
+
+async def stream(last_id: str | None, is_disconnected):
+    """Yield SSE frames after ``last_id`` until the client goes away."""
+    waiter = log.subscribe()
+    _, wakeup = waiter
+    try:
+        cursor = _parse_last_id(last_id)
+        while True:
+            frames = log.since(cursor) if cursor is not None else None
+            if frames is None:
+                frames = [_reset_frame()]
+            for seq, frame in frames:
+                cursor = seq
+                yield frame
+
+            try:
+                await asyncio.wait_for(wakeup.wait(), _KEEPALIVE_SECONDS)
+            except asyncio.TimeoutError:
+                if await is_disconnected():
+                    break
+                yield b": keepalive\n\n"
+            wakeup.clear()
+    finally:
+        log.unsubscribe(waiter)
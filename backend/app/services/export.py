@@ -0,0 +1,57 @@
+# backend/app/services/export.py
+
+import csv
+import io
+
+from backend.app.database import ALERT_COLUMNS
+from backend.app.registry import FIELDS, Device
+from backend.app.services.snapshot import render_json
+
+MEDIA_TYPES = {"ndjson": "application/x-ndjson", "csv": "text/csv; charset=utf-8"}
+
+
+def _csv_value(value):
+    if value is None:
+        return ""
+    if isinstance(value, tuple):
+        return ";".join(value)
+    return value.isoformat() if hasattr(value, "isoformat") else value
+
+
+def _csv_chunk(header, rows) -> bytes:
+    buf = io.StringIO()
+    writer = csv.writer(buf)
+    if header:
+        writer.writerow(header)
+    writer.writerows([_csv_value(v) for v in row] for row in rows)
+    return buf.getvalue().encode()
+
+
+def devices(batches, format: str):
+    """
+    Encode batches of device rows as NDJSON or CSV, one chunk per batch,
+    so memory use is bounded by the batch size rather than the table.
+    """
+    header = FIELDS
+    for batch in batches:
+        devs = [Device(*row) for row in batch]
+        if format == "csv":
+            yield _csv_chunk(header, ([getattr(d, f) for f in FIELDS] for d in devs))
+            header = None
+        else:
+            yield "".join(d.to_json() + "\n" for d in devs).encode()
+    if format == "csv" and header:
+        yield _csv_chunk(header, ())
+
+
+def alerts(batches, format: str):
+    """Like devices(), for alert rows."""
+    header = ALERT_COLUMNS
+    for batch in batches:
+        if format == "csv":
+            yield _csv_chunk(header, batch)
+            header = None
+        else:
+            yield b"".join(render_json(dict(zip(ALERT_COLUMNS, row))) + b"\n" for row in batch)
+    if format == "csv" and header:
+        yield _csv_chunk(header, ())
@@ -0,0 +1,374 @@
+# backend/app/services/fingerprint.py
+
+import asyncio
+import logging
+import re
+import struct
+import time
+
+from backend.app.config import (
+    FINGERPRINT_PORTS,
+    FINGERPRINT_NAME_QUERIES,
+    FINGERPRINT_CONCURRENCY,
+    FINGERPRINT_PER_HOST,
+    FINGERPRINT_RATE_PPS,
+    FINGERPRINT_TIMEOUT,
+    FINGERPRINT_BANNER_TIMEOUT,
+    FINGERPRINT_BANNER_BYTES,
+    FINGERPRINT_TTL,
+)
+from backend.app.database import get_fingerprints, put_fingerprints
+from backend.app.metrics import registry
+
+log = logging.getLogger(__name__)
+
+PROBES = registry.counter("netview_fingerprint_probes_total", "Service probes sent, by kind and result",
+                          ("kind", "result"))
+
+NAME_PORTS = {"mdns": 5353, "netbios": 137, "ssdp": 1900}
+
+SERVICES = {
+    21: "ftp", 22: "ssh", 23: "telnet", 25: "smtp", 53: "dns", 80: "http", 110: "pop3", 139: "netbios-ssn",
+    143: "imap", 443: "https", 445: "smb", 548: "afp", 554: "rtsp", 631: "ipp", 1883: "mqtt", 3389: "rdp",
+    5000: "upnp", 8008: "http", 8080: "http-alt", 8443: "https-alt", 9100: "jetdirect", 62078: "iphone-sync",
+}
+_HTTP_PORTS = {80, 5000, 8008, 8080}  # sent a HEAD request; the Server header is the banner
+# never speak first (or only after a TLS/binary handshake): open is all a connect tells us
+_SILENT_PORTS = {53, 139, 443, 445, 548, 554, 631, 1883, 3389, 8443, 9100, 62078}
+
+# (lowercase text found in a banner or SSDP server string, OS), first match wins
+_OS_HINTS = (
+    ("windows", "Windows"), ("microsoft", "Windows"), ("darwin", "macOS"), ("mac os", "macOS"),
+    ("android", "Android"), ("freebsd", "FreeBSD"), ("openbsd", "OpenBSD"), ("routeros", "RouterOS"),
+    ("ubuntu", "Linux"), ("debian", "Linux"), ("raspbian", "Linux"), ("openwrt", "Linux"), ("linux", "Linux"),
+)
+_PORT_HINTS = ((62078, "iOS"), (3389, "Windows"), (548, "macOS"))
+
+_PRINTABLE = re.compile(r"[^\x20-\x7e]+")
+
+
+def _clean(text: str, limit=200) -> str | None:
+    text = _PRINTABLE.sub(" ", text).strip()
+    return text[:limit] or None
+
+
+def parse_banner(data: bytes, http=False) -> str | None:
+    """The HTTP Server header, or else the first line of what the service sent."""
+    text = data.decode("utf-8", "replace")
+    if http:
+        for line in text.split("\r\n")[1:]:
+            name, _, value = line.partition(":")
+            if name.strip().lower() == "server":
+                return _clean(value)
+    return _clean(text.split("\n", 1)[0])
+
+
+# --- UDP name queries ---------------------------------------------------
+
+def _dns_query(name: str, qtype: int, id=0) -> bytes:
+    qname = b"".join(bytes([len(label)]) + label.encode() for label in name.split(".")) + b"\0"
+    return struct.pack(">HHHHHH", id, 0, 1, 0, 0, 0) + qname + struct.pack(">HH", qtype, 1)
+
+
+def _read_name(data: bytes, offset: int) -> tuple[str, int]:
+    """A (possibly compressed) DNS name at ``offset``, and the offset after it."""
+    labels = []
+    end = None
+    for _ in range(128):
+        length = data[offset]
+        if length & 0xC0 == 0xC0:
+            if end is None:
+                end = offset + 2
+            offset = (length & 0x3F) << 8 | data[offset + 1]
+            continue
+        offset += 1
+        if length == 0:
+            return ".".join(labels), offset if end is None else end
+        labels.append(data[offset:offset + length].decode("utf-8", "replace"))
+        offset += length
+    raise ValueError("DNS name loops")
+
+
+def _answers(data: bytes):
+    """(type, rdata offset, rdlength) of each answer record in a DNS reply."""
+    _, _, qdcount, ancount = struct.unpack_from(">HHHH", data)
+    offset = 12
+    for _ in range(qdcount):
+        offset = _read_name(data, offset)[1] + 4
+    for _ in range(ancount):
+        offset = _read_name(data, offset)[1]
+        type, _, _, length = struct.unpack_from(">HHIH", data, offset)
+        offset += 10
+        yield type, offset, length
+        offset += length
+
+
+def mdns_query(ip: str) -> bytes:
+    """Reverse (PTR) lookup of ``ip`` sent straight to its mDNS responder."""
+    return _dns_query(".".join(reversed(ip.split("."))) + ".in-addr.arpa", 12)
+
+
+def parse_mdns(data: bytes) -> dict | None:
+    for type, offset, _ in _answers(data):
+        if type == 12:
+            return {"hostname": _read_name(data, offset)[0]}
+    return None
+
+
+# node status request for the wildcard name "*"
+NETBIOS_QUERY = (struct.pack(">HHHHHH", 0x4E42, 0, 1, 0, 0, 0)
+                 + b"\x20CK" + b"AA" * 15 + b"\0" + struct.pack(">HH", 0x21, 1))
+
+
+def parse_netbios(data: bytes) -> dict | None:
+    """Computer name and workgroup from a NetBIOS node status reply."""
+    for type, offset, _ in _answers(data):
+        if type != 0x21:
+            continue
+        names = {}
+        for i in range(data[offset]):
+            entry = offset + 1 + 18 * i
+            name = data[entry:entry + 15].decode("ascii", "replace").strip()
+            suffix, flags = data[entry + 15], struct.unpack_from(">H", data, entry + 16)[0]
+            if suffix == 0:
+                names.setdefault("workgroup" if flags & 0x8000 else "name", name)
+        return names or None
+    return None
+
+
+SSDP_QUERY = (b"M-SEARCH * HTTP/1.1\r\nHOST: 239.255.255.250:1900\r\n"
+              b'MAN: "ssdp:discover"\r\nMX: 1\r\nST: ssdp:all\r\n\r\n')
+
+
+def parse_ssdp(data: bytes) -> dict | None:
+    headers = {}
+    for line in data.decode("utf-8", "replace").split("\r\n")[1:]:
+        name, sep, value = line.partition(":")
+        if sep and name.strip().lower() in ("server", "location", "st"):
+            headers[name.strip().lower()] = _clean(value, 300)
+    return headers or None
+
+
+_NAME_QUERIES = {
+    "mdns": (mdns_query, parse_mdns),
+    "netbios": (lambda ip: NETBIOS_QUERY, parse_netbios),
+    "ssdp": (lambda ip: SSDP_QUERY, parse_ssdp),
+}
+
+
+class _Reply(asyncio.DatagramProtocol):
+    def __init__(self, future):
+        self.future = future
+
+    def datagram_received(self, data, addr):
+        if not self.future.done():
+            self.future.set_result(data)
+
+    def error_received(self, exc):
+        # ICMP port unreachable arrives here on a connected socket
+        if not self.future.done():
+            self.future.set_exception(exc)
+
+
+def guess_os(ports, names) -> str | None:
+    """A best guess from banners, the SSDP server string and telltale ports."""
+    texts = [p["banner"] for p in ports if p.get("banner")]
+    texts.append((names.get("ssdp") or {}).get("server"))
+    for text in filter(None, texts):
+        text = text.lower()
+        for hint, os in _OS_HINTS:
+            if hint in text:
+                return os
+    open_ports = {p["port"] for p in ports}
+    for port, os in _PORT_HINTS:
+        if port in open_ports:
+            return os
+    return None
+
+
+class _Pacer:
+    """Spaces probe starts ``1 / rate`` seconds apart (no limit if rate is 0)."""
+
+    def __init__(self, rate):
+        self.gap = 1 / rate if rate else 0
+        self._next = 0.0
+
+    async def wait(self):
+        if not self.gap:
+            return
+        now = time.monotonic()
+        at = max(now, self._next)
+        self._next = at + self.gap
+        if at > now:
+            await asyncio.sleep(at - now)
+
+
+class Fingerprinter:
+    """
+    Probes discovered devices for open TCP ports (with a banner where the
+    service sends one) and asks them for their names over mDNS, NetBIOS
+    and SSDP. A run works through host:probe pairs with ``concurrency``
+    workers, never more than ``per_host`` of them on one device, and
+    starts at most ``rate_pps`` probes a second; every connect and query
+    has its own timeout. Results are stored per device and a device is
+    probed again only when its IP changes or its result is ``ttl``
+    seconds old.
+    """
+
+    def __init__(self, ports=FINGERPRINT_PORTS, names=FINGERPRINT_NAME_QUERIES,
+                 concurrency=FINGERPRINT_CONCURRENCY, per_host=FINGERPRINT_PER_HOST,
+                 rate_pps=FINGERPRINT_RATE_PPS, timeout=FINGERPRINT_TIMEOUT,
+                 banner_timeout=FINGERPRINT_BANNER_TIMEOUT, banner_bytes=FINGERPRINT_BANNER_BYTES,
+                 ttl=FINGERPRINT_TTL, name_ports=NAME_PORTS):
+        self.ports = tuple(ports)
+        self.names = tuple(names)
+        self.concurrency = concurrency
+        self.per_host = per_host
+        self.rate_pps = rate_pps
+        self.timeout = timeout
+        self.banner_timeout = banner_timeout
+        self.banner_bytes = banner_bytes
+        self.ttl = ttl
+        self.name_ports = name_ports
+        self._stats = {"runs": 0, "hosts_probed": 0, "probes": 0, "open_ports": 0, "running": False,
+                       "last_run_hosts": 0, "last_run_seconds": None, "last_probes_per_second": None}
+
+    def due(self, devices, known, now=None) -> list[tuple[str, str]]:
+        """(mac, ip) of online devices never probed, probed at another IP or probed too long ago."""
+        now = time.time() if now is None else now
+        targets = []
+        for d in devices:
+            if not d["online"] or not d["ip"]:
+                continue
+            fp = known.get(d["mac"])
+            if fp is None or fp["ip"] != d["ip"] or fp["probed_at"] + self.ttl <= now:
+                targets.append((d["mac"], d["ip"]))
+        return targets
+
+    async def _tcp(self, ip, port):
+        try:
+            reader, writer = await asyncio.wait_for(asyncio.open_connection(ip, port), self.timeout)
+        except asyncio.TimeoutError:
+            PROBES.inc("tcp", "timeout")
+            return None
+        except ConnectionRefusedError:
+            PROBES.inc("tcp", "closed")
+            return None
+        except OSError:
+            PROBES.inc("tcp", "error")
+            return None
+        PROBES.inc("tcp", "open")
+        banner = None
+        try:
+            if port not in _SILENT_PORTS:
+                if port in _HTTP_PORTS:
+                    writer.write(b"HEAD / HTTP/1.0\r\n\r\n")
+                data = await asyncio.wait_for(reader.read(self.banner_bytes), self.banner_timeout)
+                banner = parse_banner(data, port in _HTTP_PORTS)
+        except (asyncio.TimeoutError, OSError):
+            pass
+        finally:
+            writer.close()
+        return {"port": port, "service": SERVICES.get(port), "banner": banner}
+
+    async def _name(self, ip, kind):
+        query, parse = _NAME_QUERIES[kind]
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        try:
+            transport, _ = await loop.create_datagram_endpoint(
+                lambda: _Reply(future), remote_addr=(ip, self.name_ports[kind]))
+        except OSError:
+            PROBES.inc(kind, "error")
+            return None
+        try:
+            transport.sendto(query(ip))
+            data = await asyncio.wait_for(future, self.timeout)
+        except asyncio.TimeoutError:
+            PROBES.inc(kind, "timeout")
+            return None
+        except OSError:
+            PROBES.inc(kind, "closed")
+            return None
+        finally:
+            transport.close()
+        try:
+            parsed = parse(data)
+        except (IndexError, ValueError, struct.error):
+            parsed = None
+        PROBES.inc(kind, "answered" if parsed else "unparsed")
+        return parsed
+
+    def _jobs(self, ips):
+        # probe-major order spreads consecutive probes over hosts, so the
+        # per-host limit rarely holds up a worker
+        probes = [("tcp", port) for port in self.ports] + [(kind, None) for kind in self.names]
+        return ((ip, kind, port) for kind, port in probes for ip in ips)
+
+    async def probe(self, ips) -> dict[str, dict]:
+        """ip -> {"ports": [...], "names": {...}} for every IP in ``ips``."""
+        results = {ip: {"ports": [], "names": {}} for ip in ips}
+        host_limits = {ip: asyncio.Semaphore(self.per_host) for ip in results}
+        jobs = self._jobs(list(results))
+        pacer = _Pacer(self.rate_pps)
+        sent = 0
+
+        async def worker():
+            nonlocal sent
+            for ip, kind, port in jobs:
+                async with host_limits[ip]:
+                    await pacer.wait()
+                    sent += 1
+                    if kind == "tcp":
+                        found = await self._tcp(ip, port)
+                        if found:
+                            results[ip]["ports"].append(found)
+                    else:
+                        found = await self._name(ip, kind)
+                        if found:
+                            results[ip]["names"][kind] = found
+
+        await asyncio.gather(*(worker() for _ in range(max(1, self.concurrency))))
+        for result in results.values():
+            result["ports"].sort(key=lambda p: p["port"])
+        self._stats["probes"] += sent
+        return results
+
+    async def run(self, devices) -> int:
+        """Probe whichever of ``devices`` are due and store the results; returns how many."""
+        known = await asyncio.to_thread(get_fingerprints)
+        by_ip = {}  # ip -> macs: probed once, stored for each device answering there
+        for mac, ip in self.due(devices, known):
+            by_ip.setdefault(ip, []).append(mac)
+        if not by_ip:
+            return 0
+        self._stats["running"] = True
+        started = time.perf_counter()
+        probes_before = self._stats["probes"]
+        try:
+            results = await self.probe(list(by_ip))
+        finally:
+            self._stats["running"] = False
+        elapsed = time.perf_counter() - started
+        now = time.time()
+        rows = []
+        for ip, r in results.items():
+            os_guess = guess_os(r["ports"], r["names"])
+            rows.extend((mac, ip, now, r["ports"], r["names"], os_guess) for mac in by_ip[ip])
+        await asyncio.to_thread(put_fingerprints, rows)
+
+        self._stats["runs"] += 1
+        self._stats["hosts_probed"] += len(results)
+        self._stats["open_ports"] += sum(len(r["ports"]) for r in results.values())
+        self._stats["last_run_hosts"] = len(results)
+        self._stats["last_run_seconds"] = round(elapsed, 3)
+        self._stats["last_probes_per_second"] = round((self._stats["probes"] - probes_before) / elapsed, 1)
+        log.info("Fingerprinted %d devices in %.1fs", len(rows), elapsed)
+        return len(rows)
+
+    def metrics(self) -> dict:
+        return {**self._stats, "ports": list(self.ports), "name_queries": list(self.names),
+                "concurrency": self.concurrency, "per_host": self.per_host, "rate_pps": self.rate_pps}
+
+
+fingerprinter = Fingerprinter()
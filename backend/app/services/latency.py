@@ -0,0 +1,100 @@
+# backend/app/services/latency.py
+
+import threading
+import time
+from collections import deque
+
+from backend.app.config import (
+    LATENCY_TARGETS,
+    LATENCY_INTERVAL_SECONDS,
+    LATENCY_TIMEOUT_SECONDS,
+    LATENCY_WINDOW,
+)
+
+
+def ping(*args, **kwargs):
+    """ping3's ping, imported on first use."""
+    from ping3 import ping as ping3_ping
+    return ping3_ping(*args, **kwargs)
+
+
+def summarize(samples) -> dict:
+    """
+    min/avg/p95/jitter (mean absolute delta between consecutive replies)
+    and loss % over a window of samples, where None is a lost probe.
+    """
+    replies = [s for s in samples if s is not None]
+    if not samples:
+        return {"samples": 0, "min": None, "avg": None, "p95": None, "jitter": None, "loss": None}
+    loss = round(100 * (len(samples) - len(replies)) / len(samples), 1)
+    if not replies:
+        return {"samples": len(samples), "min": None, "avg": None, "p95": None, "jitter": None, "loss": loss}
+    ordered = sorted(replies)
+    jitter = (
+        sum(abs(b - a) for a, b in zip(replies, replies[1:])) / (len(replies) - 1)
+        if len(replies) > 1 else 0.0
+    )
+    return {
+        "samples": len(samples),
+        "min": round(ordered[0], 1),
+        "avg": round(sum(replies) / len(replies), 1),
+        "p95": round(ordered[min(len(ordered) - 1, int(0.95 * len(ordered)))], 1),
+        "jitter": round(jitter, 1),
+        "loss": loss,
+    }
+
+
+class LatencyProber:
+    """Pings each target on its own schedule, keeping a rolling window per target."""
+
+    def __init__(self, targets=LATENCY_TARGETS, interval=LATENCY_INTERVAL_SECONDS,
+                 timeout=LATENCY_TIMEOUT_SECONDS, window=LATENCY_WINDOW):
+        self.targets = list(targets)
+        self.interval = interval
+        self.timeout = timeout
+        self._windows = {t: deque(maxlen=window) for t in self.targets}
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def probe_once(self):
+        for target in self.targets:
+            try:
+                delay = ping(target, unit="ms", timeout=self.timeout)
+            except Exception:
+                delay = None
+            # ping3 returns None on timeout and False on error
+            with self._lock:
+                self._windows[target].append(delay if delay else None)
+
+    def _run(self):
+        while not self._stop.is_set():
+            started = time.monotonic()
+            self.probe_once()
+            self._stop.wait(max(0.0, self.interval - (time.monotonic() - started)))
+
+    def start(self):
+        if self._thread is None:
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name="latency-prober", daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=self.timeout + 1)
+            self._thread = None
+
+    def summary(self) -> dict:
+        """Per-target and combined window statistics; pure in-memory read."""
+        with self._lock:
+            windows = {t: list(w) for t, w in self._windows.items()}
+        per_target = {t: summarize(w) for t, w in windows.items()}
+        combined = summarize([s for w in windows.values() for s in w])
+        # jitter only makes sense between consecutive replies from one target
+        jitters = [s["jitter"] for s in per_target.values() if s["jitter"] is not None]
+        combined["jitter"] = round(sum(jitters) / len(jitters), 1) if jitters else None
+        return {**combined, "targets": per_target}
+
+
+prober = LatencyProber()
@@ -0,0 +1,132 @@
+# backend/app/services/leader.py
+
+import asyncio
+import logging
+import os
+import secrets
+import socket
+import time
+
+from backend.app.config import SCANNER_LEASE_SECONDS, SNIFF_ENABLED
+from backend.app.database import acquire_lease, get_lease, release_lease
+from backend.app.services import shared_snapshot, snapshot, topology
+from backend.app.services.agent import agent
+from backend.app.services.network_monitor import get_local_ip, warm_up
+from backend.app.services.scan_engine import ScanEngine
+
+log = logging.getLogger(__name__)
+
+LEASE = "scanner"
+
+
+class ScannerLeader:
+    """
+    Runs the scanner in exactly one process. Every process that may scan
+    contends for the "scanner" lease in the DB and renews it every third
+    of its ttl; the holder runs the scan engine (and the sniffer, if
+    enabled) and writes each snapshot to the shared file, and ships it to
+    the collector if this is a site agent. Everyone else, and any process
+    started with ``contend=False``, just follows that file. If the holder
+    dies its lease expires and another process takes over.
+    """
+
+    def __init__(self, contend=True, ttl=SCANNER_LEASE_SECONDS, sniff=SNIFF_ENABLED, watcher=None):
+        self.contend = contend
+        self.ttl = ttl
+        self.sniff = sniff
+        self.holder = f"{socket.gethostname()}:{os.getpid()}:{secrets.token_hex(2)}"
+        self.engine = None
+        self.sniffer = None
+        self.watcher = watcher or shared_snapshot.SnapshotWatcher()
+        self.leading_since = None
+        self.elections_won = 0
+        self._task = None
+
+    @property
+    def leading(self) -> bool:
+        return self.engine is not None
+
+    def start(self):
+        if self._task is not None:
+            return
+        if self.contend:
+            self._task = asyncio.create_task(self._run(), name="scanner-leader")
+        else:
+            self.watcher.start()
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        if self.leading:
+            await self._demote()
+            await asyncio.to_thread(release_lease, LEASE, self.holder)
+        self.watcher.stop()
+
+    async def _run(self):
+        while True:
+            try:
+                held = await asyncio.to_thread(acquire_lease, LEASE, self.holder, self.ttl)
+            except Exception:
+                log.exception("Renewing the scanner lease failed")
+                held = False
+            if held and not self.leading:
+                await self._promote()
+            elif not held and self.leading:
+                log.warning("Lost the scanner lease; following the shared snapshot")
+                await self._demote()
+            if not self.leading:
+                self.watcher.start()
+            await asyncio.sleep(self.ttl / 3)
+
+    async def _promote(self):
+        await asyncio.to_thread(self.watcher.stop)
+        try:
+            topology.model.set_local_ip(await asyncio.to_thread(get_local_ip))
+        except OSError as e:
+            log.warning("Could not determine the local IP: %s", e)
+        # whatever the previous scanner wrote last is already in the DB
+        await asyncio.to_thread(snapshot.refresh)
+        # reads are already served from the DB; the first sweep waits for this
+        await asyncio.to_thread(warm_up)
+        shared_snapshot.writer.start()
+        if agent.site and agent.url:
+            await asyncio.to_thread(agent.start)
+        if self.sniff:
+            from backend.app.services.sniffer import PassiveSniffer
+            self.sniffer = PassiveSniffer()
+            self.sniffer.start()
+        self.engine = ScanEngine(sniffer=self.sniffer)
+        self.engine.start()
+        self.leading_since = time.time()
+        self.elections_won += 1
+        log.info("Took the scanner lease as %s", self.holder)
+
+    async def _demote(self):
+        if self.sniffer is not None:
+            await asyncio.to_thread(self.sniffer.stop)
+            self.sniffer = None
+        await self.engine.stop()
+        self.engine = None
+        await asyncio.to_thread(shared_snapshot.writer.stop)
+        await asyncio.to_thread(agent.stop)
+        self.leading_since = None
+
+    def metrics(self) -> dict:
+        lease = get_lease(LEASE)
+        return {
+            "role": "scanner" if self.leading else "follower",
+            "holder": self.holder,
+            "contending": self.contend,
+            "lease_holder": lease[0] if lease else None,
+            "lease_expires_in": round(lease[1] - time.time(), 1) if lease else None,
+            "leading_since": self.leading_since,
+            "elections_won": self.elections_won,
+            "snapshot_writes": shared_snapshot.writer.writes,
+            "snapshot_loads": self.watcher.loads,
+            "snapshot_source_version": self.watcher.source_version,
+        }
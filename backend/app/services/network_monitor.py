@@ -1,182 +1,394 @@
+import asyncio
 import time
 import datetime
-import psutil
-import socket
-import requests
-from ping3 import ping
-from scapy.layers.l2 import ARP, Ether
-from scapy.sendrecv import srp
-from manuf import manuf
 import ipaddress
-
-from concurrent.futures import ThreadPoolExecutor, as_completed
+import socket
 
 from backend.app.database import (
     get_all_devices,
-    upsert_device,
-    mark_offline,
-    add_alert,
+    apply_sweep,
 )
-from backend.app.config import SYNC_INTERVAL_SECONDS
-
-_LOOKUP_WORKERS = 10
+from backend.app.registry import DeviceRegistry
+from backend.app.config import SYNC_INTERVAL_SECONDS, SCAN_RATE_PPS, LIVENESS_RETRIES, BANDWIDTH_LOW_TRAFFIC_BPS
+from backend.app.services import alert_rules, bandwidth, latency, snapshot
+from backend.app.tracing import span
+from backend.app.services.scan_planner import enumerate_targets, planner
+from backend.app.services.resolver import COUNTERS as DNS_COUNTERS, resolver as dns_resolver
+from backend.app.services.vendor import resolver as vendor_resolver
+
+_VENDOR_CONCURRENCY = 10
 _VENDOR_TTL = 24 * 3600  # seconds
-_HOST_TTL = 1 * 3600  # seconds
 
 
 def normalize_mac(mac: str) -> str:
     return mac.lower()
 
 
-def get_default_gateway_subnet() -> str | None:
-    sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+def _needs_refresh(last_seen_iso: str | None, ttl: int) -> bool:
+    if not last_seen_iso:
+        return True
     try:
-        sock.connect(("8.8.8.8", 80))
-        local_ip = sock.getsockname()[0]
-    finally:
-        sock.close()
+        dt = datetime.datetime.fromisoformat(last_seen_iso)
+        return (time.time() - dt.timestamp()) > ttl
+    except Exception:
+        return True
 
-    for addrs in psutil.net_if_addrs().values():
-        for snic in addrs:
-            if snic.family == socket.AF_INET and snic.address == local_ip:
-                return str(ipaddress.IPv4Network(f"{local_ip}/{snic.netmask}", strict=False))
-    return None
 
+_vendor_sem = (None, None)
 
-def _reverse_dns(ip: str) -> str | None:
-    try:
-        return socket.gethostbyaddr(ip)[0]
-    except socket.herror:
-        return None
 
+def _vendor_semaphore():
+    """Remote vendor lookup limit, recreated for each event loop that sweeps."""
+    global _vendor_sem
+    loop = asyncio.get_running_loop()
+    if _vendor_sem[0] is not loop:
+        _vendor_sem = (loop, asyncio.Semaphore(_VENDOR_CONCURRENCY))
+    return _vendor_sem[1]
 
-_parser = manuf.MacParser()
 
+async def _vendor_async(mac: str) -> str | None:
+    found, name = vendor_resolver.lookup_local(mac)
+    if found or not vendor_resolver.needs_remote(mac):
+        return name
+    async with _vendor_semaphore():
+        with span("vendor remote", mac=mac):
+            return await asyncio.to_thread(vendor_resolver.lookup_remote, mac)
 
-def _vendor_api(mac: str) -> str | None:
-    # 1) Try public API
-    try:
-        resp = requests.get(f"https://api.macvendors.com/{mac}", timeout=2)
-        resp.raise_for_status()
-        vendor = resp.text.strip()
-        print(f"[VENDOR REMOTE] {mac} → {vendor}")
-        return vendor
-    except Exception:
-        pass
 
-    # 2) Fallback to offline
-    vendor = _parser.get_manuf(mac)
-    print(f"[VENDOR OFFLINE] {mac} → {vendor or 'Unknown'}")
-    return vendor
+async def _hostname_async(ip: str) -> str | None:
+    with span("dns", ip=ip):
+        return await dns_resolver.resolve(ip)
 
 
-def _needs_refresh(last_seen_iso: str | None, ttl: int) -> bool:
-    if not last_seen_iso:
-        return True
-    try:
-        dt = datetime.datetime.fromisoformat(last_seen_iso)
-        return (time.time() - dt.timestamp()) > ttl
-    except Exception:
-        return True
+async def _do_lookup(mac, ip, do_host, do_vend, existing):
+    with span("lookup", ip=ip):
+        hostname, vendor = await asyncio.gather(
+            _hostname_async(ip) if do_host else _value(existing.get("hostname")),
+            _vendor_async(mac) if do_vend else _value(existing.get("vendor")),
+        )
+    return mac, ip, hostname, vendor
 
 
-def _do_lookup(mac, ip, do_host, do_vend, existing):
-    hostname = _reverse_dns(ip) if do_host else existing.get("hostname")
-    vendor = _vendor_api(mac) if do_vend else existing.get("vendor")
-    return mac, ip, hostname, vendor
+async def _value(v):
+    return v
 
 
-def _discover_and_update():
-    """Run one full ARP/DNS/vendor sweep and write into the DB."""
-    all_devices = get_all_devices()
-    by_mac = {normalize_mac(d["mac"]): d for d in all_devices}
-    online_before = {m for m, d in by_mac.items() if d["online"]}
+def srp(*args, **kwargs):
+    """scapy's srp. scapy is imported on first use: it takes ~0.3 s."""
+    from scapy.sendrecv import srp as scapy_srp
+    return scapy_srp(*args, **kwargs)
 
-    subnet = get_default_gateway_subnet()
-    if not subnet:
-        return all_devices
 
+def warm_up():
+    """Load scapy and the vendor index ahead of the first sweep (run in a thread)."""
+    import scapy.layers.l2  # noqa: F401
+    import scapy.sendrecv  # noqa: F401
+    vendor_resolver.load()
+
+
+def _arp_scan(chunk):
+    from scapy.layers.l2 import ARP, Ether
+    started = time.perf_counter()
     answered = srp(
-        Ether(dst="ff:ff:ff:ff:ff:ff") / ARP(pdst=subnet),
-        timeout=2, verbose=False
+        Ether(dst="ff:ff:ff:ff:ff:ff") / ARP(pdst=chunk.network),
+        iface=chunk.iface, timeout=chunk.timeout, retry=chunk.retries,
+        inter=chunk.inter, verbose=False
     )[0]
+    return chunk, answered, time.perf_counter() - started
+
+
+def _merge_sightings(results, seen, sightings, devices):
+    """
+    Add passive (mac -> (ip, hostname)) sightings to a cycle's results,
+    for MACs the cycle itself did not find; returns the MACs added.
+    """
+    added = set()
+    for mac, (ip, hostname) in sightings.items():
+        if mac in seen:
+            continue
+        existing = devices.get(mac, {})
+        vendor = existing.get("vendor") or vendor_resolver.lookup_local(mac)[1]
+        results.append((mac, ip, hostname or existing.get("hostname"), vendor))
+        added.add(mac)
+    return added
+
+
+async def discover_and_update_async(timings: dict | None = None, sightings=None):
+    """
+    Run one full ARP/DNS/vendor sweep and write into the DB.
+
+    Every target subnet is broadcast in chunks planned by the scan
+    planner; DNS/vendor lookups for a chunk's hosts start as soon as that
+    chunk answers, while the rest are still being swept. ``sightings``,
+    if given, is called just before the write for the passive sightings
+    made meanwhile; those devices count as seen. Phase durations are
+    written into ``timings`` if given.
+    """
+    timings = {} if timings is None else timings
+    started = time.perf_counter()
+    dns_before = dns_resolver.stats()
+
+    with span("load devices"):
+        all_devices = DeviceRegistry.of(await asyncio.to_thread(get_all_devices))
+        await asyncio.to_thread(vendor_resolver.load)
+    online_before = all_devices.online_macs()
+
+    with span("enumerate targets"):
+        targets = await asyncio.to_thread(enumerate_targets)
+    if not targets:
+        return all_devices
+
+    arp_sem = asyncio.Semaphore(planner.parallel)
+
+    async def sweep_chunk(chunk):
+        async with arp_sem:
+            with span("arp chunk", network=chunk.network, iface=chunk.iface):
+                return await asyncio.to_thread(_arp_scan, chunk)
 
+    chunks = planner.plan(targets)
+    expected = planner.group_by_chunk(chunks, [d["ip"] for d in all_devices if d["online"] and d["ip"]])
     seen = set()
-    tasks = []
-    for _, pkt in answered:
-        mac = normalize_mac(pkt.hwsrc)
-        ip = pkt.psrc
-        seen.add(mac)
-
-        dev = by_mac.get(mac, {})
-        last_seen = dev.get("last_seen")
-        do_host = not dev.get("hostname") or _needs_refresh(last_seen, _HOST_TTL)
-        do_vend = not dev.get("vendor") or _needs_refresh(last_seen, _VENDOR_TTL)
-        tasks.append((mac, ip, do_host, do_vend, dev))
-
-    # parallel DNS + vendor lookups
-    results = []
-    with ThreadPoolExecutor(max_workers=_LOOKUP_WORKERS) as ex:
-        futures = {
-            ex.submit(_do_lookup, mac, ip, dh, dv, dev): (mac, ip)
-            for mac, ip, dh, dv, dev in tasks
-        }
-        for fut in as_completed(futures):
-            results.append(fut.result())
-
-    # write results & generate alerts
+    lookups = []
+    sweeps = [asyncio.ensure_future(sweep_chunk(c)) for c in chunks]
+    try:
+        for pending in asyncio.as_completed(sweeps):
+            chunk, answered, duration = await pending
+            planner.record(chunk, answered, expected[chunk.network], duration)
+            for _, pkt in answered:
+                mac = normalize_mac(pkt.hwsrc)
+                ip = pkt.psrc
+                if mac in seen:
+                    continue
+                seen.add(mac)
+
+                dev = all_devices.get(mac, {})
+                last_seen = dev.get("last_seen")
+                # the resolver's cache decides when a PTR record is re-queried
+                do_host = True
+                do_vend = not dev.get("vendor") or _needs_refresh(last_seen, _VENDOR_TTL)
+                lookups.append(asyncio.ensure_future(_do_lookup(mac, ip, do_host, do_vend, dev)))
+    except BaseException:
+        # a failed chunk (or a cancelled cycle) must not leave sweeps and lookups running unowned
+        for task in (*sweeps, *lookups):
+            task.cancel()
+        await asyncio.gather(*sweeps, *lookups, return_exceptions=True)
+        raise
+    arp_done = time.perf_counter()
+    timings["arp"] = arp_done - started
+    timings["hosts_answered"] = len(seen)
+    timings["chunks"] = planner.last_report
+    timings["packets"] = sum(c.hosts * (1 + c.retries) for c in chunks)
+
+    with span("lookups wait"):
+        results = await asyncio.gather(*lookups)
+    lookups_done = time.perf_counter()
+    # lookups overlap the ARP phase; this is only the time spent waiting after it
+    timings["lookups"] = lookups_done - arp_done
+    dns_after = dns_resolver.stats()
+    timings["dns"] = {k: dns_after[k] - dns_before[k] for k in DNS_COUNTERS}
+
+    if sightings is not None:
+        seen |= _merge_sightings(results, seen, sightings(), all_devices)
+    went_off = online_before - seen
+    devices = await _write_cycle(results, all_devices, online_before, went_off, None, timings)
+    timings["db"] = time.perf_counter() - lookups_done
+    timings["total"] = time.perf_counter() - started
+    return devices
+
+
+def build_writes(results, devices: DeviceRegistry, online_before, went_off):
+    """
+    Turn (mac, ip, hostname, vendor) results into apply_sweep writes plus
+    new/back-online/offline alerts, relative to the known ``devices``.
+    """
+    writes = []
+    alerts = []
     for mac, ip, hostname, vendor in results:
-        existing = by_mac.get(mac)
+        existing = devices.get(mac)
         label = (existing.get("name") or hostname or ip) if existing else hostname or ip
 
         if not existing:
-            add_alert("new_device", mac, ip, f"New device detected: {mac} @ {label}")
+            alerts.append(("new_device", mac, ip, f"New device detected: {mac} @ {label}"))
         elif mac not in online_before:
-            add_alert("device_back_online", mac, ip, f"Device back online: {mac} @ {label}")
-
-        upsert_device(mac, ip, hostname, vendor)
+            alerts.append(("device_back_online", mac, ip, f"Device back online: {mac} @ {label}"))
 
-    mark_offline(seen)
+        writes.append((mac, ip, hostname, vendor))
 
-    went_off = online_before - seen
     for mac in went_off:
-        old = by_mac[mac]
+        old = devices[mac]
         label = old.get("name") or old.get("hostname") or old["ip"]
-        add_alert("device_offline", mac, old["ip"], f"Device went offline: {mac} @ {label}")
+        alerts.append(("device_offline", mac, old["ip"], f"Device went offline: {mac} @ {label}"))
+    return writes, alerts
+
+
+async def _write_cycle(results, devices, online_before, went_off, offline, timings, checked=None):
+    """
+    Apply one cycle's results in a single transaction and publish the new
+    snapshot. ``offline`` is passed through to apply_sweep (None = full
+    sweep); the alert rules decide which of the state changes are stored
+    as alerts, given the MACs ``checked`` (None = all of them).
+    """
+    with span("build writes"):
+        writes, changes = build_writes(results, devices, online_before, went_off)
+    with span("alert rules"):
+        alerts = alert_rules.rules.evaluate(changes, {r[0] for r in results}, checked)
+
+    def write():
+        with span("apply sweep", devices=len(writes), alerts=len(alerts)):
+            apply_sweep(writes, alerts, offline)
+        with span("vendor flush"):
+            vendor_resolver.flush()
+        with span("reload devices"):
+            devices = get_all_devices()
+        with span("publish"):
+            return snapshot.publish(devices, alerts).devices
+
+    timings["changes"] = len(changes)
+    timings["alerts"] = len(alerts)
+    return await asyncio.to_thread(write)
+
+
+def _arp_probe(iface, devices, timeout):
+    from scapy.layers.l2 import ARP, Ether
+    packets = [Ether(dst=d["mac"]) / ARP(pdst=d["ip"]) for d in devices]
+    return srp(
+        packets, iface=iface, timeout=timeout, retry=LIVENESS_RETRIES,
+        inter=1 / SCAN_RATE_PPS if SCAN_RATE_PPS else 0, verbose=False
+    )[0]
+
 
-    return get_all_devices()
+async def _probe_async(iface, devices, timeout):
+    with span("arp probe", iface=iface, hosts=len(devices)):
+        return await asyncio.to_thread(_arp_probe, iface, devices, timeout)
+
+
+async def check_liveness_async(macs, timings: dict | None = None, sightings=None):
+    """
+    Targeted liveness check: one unicast ARP request per device in
+    ``macs`` (to its last known MAC/IP) instead of a subnet broadcast.
+    Only those devices, and any passive ``sightings`` (as for a full
+    sweep), are updated; everything else is left as is.
+    """
+    timings = {} if timings is None else timings
+    started = time.perf_counter()
+
+    with span("load devices"):
+        all_devices = DeviceRegistry.of(await asyncio.to_thread(get_all_devices))
+    online_before = all_devices.online_macs()
+    checked = [dev for dev in map(all_devices.get, macs) if dev is not None and dev.ip_int is not None]
+
+    targets = await asyncio.to_thread(enumerate_targets)
+    groups = {}
+    for dev in checked:
+        addr = ipaddress.IPv4Address(dev["ip"])
+        for iface, subnet in targets:
+            if addr in ipaddress.IPv4Network(subnet):
+                groups.setdefault(iface, []).append(dev)
+                break
+    probed = {d.mac for devs in groups.values() for d in devs}
+
+    seen = {}
+    for answered in await asyncio.gather(*(
+        _probe_async(iface, devs, planner.timeout_for(iface)) for iface, devs in groups.items()
+    )):
+        for _, pkt in answered:
+            seen[normalize_mac(pkt.hwsrc)] = pkt.psrc
+    arp_done = time.perf_counter()
+    timings["arp"] = arp_done - started
+    timings["hosts_probed"] = len(probed)
+    timings["hosts_answered"] = len(seen)
+    timings["packets"] = len(probed) * (1 + LIVENESS_RETRIES)
+
+    results = [
+        (mac, ip, all_devices.get(mac, {}).get("hostname"), all_devices.get(mac, {}).get("vendor"))
+        for mac, ip in seen.items()
+    ]
+    sighted = _merge_sightings(results, seen, sightings(), all_devices) if sightings is not None else set()
+    went_off = (online_before & probed) - seen.keys() - sighted
+    devices = await _write_cycle(results, all_devices, online_before, went_off, went_off, timings, probed)
+    timings["db"] = time.perf_counter() - arp_done
+    timings["total"] = time.perf_counter() - started
+    return devices
+
+
+async def apply_sightings_async(sightings, timings: dict | None = None):
+    """
+    Write passive (mac -> (ip, hostname)) sightings as a cycle of their
+    own: the devices seen go (or stay) online and nothing goes offline.
+    Runs on the scan engine like the other cycles, so it never
+    interleaves with a sweep's load and write.
+    """
+    timings = {} if timings is None else timings
+    started = time.perf_counter()
+    with span("load devices"):
+        all_devices = DeviceRegistry.of(await asyncio.to_thread(get_all_devices))
+    results = []
+    _merge_sightings(results, (), sightings, all_devices)
+    timings["hosts_answered"] = len(results)
+    # a sighting proves a device is up, but no device was checked for absence
+    devices = await _write_cycle(results, all_devices, all_devices.online_macs(), (), (), timings, ())
+    timings["total"] = time.perf_counter() - started
+    return devices
+
+
+def _discover_and_update():
+    """Synchronous wrapper around one sweep, for scripts and tests."""
+    return asyncio.run(discover_and_update_async())
 
 
 def discover_devices_once():
     """
-    **Always** return the latest snapshot from the DB.
+    **Always** return the latest published snapshot, straight from memory.
     Never trigger any network I/O here—that’s now fully backgrounded.
     """
-    return get_all_devices()
+    return snapshot.current().devices
+
+
+def _format_latency(window: dict) -> str:
+    if window["avg"] is not None:
+        return f"{int(window['avg'])}ms"
+    return "timeout" if window["samples"] else "pending"
+
 
+def measure_latency() -> str:
+    """Average latency over the prober's rolling window; never does I/O."""
+    return _format_latency(latency.prober.summary())
 
-def measure_latency(target="8.8.8.8") -> str:
-    delay = ping(target, unit="ms")
-    return f"{int(delay)}ms" if delay else "timeout"
+
+def get_local_ip() -> str:
+    """The address this host uses to reach the internet (no packet is sent)."""
+    s = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    try:
+        s.connect(("8.8.8.8", 80))
+        return s.getsockname()[0]
+    finally:
+        s.close()
 
 
 def get_network_stats(devices):
     online = [d for d in devices if d["online"]]
-    io = psutil.net_io_counters()
-    latency = measure_latency()
+    window = latency.prober.summary()
+    throughput = bandwidth.sampler.summary()
+    totals = bandwidth.sampler.totals
+    if totals is None:  # sampler not running (or no sample yet)
+        import psutil
+        io = psutil.net_io_counters()
+        totals = (io.bytes_recv, io.bytes_sent)
+    latency_str = _format_latency(window)
 
     score = 100
-    if latency == "timeout":
+    if latency_str == "timeout":
         score -= 50
-    else:
-        v = int(latency.replace("ms", ""))
+    elif window["avg"] is not None:
+        v = window["avg"]
         if v > 150:
             score -= 30
         elif v > 80:
             score -= 15
 
     if len(online) == 0:        score -= 30
-    if io.bytes_recv < 10_000 and io.bytes_sent < 10_000:
+    minute = throughput and throughput["averages"].get("60s")
+    if minute and minute["rx_bps"] + minute["tx_bps"] < BANDWIDTH_LOW_TRAFFIC_BPS:
         score -= 15
 
     if score >= 85:
@@ -192,9 +404,11 @@ def get_network_stats(devices):
         "network_health": health,
         "total_devices": len(devices),
         "current_online_devices": len(online),
-        "average_latency": latency,
+        "average_latency": latency_str,
+        "latency": window,
         "active_alerts": 0 if health in ["Excellent", "Good"] else 1,
         "next_update": f"{SYNC_INTERVAL_SECONDS}s",
-        "bytes_sent": io.bytes_sent,
-        "bytes_recv": io.bytes_recv,
+        "bytes_sent": totals[1],
+        "bytes_recv": totals[0],
+        "throughput": throughput,
     }
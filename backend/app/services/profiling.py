@@ -0,0 +1,293 @@
+# backend/app/services/profiling.py
+
+import itertools
+import os
+import sys
+import threading
+import time
+import traceback
+import tracemalloc
+from collections import Counter, deque
+from contextlib import contextmanager
+
+from backend.app.config import (
+    PROFILE_MAX_SPANS,
+    PROFILE_SAMPLE_INTERVAL,
+    PROFILE_TRACE_HISTORY,
+)
+from backend.app.tracing import Span, current_trace
+
+_ROOT = os.path.dirname(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+_profiling = threading.Lock()  # one CPU or memory profile at a time
+
+
+class Busy(RuntimeError):
+    pass
+
+
+def _label(name: str) -> str:
+    return name.replace(";", ",").replace("\n", " ")
+
+
+class Trace:
+    """The spans of one scan cycle, with times relative to its start."""
+
+    def __init__(self, id, kind, max_spans=PROFILE_MAX_SPANS):
+        self.id = id
+        self.kind = kind
+        self.started_at = time.time()
+        self.origin = time.perf_counter()
+        self.duration = None
+        self.error = None
+        self.traceback = None
+        self.timings = None
+        self.spans = []  # (id, parent, name, start, duration, thread, attrs)
+        self.dropped = 0
+        self.ids = itertools.count(1)
+        self._max_spans = max_spans
+
+    def add(self, id, parent, name, start, end, attrs):
+        if self.duration is not None:
+            return  # from a task the cycle started but did not wait for
+        if len(self.spans) >= self._max_spans:
+            self.dropped += 1
+            return
+        self.spans.append((id, parent, name, start - self.origin, end - start, threading.current_thread().name,
+                           attrs))
+
+    def fail(self):
+        """Record the exception being handled as this cycle's failure."""
+        exc = sys.exc_info()[1]
+        self.error = f"{type(exc).__name__}: {exc}"
+        self.traceback = traceback.format_exc()
+
+    def summary(self) -> dict:
+        return {
+            "id": self.id,
+            "kind": self.kind,
+            "started_at": self.started_at,
+            "duration": self.duration,
+            "spans": len(self.spans),
+            "dropped_spans": self.dropped,
+            "error": self.error,
+        }
+
+    def to_dict(self) -> dict:
+        return {
+            **self.summary(),
+            "traceback": self.traceback,
+            "timings": self.timings,
+            "spans": [
+                {"id": id, "parent": parent, "name": name, "start": start, "duration": duration, "thread": thread,
+                 **attrs}
+                for id, parent, name, start, duration, thread, attrs in self.spans
+            ],
+        }
+
+    def chrome(self) -> dict:
+        """Trace Event Format, for chrome://tracing, Perfetto or speedscope."""
+        return {
+            "displayTimeUnit": "ms",
+            "otherData": self.summary(),
+            "traceEvents": [
+                {"name": name, "ph": "X", "ts": round(start * 1e6, 1), "dur": round(duration * 1e6, 1), "pid": 1,
+                 "tid": thread, "args": attrs}
+                for _, _, name, start, duration, thread, attrs in self.spans
+            ],
+        }
+
+    def folded(self) -> str:
+        """
+        Collapsed stacks ("root;child;leaf microseconds"), for flamegraph.pl
+        and speedscope. Each span counts its own time, less its children's;
+        concurrent children (the per-host lookups) can exceed their
+        parent, which then counts zero.
+        """
+        by_id = {s[0]: s for s in self.spans}
+        children = Counter()
+        for _, parent, _, _, duration, _, _ in self.spans:
+            if parent is not None:
+                children[parent] += duration
+        paths = {}
+
+        def path(id):
+            if id not in paths:
+                _, parent, name, *_ = by_id[id]
+                prefix = path(parent) + ";" if parent in by_id else ""
+                paths[id] = prefix + _label(name)
+            return paths[id]
+
+        stacks = Counter()
+        for id, _, _, _, duration, _, _ in self.spans:
+            stacks[path(id)] += max(0, round((duration - children[id]) * 1e6))
+        return "".join(f"{stack} {us}\n" for stack, us in sorted(stacks.items()) if us)
+
+
+class Tracer:
+    """
+    Span traces of scan cycles on request: arm(n) traces the next ``n``
+    cycles, and the last ``history`` traces are kept for download. While
+    nothing is armed a cycle costs an integer check and each span() a
+    ContextVar lookup.
+    """
+
+    def __init__(self, history=PROFILE_TRACE_HISTORY, max_spans=PROFILE_MAX_SPANS):
+        self.max_spans = max_spans
+        self.armed = 0
+        self.kinds = None
+        self._traces = deque(maxlen=history)
+        self._ids = itertools.count(1)
+        self._lock = threading.Lock()
+
+    def arm(self, cycles=1, kinds=None) -> int:
+        """Trace the next ``cycles`` cycles (of ``kinds`` only, if given); 0 disarms."""
+        with self._lock:
+            self.armed = max(0, cycles)
+            self.kinds = set(kinds) if kinds else None
+        return self.armed
+
+    def _take(self, kind) -> Trace | None:
+        with self._lock:
+            if self.armed <= 0 or (self.kinds and kind not in self.kinds):
+                return None
+            self.armed -= 1
+            return Trace(next(self._ids), kind, self.max_spans)
+
+    @contextmanager
+    def cycle(self, kind, timings=None):
+        """Trace the block as one ``kind`` cycle if armed; yields the Trace, or None."""
+        trace = self._take(kind) if self.armed else None
+        if trace is None:
+            yield None
+            return
+        token = current_trace.set(trace)
+        try:
+            with Span(trace, f"cycle {kind}", {}):
+                yield trace
+        except BaseException:
+            trace.fail()
+            raise
+        finally:
+            current_trace.reset(token)
+            trace.duration = time.perf_counter() - trace.origin
+            trace.timings = timings
+            self._traces.append(trace)
+
+    def traces(self) -> list[dict]:
+        return [t.summary() for t in reversed(self._traces)]
+
+    def get(self, id: int) -> Trace | None:
+        return next((t for t in self._traces if t.id == id), None)
+
+    def state(self) -> dict:
+        return {"armed": self.armed, "kinds": sorted(self.kinds) if self.kinds else None, "traces": self.traces()}
+
+
+tracer = Tracer()
+
+
+def _short_path(path: str) -> str:
+    if path.startswith(_ROOT):
+        return os.path.relpath(path, _ROOT)
+    if "site-packages" in path:
+        return path.split("site-packages" + os.sep, 1)[-1]
+    return os.path.basename(path)
+
+
+_frame_labels = {}
+
+
+def _frame_label(code) -> str:
+    label = _frame_labels.get(code)
+    if label is None:
+        label = _frame_labels[code] = _label(f"{code.co_name} ({_short_path(code.co_filename)}:{code.co_firstlineno})")
+    return label
+
+
+def _acquire():
+    if not _profiling.acquire(blocking=False):
+        raise Busy("a profile is already running")
+
+
+def sample_stacks(seconds, interval=PROFILE_SAMPLE_INTERVAL) -> dict:
+    """
+    Statistical profile of every thread: the stacks of all threads are
+    sampled every ``interval`` for ``seconds`` (wall clock, so threads
+    waiting on the network or a lock show up where they wait). Returns
+    the sample counts as collapsed stacks ("thread;outer;...;inner").
+    """
+    _acquire()
+    try:
+        me = threading.get_ident()
+        stacks = Counter()
+        samples = 0
+        started = time.perf_counter()
+        deadline = started + seconds
+        while time.perf_counter() < deadline:
+            names = {t.ident: t.name for t in threading.enumerate()}
+            for ident, frame in sys._current_frames().items():
+                if ident == me:
+                    continue
+                stack = []
+                while frame is not None:
+                    stack.append(_frame_label(frame.f_code))
+                    frame = frame.f_back
+                stack.append(_label(names.get(ident, f"thread-{ident}")))
+                stacks[";".join(reversed(stack))] += 1
+            samples += 1
+            time.sleep(interval)
+        elapsed = time.perf_counter() - started
+    finally:
+        _profiling.release()
+    return {
+        "seconds": round(elapsed, 3),
+        "interval": interval,
+        "samples": samples,
+        "stacks": dict(stacks.most_common()),
+    }
+
+
+def folded(profile: dict) -> str:
+    return "".join(f"{stack} {count}\n" for stack, count in profile["stacks"].items())
+
+
+def trace_allocations(seconds, top=25, frames=1) -> dict:
+    """
+    Memory allocated and still held after ``seconds``, by source line:
+    tracemalloc snapshots at both ends of the window, compared. Tracing
+    is switched off again afterwards unless it was already on.
+    """
+    _acquire()
+    try:
+        started_here = not tracemalloc.is_tracing()
+        if started_here:
+            tracemalloc.start(frames)
+        try:
+            before = tracemalloc.take_snapshot()
+            time.sleep(seconds)
+            after = tracemalloc.take_snapshot()
+            current, peak = tracemalloc.get_traced_memory()
+        finally:
+            if started_here:
+                tracemalloc.stop()
+    finally:
+        _profiling.release()
+    ignore = (tracemalloc.Filter(False, tracemalloc.__file__), tracemalloc.Filter(False, __file__))
+    stats = after.filter_traces(ignore).compare_to(before.filter_traces(ignore), "lineno")
+    return {
+        "seconds": seconds,
+        "traced_bytes": current,
+        "peak_bytes": peak,
+        "size_diff": sum(s.size_diff for s in stats),
+        "top": [
+            {
+                "where": f"{_short_path(s.traceback[0].filename)}:{s.traceback[0].lineno}",
+                "size_diff": s.size_diff,
+                "size": s.size,
+                "count_diff": s.count_diff,
+                "count": s.count,
+            }
+            for s in stats[:top]
+        ],
+    }
@@ -0,0 +1,155 @@
+# backend/app/services/resolver.py
+
+import asyncio
+import socket
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+from backend.app.metrics import LOOKUP_SECONDS, Counter, Gauge, registry
+from backend.app.config import (
+    DNS_CACHE_SIZE,
+    DNS_CACHE_TTL,
+    DNS_NEGATIVE_TTL,
+    DNS_TIMEOUT,
+    DNS_CONCURRENCY,
+)
+
+COUNTERS = ("hits", "negative_hits", "misses", "timeouts", "busy", "errors", "lookup_seconds")
+
+
+class ReverseResolver:
+    """
+    Reverse-DNS (PTR) lookups behind a bounded LRU cache. Names are kept
+    for ``ttl`` seconds, "no PTR record" answers and timeouts for the
+    shorter ``negative_ttl``. Queries run concurrently on a dedicated
+    thread pool, each capped at ``timeout`` seconds, and concurrent
+    requests for the same IP share one query. A query that times out
+    keeps its pool slot until the thread is really free, so later
+    lookups wait for a slot instead of queueing behind it; one that
+    cannot get a slot within ``timeout`` fails without being cached.
+    """
+
+    def __init__(self, maxsize=DNS_CACHE_SIZE, ttl=DNS_CACHE_TTL, negative_ttl=DNS_NEGATIVE_TTL,
+                 timeout=DNS_TIMEOUT, concurrency=DNS_CONCURRENCY):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self.timeout = timeout
+        self.concurrency = concurrency
+        self._cache = OrderedDict()  # ip -> (hostname | None, expires_at)
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix="dns")
+        self._loop = None
+        self._sem = None
+        self._inflight = {}
+        self._stats = dict.fromkeys(COUNTERS, 0)
+
+    def _cached(self, ip):
+        with self._lock:
+            entry = self._cache.get(ip)
+            if entry is None:
+                return False, None
+            if entry[1] <= time.monotonic():
+                del self._cache[ip]
+                return False, None
+            self._cache.move_to_end(ip)
+            self._stats["hits" if entry[0] else "negative_hits"] += 1
+            return True, entry[0]
+
+    def _store(self, ip, hostname, ttl):
+        with self._lock:
+            self._cache[ip] = (hostname, time.monotonic() + ttl)
+            self._cache.move_to_end(ip)
+            while len(self._cache) > self.maxsize:
+                self._cache.popitem(last=False)
+
+    def _bind_loop(self):
+        # semaphores/futures belong to one loop; rebind if a new one runs us
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop:
+            self._loop = loop
+            self._sem = asyncio.Semaphore(self.concurrency)
+            self._inflight = {}
+        return loop
+
+    async def resolve(self, ip: str) -> str | None:
+        found, hostname = self._cached(ip)
+        if found:
+            return hostname
+        loop = self._bind_loop()
+        pending = self._inflight.get(ip)
+        if pending is None:
+            pending = self._inflight[ip] = asyncio.ensure_future(self._query(loop, ip))
+            pending.add_done_callback(lambda _: self._inflight.pop(ip, None))
+        return await asyncio.shield(pending)
+
+    async def _query(self, loop, ip):
+        sem = self._sem
+        self._stats["misses"] += 1
+        started = time.perf_counter()
+        try:
+            try:
+                await asyncio.wait_for(sem.acquire(), self.timeout)
+            except asyncio.TimeoutError:
+                # every thread is still stuck in an earlier query: not this IP's answer
+                self._stats["busy"] += 1
+                return None
+            future = self._executor.submit(socket.getnameinfo, (ip, 0), socket.NI_NAMEREQD)
+            future.add_done_callback(lambda _: _release(loop, sem))
+            try:
+                hostname, _ = await asyncio.wait_for(asyncio.wrap_future(future), self.timeout)
+                self._store(ip, hostname, self.ttl)
+                return hostname
+            except asyncio.TimeoutError:
+                self._stats["timeouts"] += 1
+            except OSError:
+                # herror/gaierror: no PTR record or resolver failure
+                self._stats["errors"] += 1
+        finally:
+            elapsed = time.perf_counter() - started
+            self._stats["lookup_seconds"] += elapsed
+            LOOKUP_SECONDS.observe(elapsed, "dns")
+        self._store(ip, None, self.negative_ttl)
+        return None
+
+    async def resolve_many(self, ips) -> dict:
+        ips = list(dict.fromkeys(ips))
+        names = await asyncio.gather(*(self.resolve(ip) for ip in ips))
+        return dict(zip(ips, names))
+
+    def stats(self) -> dict:
+        with self._lock:
+            size = len(self._cache)
+        return {**self._stats, "cached": size, "maxsize": self.maxsize}
+
+    def clear(self):
+        with self._lock:
+            self._cache.clear()
+
+
+def _release(loop, sem):
+    # runs in the pool thread once getnameinfo has returned, timed out or not
+    try:
+        loop.call_soon_threadsafe(sem.release)
+    except RuntimeError:
+        pass  # that loop has closed; the next one gets a fresh semaphore
+
+
+resolver = ReverseResolver()
+
+
+@registry.collector
+def _collect():
+    stats = resolver.stats()
+    lookups = Counter("netview_dns_cache_lookups_total", "Reverse-DNS cache lookups by result", ("result",))
+    for result in ("hits", "negative_hits", "misses"):
+        lookups.inc(result, amount=stats[result])
+    failures = Counter("netview_dns_failures_total", "Reverse-DNS queries that timed out, found no free thread or failed", ("reason",))
+    failures.inc("timeout", amount=stats["timeouts"])
+    failures.inc("busy", amount=stats["busy"])
+    failures.inc("error", amount=stats["errors"])
+    entries = Gauge("netview_dns_cache_entries", "Reverse-DNS cache size")
+    entries.set(stats["cached"])
+    return lookups, failures, entries
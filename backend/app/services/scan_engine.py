@@ -0,0 +1,199 @@
+# backend/app/services/scan_engine.py
+
+import asyncio
+import logging
+import time
+from collections import deque
+
+from backend.app.config import FINGERPRINT_ENABLED, PRUNE_INTERVAL_SECONDS, SNIFF_PUBLISH_SECONDS
+from backend.app.database import prune_alerts, prune_history
+from backend.app.metrics import registry
+from backend.app.services import fingerprint
+from backend.app.services.profiling import tracer
+from backend.app.services.network_monitor import (
+    apply_sightings_async,
+    check_liveness_async,
+    discover_and_update_async,
+)
+from backend.app.services.scheduler import FULL, PASSIVE, ScanScheduler
+
+log = logging.getLogger(__name__)
+
+_HISTORY = 20  # recent cycles kept for /api/debug/scan
+_PHASES = ("arp", "lookups", "db", "total")
+
+CYCLES = registry.counter("netview_scan_cycles_total", "Scan cycles run", ("kind",))
+FAILURES = registry.counter("netview_scan_failures_total", "Scan cycles that raised", ("kind",))
+PHASE_SECONDS = registry.histogram("netview_scan_phase_seconds", "Scan cycle duration by phase", ("kind", "phase"))
+HOSTS_ANSWERED = registry.gauge("netview_scan_hosts_answered", "Hosts that answered the last cycle", ("kind",))
+PACKETS = registry.counter("netview_scan_packets_total", "ARP requests sent (including retries)", ("kind",))
+LAST_SUCCESS = registry.gauge("netview_scan_last_success_timestamp_seconds", "Unix time of the last successful cycle")
+
+
+class ScanEngine:
+    """
+    Runs scan cycles as an asyncio task on the app's event loop: full
+    discovery sweeps and targeted liveness/priority checks, as chosen by
+    the ScanScheduler. Failures are logged and counted instead of
+    swallowed, and stop() cancels an in-flight cycle. With
+    ``fingerprint`` on, each full sweep is followed by a background
+    fingerprinting run (one at a time) over the devices it found.
+
+    With a ``sniffer``, its sightings are written by the engine too: each
+    cycle takes those made while it ran into its own write, and between
+    cycles they are written as a passive cycle at most every
+    ``passive_interval`` seconds, so they never race a sweep.
+    """
+
+    def __init__(self, scheduler=None, fingerprint=FINGERPRINT_ENABLED, sniffer=None,
+                 passive_interval=SNIFF_PUBLISH_SECONDS):
+        self.scheduler = scheduler or ScanScheduler()
+        self.fingerprint = fingerprint
+        self.sniffer = sniffer
+        self.passive_interval = passive_interval
+        self._last_passive = time.monotonic()
+        self._task = None
+        self._fingerprint_task = None
+        self._recent = deque(maxlen=_HISTORY)
+        self._cycles = {}
+        self._failures = 0
+        self._last_error = None
+        self._last_success = None
+        self._last_prune = None
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._run(), name="scan-engine")
+
+    async def stop(self):
+        for task in (self._task, self._fingerprint_task):
+            if task is None:
+                continue
+            task.cancel()
+            try:
+                await task
+            except asyncio.CancelledError:
+                pass
+        self._task = self._fingerprint_task = None
+
+    async def run_cycle(self, kind: str, macs=()) -> dict:
+        timings = {"kind": kind}
+        with tracer.cycle(kind, timings) as trace:
+            if trace is not None:
+                timings["trace"] = trace.id
+            sightings = self.sniffer.take if self.sniffer is not None else None
+            try:
+                if kind == PASSIVE:
+                    devices = await apply_sightings_async(sightings(), timings)
+                elif kind == FULL:
+                    devices = await discover_and_update_async(timings, sightings)
+                else:
+                    devices = await check_liveness_async(macs, timings, sightings)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                if trace is not None:
+                    trace.fail()
+                self._failures += 1
+                self._last_error = f"{type(e).__name__}: {e}"
+                log.exception("%s scan cycle failed", kind)
+                timings["error"] = self._last_error
+                FAILURES.inc(kind)
+                if kind != PASSIVE:
+                    self.scheduler.mark_failed(kind)
+            else:
+                self._last_success = time.time()
+                LAST_SUCCESS.set(self._last_success)
+                self._observe(kind, timings)
+                self.scheduler.observe(devices)
+                if kind != PASSIVE:
+                    self.scheduler.mark_ran(kind)
+                if kind == FULL and self.fingerprint:
+                    self._start_fingerprinting(devices)
+                await self._prune()
+        if sightings is not None:
+            self._last_passive = time.monotonic()  # whatever it saw has been written
+        self._cycles[kind] = self._cycles.get(kind, 0) + 1
+        CYCLES.inc(kind)
+        timings["finished_at"] = time.time()
+        self._recent.append(timings)
+        return timings
+
+    @staticmethod
+    def _observe(kind, timings):
+        for phase in _PHASES:
+            if phase in timings:
+                PHASE_SECONDS.observe(timings[phase], kind, phase)
+        if "hosts_answered" in timings:
+            HOSTS_ANSWERED.set(timings["hosts_answered"], kind)
+        PACKETS.inc(kind, amount=timings.get("packets", 0))
+
+    async def _prune(self):
+        """Apply history/alert retention, at most every PRUNE_INTERVAL_SECONDS."""
+        now = time.monotonic()
+        if self._last_prune is not None and now - self._last_prune < PRUNE_INTERVAL_SECONDS:
+            return
+        self._last_prune = now
+        for prune in (prune_history, prune_alerts):
+            try:
+                await asyncio.to_thread(prune)
+            except Exception:
+                log.exception("%s failed", prune.__name__)
+
+    def _start_fingerprinting(self, devices):
+        if self._fingerprint_task is None or self._fingerprint_task.done():
+            self._fingerprint_task = asyncio.create_task(self._fingerprint(devices), name="fingerprint")
+
+    async def _fingerprint(self, devices):
+        try:
+            await fingerprint.fingerprinter.run(devices)
+        except asyncio.CancelledError:
+            raise
+        except Exception:
+            log.exception("Fingerprinting failed")
+
+    async def sweep_once(self) -> dict:
+        return await self.run_cycle(FULL)
+
+    def _passive_due(self) -> float | None:
+        """Seconds until pending sightings should be written, or None if there are none."""
+        if self.sniffer is None or not self.sniffer.pending:
+            return None
+        return max(0.0, self._last_passive + self.passive_interval - time.monotonic())
+
+    async def _run(self):
+        while True:
+            try:
+                kind, macs = self.scheduler.next_cycle()
+                if kind is None and self._passive_due() == 0:
+                    kind = PASSIVE
+                if kind is not None:
+                    await self.run_cycle(kind, macs)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                # a bug outside the cycle itself must not end scanning silently
+                self._failures += 1
+                self._last_error = f"{type(e).__name__}: {e}"
+                log.exception("Scan loop failed")
+            delay = self.scheduler.seconds_until_due()
+            if self.sniffer is not None:
+                passive = self._passive_due()
+                # sightings may arrive while asleep: look again within one interval
+                delay = min(delay, self.passive_interval if passive is None else passive)
+            await asyncio.sleep(delay)
+
+    def metrics(self) -> dict:
+        full = [t["total"] for t in self._recent if t["kind"] == FULL and "total" in t]
+        return {
+            "running": self._task is not None and not self._task.done(),
+            "cycles": dict(self._cycles),
+            "failures": self._failures,
+            "last_error": self._last_error,
+            "last_success": self._last_success,
+            "flapping": sorted(self.scheduler.flapping()),
+            "avg_full_sweep_duration": sum(full) / len(full) if full else None,
+            "max_full_sweep_duration": max(full) if full else None,
+            "recent": list(self._recent),
+            "fingerprinting": self._fingerprint_task is not None and not self._fingerprint_task.done(),
+        }
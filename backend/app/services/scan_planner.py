@@ -0,0 +1,197 @@
+# backend/app/services/scan_planner.py
+
+import ipaddress
+import logging
+import socket
+import threading
+
+from backend.app.config import (
+    SCAN_INTERFACES,
+    SCAN_SUBNETS,
+    SCAN_MAX_PREFIX,
+    SCAN_CHUNK_PREFIX,
+    SCAN_PARALLEL_CHUNKS,
+    SCAN_RATE_PPS,
+    SCAN_TIMEOUT_MIN,
+    SCAN_TIMEOUT_MAX,
+    SCAN_MAX_RETRIES,
+)
+
+log = logging.getLogger(__name__)
+
+_RTT_ALPHA = 0.3  # EWMA weight of the newest sweep's response times
+_TIMEOUT_FACTOR = 4  # timeout = slowest typical reply x this
+
+
+def get_default_gateway_subnet() -> str | None:
+    """The subnet of the interface that routes to the internet, if any."""
+    sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    try:
+        sock.connect(("8.8.8.8", 80))
+        local_ip = sock.getsockname()[0]
+    except OSError:
+        return None
+    finally:
+        sock.close()
+
+    import psutil
+    for addrs in psutil.net_if_addrs().values():
+        for snic in addrs:
+            if snic.family == socket.AF_INET and snic.address == local_ip:
+                return str(ipaddress.IPv4Network(f"{local_ip}/{snic.netmask}", strict=False))
+    return None
+
+
+def _clamp_network(address: str, netmask: str) -> ipaddress.IPv4Network | None:
+    net = ipaddress.IPv4Network(f"{address}/{netmask}", strict=False)
+    if net.is_loopback or net.is_link_local or net.prefixlen >= 31:
+        return None
+    if net.prefixlen < SCAN_MAX_PREFIX:
+        log.warning("Only sweeping the /%d around %s on %s", SCAN_MAX_PREFIX, address, net)
+        net = ipaddress.IPv4Network(f"{address}/{SCAN_MAX_PREFIX}", strict=False)
+    return net
+
+
+def enumerate_targets() -> list[tuple[str | None, str]]:
+    """
+    (interface, subnet) pairs to sweep: SCAN_SUBNETS if configured,
+    otherwise every up IPv4 interface (optionally limited to
+    SCAN_INTERFACES), falling back to the default-route subnet.
+    """
+    if SCAN_SUBNETS:
+        targets = []
+        for entry in SCAN_SUBNETS:
+            iface, _, cidr = entry.rpartition("=")
+            targets.append((iface or None, str(ipaddress.IPv4Network(cidr, strict=False))))
+        return targets
+
+    import psutil
+    stats = psutil.net_if_stats()
+    targets = {}
+    for iface, addrs in psutil.net_if_addrs().items():
+        if SCAN_INTERFACES and iface not in SCAN_INTERFACES:
+            continue
+        if iface in stats and not stats[iface].isup:
+            continue
+        for snic in addrs:
+            if snic.family != socket.AF_INET or not snic.netmask:
+                continue
+            net = _clamp_network(snic.address, snic.netmask)
+            if net is not None:
+                targets.setdefault(str(net), iface)
+    if targets:
+        return [(iface, net) for net, iface in targets.items()]
+
+    subnet = get_default_gateway_subnet()
+    return [(None, subnet)] if subnet else []
+
+
+class Chunk:
+    __slots__ = ("iface", "network", "timeout", "retries", "inter")
+
+    def __init__(self, iface, network, timeout, retries, inter):
+        self.iface = iface
+        self.network = network
+        self.timeout = timeout
+        self.retries = retries
+        self.inter = inter
+
+    @property
+    def hosts(self) -> int:
+        return max(1, ipaddress.IPv4Network(self.network).num_addresses - 2)
+
+
+class ScanPlanner:
+    """
+    Splits each target subnet into /SCAN_CHUNK_PREFIX chunks and tunes
+    each sweep from the last ones: the ARP timeout follows an EWMA of
+    the slowest replies per interface, and a chunk gets extra retries
+    while known-online hosts in it go unanswered. The packet rate is
+    capped at SCAN_RATE_PPS across all chunks in flight.
+    """
+
+    def __init__(self, chunk_prefix=SCAN_CHUNK_PREFIX, parallel=SCAN_PARALLEL_CHUNKS,
+                 rate_pps=SCAN_RATE_PPS):
+        self.chunk_prefix = chunk_prefix
+        self.parallel = parallel
+        self.rate_pps = rate_pps
+        self._rtt = {}  # iface -> EWMA of the slowest reply (seconds)
+        self._retries = {}  # chunk network -> retries
+        self._lock = threading.Lock()
+        self.last_report = []
+
+    def timeout_for(self, iface) -> float:
+        rtt = self._rtt.get(iface)
+        if rtt is None:
+            return SCAN_TIMEOUT_MAX
+        return min(SCAN_TIMEOUT_MAX, max(SCAN_TIMEOUT_MIN, rtt * _TIMEOUT_FACTOR))
+
+    def plan(self, targets) -> list[Chunk]:
+        # each in-flight chunk gets an equal share of the packet budget
+        inter = self.parallel / self.rate_pps if self.rate_pps else 0
+        chunks = []
+        for iface, subnet in targets:
+            net = ipaddress.IPv4Network(subnet, strict=False)
+            parts = [net] if net.prefixlen >= self.chunk_prefix else net.subnets(new_prefix=self.chunk_prefix)
+            for part in parts:
+                chunks.append(Chunk(iface, str(part), self.timeout_for(iface),
+                                    self._retries.get(str(part), 0), inter))
+        self.last_report = []
+        return chunks
+
+    @staticmethod
+    def group_by_chunk(chunks, ips) -> dict[str, set[str]]:
+        """Bucket IPs into the chunks that contain them, in one pass."""
+        starts = {}  # prefixlen -> {network int: chunk network}
+        for chunk in chunks:
+            net = ipaddress.IPv4Network(chunk.network)
+            starts.setdefault(net.prefixlen, {})[int(net.network_address)] = chunk.network
+        groups = {chunk.network: set() for chunk in chunks}
+        for ip in ips:
+            addr = int(ipaddress.IPv4Address(ip))
+            for prefixlen, nets in starts.items():
+                network = nets.get(addr >> (32 - prefixlen) << (32 - prefixlen))
+                if network is not None:
+                    groups[network].add(ip)
+                    break
+        return groups
+
+    def record(self, chunk: Chunk, answered, expected_ips: set[str], duration: float) -> dict:
+        """Feed one chunk's replies back into the tuning and the per-chunk report."""
+        rtts = []
+        answered_ips = set()
+        for sent, received in answered:
+            answered_ips.add(received.psrc)
+            try:
+                rtts.append(float(received.time - sent.sent_time))
+            except (AttributeError, TypeError):
+                pass
+        missed = len(expected_ips - answered_ips)
+
+        with self._lock:
+            if rtts:
+                slowest = max(rtts)
+                prev = self._rtt.get(chunk.iface)
+                self._rtt[chunk.iface] = slowest if prev is None else (
+                    _RTT_ALPHA * slowest + (1 - _RTT_ALPHA) * prev
+                )
+            retries = self._retries.get(chunk.network, 0)
+            self._retries[chunk.network] = (
+                min(SCAN_MAX_RETRIES, retries + 1) if missed else max(0, retries - 1)
+            )
+            report = {
+                "iface": chunk.iface,
+                "network": chunk.network,
+                "hosts": chunk.hosts,
+                "answered": len(answered_ips),
+                "missed_known": missed,
+                "duration": round(duration, 3),
+                "timeout": round(chunk.timeout, 3),
+                "retries": chunk.retries,
+                "max_rtt": round(max(rtts), 4) if rtts else None,
+            }
+            self.last_report.append(report)
+        return report
+
+
+planner = ScanPlanner()
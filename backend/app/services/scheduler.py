@@ -0,0 +1,113 @@
+# backend/app/services/scheduler.py
+
+import time
+from collections import deque
+
+from backend.app.config import (
+    FULL_SWEEP_INTERVAL_SECONDS,
+    LIVENESS_INTERVAL_SECONDS,
+    PRIORITY_INTERVAL_SECONDS,
+    FLAP_WINDOW_SECONDS,
+    FLAP_THRESHOLD,
+    RECENT_CHANGE_SECONDS,
+)
+
+FULL = "full"
+LIVENESS = "liveness"
+PRIORITY = "priority"
+PASSIVE = "passive"  # sniffer sightings, written by the engine between cycles; not scheduled here
+
+
+class ScanScheduler:
+    """
+    Decides what the next scan cycle should be:
+     - a full broadcast discovery sweep every ``full_interval``
+     - a unicast liveness check of known-online devices every ``liveness_interval``
+     - a priority recheck every ``priority_interval`` of devices that are
+       flapping or changed state in the last ``recent`` seconds (including
+       ones that just went offline, so returns are caught quickly)
+    """
+
+    def __init__(self, full_interval=FULL_SWEEP_INTERVAL_SECONDS,
+                 liveness_interval=LIVENESS_INTERVAL_SECONDS,
+                 priority_interval=PRIORITY_INTERVAL_SECONDS,
+                 flap_window=FLAP_WINDOW_SECONDS, flap_threshold=FLAP_THRESHOLD,
+                 recent=RECENT_CHANGE_SECONDS):
+        self.full_interval = full_interval
+        self.liveness_interval = liveness_interval
+        self.priority_interval = priority_interval
+        self.flap_window = flap_window
+        self.flap_threshold = flap_threshold
+        self.recent = recent
+        self._last = {FULL: None, LIVENESS: None, PRIORITY: None}
+        self._online = {}  # mac -> last observed online flag
+        self._transitions = {}  # mac -> deque of transition times
+
+    def observe(self, devices, now=None):
+        """Record each device's online state after a cycle."""
+        now = time.monotonic() if now is None else now
+        for dev in devices:
+            mac, online = dev["mac"], bool(dev["online"])
+            prev = self._online.get(mac)
+            self._online[mac] = online
+            if prev is not None and prev != online:
+                self._transitions.setdefault(mac, deque(maxlen=self.flap_threshold * 4)).append(now)
+
+    def flapping(self, now=None) -> set[str]:
+        now = time.monotonic() if now is None else now
+        return {
+            mac for mac, times in self._transitions.items()
+            if sum(1 for t in times if now - t <= self.flap_window) >= self.flap_threshold
+        }
+
+    def priority_macs(self, now=None) -> set[str]:
+        now = time.monotonic() if now is None else now
+        # forget devices that have been stable for a whole flap window
+        for mac in [m for m, times in self._transitions.items() if now - times[-1] > self.flap_window]:
+            del self._transitions[mac]
+        recent = {mac for mac, times in self._transitions.items() if now - times[-1] <= self.recent}
+        return recent | self.flapping(now)
+
+    def _due(self, kind, interval, now):
+        last = self._last[kind]
+        return last is None or now - last >= interval
+
+    def next_cycle(self, now=None) -> tuple[str | None, list[str]]:
+        """(kind, macs) to run now, or (None, []) if nothing is due."""
+        now = time.monotonic() if now is None else now
+        if self._due(FULL, self.full_interval, now):
+            return FULL, []
+        if self._due(LIVENESS, self.liveness_interval, now):
+            online = {mac for mac, up in self._online.items() if up}
+            return LIVENESS, sorted(online | self.priority_macs(now))
+        if self._due(PRIORITY, self.priority_interval, now):
+            macs = self.priority_macs(now)
+            if macs:
+                return PRIORITY, sorted(macs)
+            self._last[PRIORITY] = now
+        return None, []
+
+    def mark_ran(self, kind, now=None):
+        now = time.monotonic() if now is None else now
+        self._last[kind] = now
+        # a full sweep or liveness check also covers the cheaper cycles below it
+        if kind == FULL:
+            self._last[LIVENESS] = now
+        if kind in (FULL, LIVENESS):
+            self._last[PRIORITY] = now
+
+    def mark_failed(self, kind, now=None):
+        """Retry a failed cycle after the liveness interval rather than its full one."""
+        now = time.monotonic() if now is None else now
+        interval = {FULL: self.full_interval, LIVENESS: self.liveness_interval,
+                    PRIORITY: self.priority_interval}[kind]
+        self._last[kind] = now - interval + min(interval, self.liveness_interval)
+
+    def seconds_until_due(self, now=None) -> float:
+        now = time.monotonic() if now is None else now
+        waits = []
+        for kind, interval in ((FULL, self.full_interval), (LIVENESS, self.liveness_interval),
+                               (PRIORITY, self.priority_interval)):
+            last = self._last[kind]
+            waits.append(0.0 if last is None else last + interval - now)
+        return max(0.0, min(waits))
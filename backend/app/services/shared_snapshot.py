@@ -0,0 +1,172 @@
+# backend/app/services/shared_snapshot.py
+
+import json
+import logging
+import os
+import threading
+
+from backend.app import database
+from backend.app.config import SNAPSHOT_PATH, SNAPSHOT_POLL_SECONDS
+from backend.app.registry import DeviceRegistry
+from backend.app.services import snapshot, topology
+from backend.app.services.snapshot import render_json
+
+log = logging.getLogger(__name__)
+
+
+def snapshot_path() -> str:
+    return SNAPSHOT_PATH or os.path.join(os.path.dirname(os.path.abspath(database.DB_PATH)), "snapshot.json")
+
+
+def write(snap, path=None):
+    """Replace the shared file with ``snap``; readers never see a partial file."""
+    path = path or snapshot_path()
+    header = render_json({
+        "epoch": snap.epoch,
+        "version": snap.version,
+        "published_at": snap.published_at,
+        "local_ip": topology.model.local_ip,
+        "alerts": snap.alerts,
+    })
+    devices = snap.derive("devices", DeviceRegistry.to_json)
+    tmp = f"{path}.{os.getpid()}.tmp"
+    with open(tmp, "wb") as f:
+        f.write(header[:-1] + b',"devices":' + devices + b"}")
+    os.replace(tmp, path)
+
+
+def read(path=None) -> dict:
+    with open(path or snapshot_path(), "rb") as f:
+        return json.loads(f.read())
+
+
+def _stamp(path):
+    try:
+        st = os.stat(path)
+    except FileNotFoundError:
+        return None
+    # os.replace gives every write a new inode, even within one mtime tick
+    return st.st_ino, st.st_mtime_ns, st.st_size
+
+
+class SnapshotWriter:
+    """
+    Scanner side: writes every published snapshot to the shared file from
+    a background thread. Snapshots published while a write is in progress
+    are coalesced; only the latest one is written next.
+    """
+
+    def __init__(self, path=None):
+        self.path = path
+        self.writes = 0
+        self.last_error = None
+        self._pending = None
+        self._wake = threading.Condition()
+        self._thread = None
+        self._stop = False
+
+    def start(self):
+        if self._thread is not None:
+            return
+        self._stop = False
+        self._thread = threading.Thread(target=self._run, name="snapshot-writer", daemon=True)
+        self._thread.start()
+        self.submit(snapshot.current())
+
+    def stop(self):
+        if self._thread is None:
+            return
+        with self._wake:
+            self._stop = True
+            self._wake.notify()
+        self._thread.join()
+        self._thread = None
+
+    def submit(self, snap):
+        with self._wake:
+            self._pending = snap
+            self._wake.notify()
+
+    def _on_publish(self, previous, snap):
+        if self._thread is not None:
+            self.submit(snap)
+
+    def _run(self):
+        while True:
+            with self._wake:
+                while self._pending is None and not self._stop:
+                    self._wake.wait()
+                snap, self._pending = self._pending, None
+            if snap is not None:
+                try:
+                    write(snap, self.path)
+                    self.writes += 1
+                except OSError as e:
+                    self.last_error = f"{type(e).__name__}: {e}"
+                    log.exception("Writing the shared snapshot failed")
+            elif self._stop:
+                return
+
+
+class SnapshotWatcher:
+    """
+    API-worker side: stat()s the shared file every ``interval`` seconds
+    and republishes it locally when it has been replaced, so events,
+    topology and the snapshot-backed routes follow the scanner without
+    querying the DB.
+    """
+
+    def __init__(self, path=None, interval=SNAPSHOT_POLL_SECONDS):
+        self.path = path
+        self.interval = interval
+        self.loads = 0
+        self.last_error = None
+        self.source_version = None
+        self._seen = None
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        if self._thread is None:
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name="snapshot-watcher", daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        if self._thread is not None:
+            self._stop.set()
+            self._thread.join()
+            self._thread = None
+
+    def check(self) -> bool:
+        """Load the file if it changed since the last check; True if it was published."""
+        path = self.path or snapshot_path()
+        stamp = _stamp(path)
+        if stamp is None or stamp == self._seen:
+            return False
+        try:
+            data = read(path)
+        except (OSError, ValueError) as e:
+            # vanished or replaced between stat and open: pick it up next time
+            self.last_error = f"{type(e).__name__}: {e}"
+            return False
+        self._seen = stamp
+        if data.get("local_ip") and data["local_ip"] != topology.model.local_ip:
+            topology.model.set_local_ip(data["local_ip"])
+        snapshot.publish(DeviceRegistry.of(data["devices"]), [tuple(a) for a in data["alerts"]],
+                         version=data["version"], epoch=data["epoch"])
+        self.source_version = data["version"]
+        self.loads += 1
+        return True
+
+    def _run(self):
+        while not self._stop.is_set():
+            try:
+                self.check()
+            except Exception:
+                log.exception("Loading the shared snapshot failed")
+            self._stop.wait(self.interval)
+
+
+writer = SnapshotWriter()
+snapshot.subscribe(writer._on_publish)
@@ -0,0 +1,111 @@
+# backend/app/services/snapshot.py
+
+import json
+import threading
+import time
+
+from backend.app.database import get_all_devices, next_snapshot_version
+from backend.app.tracing import span
+from backend.app.registry import Device, DeviceRegistry
+
+
+def _json_default(obj):
+    if isinstance(obj, Device):
+        return obj.to_dict()
+    if isinstance(obj, DeviceRegistry):
+        return list(obj)
+    # match FastAPI's encoding of datetimes
+    return obj.isoformat() if hasattr(obj, "isoformat") else str(obj)
+
+
+def render_json(data) -> bytes:
+    return json.dumps(data, default=_json_default, separators=(",", ":")).encode()
+
+
+class DeviceSnapshot:
+    """
+    An immutable view of the devices table as of one sweep, plus the alerts
+    that sweep raised. Anything the API derives from it (topology,
+    stats, ...) is memoised per snapshot.
+
+    ``epoch`` and ``version`` come from the DB, so every worker names the
+    same snapshot the same way in ETags and event ids.
+    """
+
+    def __init__(self, version: int, devices: DeviceRegistry, alerts=(), epoch=""):
+        self.epoch = epoch
+        self.version = version
+        self.devices = devices
+        self.alerts = list(alerts)
+        self.published_at = time.time()
+        self.etag = f'"{epoch}-{version}"'
+        self._derived = {}
+        self._lock = threading.Lock()
+
+    def derive(self, key: str, build):
+        """Return ``build(devices)``, computed at most once per snapshot."""
+        try:
+            return self._derived[key]
+        except KeyError:
+            pass
+        with self._lock:
+            if key not in self._derived:
+                self._derived[key] = build(self.devices)
+            return self._derived[key]
+
+
+_current: DeviceSnapshot | None = None
+_publish_lock = threading.Lock()
+_listeners = []
+_source = get_all_devices
+
+
+def set_source(load):
+    """
+    Load devices with ``load()`` instead of from the devices table when
+    current()/refresh() need them (the collector serves its sites).
+    """
+    global _source
+    _source = load
+
+
+def subscribe(listener):
+    """Call ``listener(previous, snapshot)`` after every publish, in order."""
+    _listeners.append(listener)
+
+
+def publish(devices, alerts=(), version=None, epoch=None) -> DeviceSnapshot:
+    """
+    Swap in a new snapshot; called by the scan loop after each sweep.
+    Without a ``version`` the next one is taken from the DB; one that is
+    given (the scanner's, from the shared file) and is not newer than
+    the current snapshot's is dropped, since what this process already
+    has was read later.
+    """
+    global _current
+    devices = DeviceRegistry.of(devices)
+    with _publish_lock:
+        if version is None:
+            epoch, version = next_snapshot_version()
+        elif _current is not None and _current.epoch == epoch and version <= _current.version:
+            return _current
+        previous, _current = _current, DeviceSnapshot(version, devices, alerts, epoch)
+        for listener in _listeners:
+            with span(f"on publish {listener.__module__.rsplit('.', 1)[-1]}"):
+                listener(previous, _current)
+        return _current
+
+
+def current() -> DeviceSnapshot:
+    """The latest snapshot, loaded from the DB if nothing has been published yet."""
+    snap = _current
+    if snap is None:
+        snap = refresh()
+    return snap
+
+
+def refresh() -> DeviceSnapshot:
+    """Re-read the DB after an out-of-band write (e.g. a rename)."""
+    # numbered before the read: whatever an earlier version holds was committed by then
+    epoch, version = next_snapshot_version()
+    return publish(_source(), version=version, epoch=epoch)
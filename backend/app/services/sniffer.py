@@ -0,0 +1,208 @@
+# backend/app/services/sniffer.py
+
+import ipaddress
+import logging
+import queue
+import threading
+import time
+
+from scapy.layers.dhcp import BOOTP, DHCP
+from scapy.layers.l2 import ARP
+from scapy.sendrecv import AsyncSniffer
+
+from backend.app.config import (
+    SNIFF_INTERFACE,
+    SNIFF_PCAP,
+    SNIFF_QUEUE_SIZE,
+    SNIFF_BATCH_SIZE,
+    SNIFF_FLUSH_SECONDS,
+)
+from backend.app.services.network_monitor import normalize_mac
+
+log = logging.getLogger(__name__)
+
+_BPF = "arp or (udp and (port 67 or port 68))"
+_DHCP_ACK = 5
+_DHCP_REQUEST = 3
+_BAD_MACS = {"00:00:00:00:00:00", "ff:ff:ff:ff:ff:ff"}
+
+
+def _usable_ip(ip) -> bool:
+    try:
+        addr = ipaddress.IPv4Address(ip)
+    except ValueError:
+        return False
+    return not (addr.is_unspecified or addr.is_multicast or addr.is_loopback
+                or addr == ipaddress.IPv4Address("255.255.255.255"))
+
+
+def _dhcp_options(pkt) -> dict:
+    return {opt[0]: opt[1] for opt in pkt[DHCP].options if isinstance(opt, tuple) and len(opt) >= 2}
+
+
+def parse_packet(pkt) -> tuple[str, str, str | None] | None:
+    """
+    (mac, ip, hostname) seen in an ARP or DHCP packet, or None.
+
+    ARP requests, replies and gratuitous ARP all reveal the sender's
+    MAC/IP (ARP probes from 0.0.0.0 do not). DHCP ACKs give the client's
+    leased address, REQUESTs the address it asks for, and both may carry
+    the client's hostname option.
+    """
+    if ARP in pkt:
+        arp = pkt[ARP]
+        mac = normalize_mac(arp.hwsrc or "")
+        if arp.op not in (1, 2) or mac in _BAD_MACS or not _usable_ip(arp.psrc):
+            return None
+        return mac, arp.psrc, None
+
+    if DHCP in pkt and BOOTP in pkt:
+        bootp = pkt[BOOTP]
+        opts = _dhcp_options(pkt)
+        kind = opts.get("message-type")
+        if kind == _DHCP_ACK:
+            ip = bootp.yiaddr
+        elif kind == _DHCP_REQUEST:
+            ip = opts.get("requested_addr") or bootp.ciaddr
+        else:
+            return None
+        chaddr = bytes(bootp.chaddr)[:6]
+        if len(chaddr) < 6 or not _usable_ip(ip):
+            return None
+        mac = ":".join(f"{b:02x}" for b in chaddr)
+        if mac in _BAD_MACS:
+            return None
+        hostname = opts.get("hostname")
+        if isinstance(hostname, bytes):
+            hostname = hostname.decode("utf-8", "replace")
+        return mac, str(ip), hostname or None
+    return None
+
+
+class PassiveSniffer:
+    """
+    Passive discovery from ARP and DHCP traffic, live or from a pcap.
+
+    The capture thread only parses packets and hands (mac, ip, hostname)
+    sightings to a bounded queue; when the queue is full the sighting is
+    dropped and counted rather than blocking capture. A collector thread
+    drains the queue in batches (at most ``batch_size``, at least every
+    ``flush_interval`` seconds) and keeps the latest sighting per MAC
+    until take() hands them over. Nothing is written here: the scan
+    engine takes the sightings into its next write (a sweep's, or a
+    passive cycle of their own at most every SNIFF_PUBLISH_SECONDS), so
+    they share its single load-then-write path.
+    """
+
+    def __init__(self, iface=SNIFF_INTERFACE, pcap=SNIFF_PCAP, queue_size=SNIFF_QUEUE_SIZE,
+                 batch_size=SNIFF_BATCH_SIZE, flush_interval=SNIFF_FLUSH_SECONDS):
+        self.iface = iface
+        self.pcap = pcap
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self._queue = queue.Queue(maxsize=queue_size)
+        self._sniffer = None
+        self._collector = None
+        self._stop = threading.Event()
+        self._pending = {}  # mac -> (ip, hostname), latest sighting since the last take()
+        self._pending_lock = threading.Lock()
+        self._stats = {"packets": 0, "sightings": 0, "dropped": 0, "batches": 0, "taken": 0,
+                       "max_queue_depth": 0, "last_batch_size": 0}
+
+    def start(self):
+        if self._collector is not None:
+            return
+        self._stop.clear()
+        self._collector = threading.Thread(target=self._collect_loop, name="sniffer-collector", daemon=True)
+        self._collector.start()
+        if self.pcap:
+            # no BPF filter offline: scapy would need tcpdump to apply it
+            self._sniffer = AsyncSniffer(offline=self.pcap, prn=self._on_packet, store=False)
+        else:
+            self._sniffer = AsyncSniffer(iface=self.iface, filter=_BPF, prn=self._on_packet, store=False)
+        self._sniffer.start()
+
+    def join(self, timeout=None):
+        """Wait for the capture to end (a pcap has been read to the end)."""
+        if self._sniffer is not None:
+            self._sniffer.join(timeout)
+
+    def stop(self):
+        """Stop capturing, then collect whatever is still queued (take() still returns it)."""
+        if self._sniffer is not None:
+            if self._sniffer.running:
+                try:
+                    self._sniffer.stop()
+                except Exception as e:
+                    log.debug("Stopping sniffer: %s", e)
+            self._sniffer = None
+        if self._collector is not None:
+            self._stop.set()
+            self._collector.join()
+            self._collector = None
+
+    def _on_packet(self, pkt):
+        self._stats["packets"] += 1
+        try:
+            sighting = parse_packet(pkt)
+        except Exception:
+            return
+        if sighting is None:
+            return
+        self._stats["sightings"] += 1
+        try:
+            self._queue.put_nowait(sighting)
+        except queue.Full:
+            self._stats["dropped"] += 1
+            return
+        depth = self._queue.qsize()
+        if depth > self._stats["max_queue_depth"]:
+            self._stats["max_queue_depth"] = depth
+
+    def _next_batch(self) -> list:
+        batch = []
+        deadline = time.monotonic() + self.flush_interval
+        while len(batch) < self.batch_size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def _collect_loop(self):
+        while not self._stop.is_set() or not self._queue.empty():
+            batch = self._next_batch()
+            if batch:
+                self.add_batch(batch)
+
+    def add_batch(self, batch):
+        with self._pending_lock:
+            for mac, ip, hostname in batch:
+                prev = self._pending.get(mac)
+                self._pending[mac] = (ip, hostname or (prev[1] if prev else None))
+        self._stats["batches"] += 1
+        self._stats["last_batch_size"] = len(batch)
+
+    @property
+    def pending(self) -> int:
+        return len(self._pending)
+
+    def take(self) -> dict:
+        """The latest sighting of each MAC since the last call, as mac -> (ip, hostname)."""
+        with self._pending_lock:
+            taken, self._pending = self._pending, {}
+        self._stats["taken"] += len(taken)
+        return taken
+
+    def metrics(self) -> dict:
+        return {
+            **self._stats,
+            "running": self._sniffer is not None and self._sniffer.running,
+            "source": self.pcap or self.iface,
+            "queue_depth": self._queue.qsize(),
+            "pending": len(self._pending),
+            "queue_size": self._queue.maxsize,
+        }
@@ -0,0 +1,313 @@
+# backend/app/services/topology.py
+
+import functools
+import heapq
+import ipaddress
+import math
+import secrets
+import threading
+from collections import deque
+
+from backend.app.config import TOPOLOGY_GROUP_PREFIX, TOPOLOGY_HISTORY
+from backend.app.services import snapshot
+from backend.app.services.snapshot import render_json
+
+_GOLDEN_ANGLE = math.pi * (3 - math.sqrt(5))
+_NODE_SPACING = 40  # distance between neighbouring devices in a group
+_GROUP_SPACING = _NODE_SPACING * 20  # ~ room for a full /24 around each group
+
+
+def _spiral(k: int, spacing: float) -> tuple[float, float]:
+    """k-th point of a sunflower spiral: evenly packed, and earlier points never move."""
+    r = spacing * math.sqrt(k + 0.5)
+    theta = k * _GOLDEN_ANGLE
+    return round(r * math.cos(theta), 1), round(r * math.sin(theta), 1)
+
+
+@functools.lru_cache(maxsize=65536)
+def _group_of(ip: str) -> str | None:
+    try:
+        return str(ipaddress.IPv4Network(f"{ip}/{TOPOLOGY_GROUP_PREFIX}", strict=False))
+    except ValueError:
+        return None
+
+
+class _Layout:
+    """
+    Stable positions: each group (subnet) gets the next slot on a spiral
+    around the gateway, each device the next slot on a spiral around its
+    group's centre. A device keeps its slot while it is in the snapshot,
+    so a node only moves if its device changes subnet and new nodes never
+    disturb old ones; slots of devices that left are reused, lowest
+    first, so churn does not grow the map or the groups.
+    """
+
+    def __init__(self):
+        self._groups = {}  # subnet -> (index, centre)
+        self._slots = {}  # mac (or (site, mac)) -> (subnet, slot)
+        self._next_slot = {}  # subnet -> slots handed out so far
+        self._free = {}  # subnet -> heap of slots given back
+
+    def slots(self, subnet) -> int:
+        return self._next_slot.get(subnet, 0)
+
+    def group(self, subnet):
+        entry = self._groups.get(subnet)
+        if entry is None:
+            index = len(self._groups)
+            entry = self._groups[subnet] = (index, _spiral(index + 1, _GROUP_SPACING) if index else (0.0, 0.0))
+        return entry[1]
+
+    def _take(self, subnet) -> int:
+        free = self._free.get(subnet)
+        if free:
+            return heapq.heappop(free)
+        n = self._next_slot.get(subnet, 0)
+        self._next_slot[subnet] = n + 1
+        return n
+
+    def _give_back(self, slot):
+        heapq.heappush(self._free.setdefault(slot[0], []), slot[1])
+
+    def place(self, key, subnet) -> tuple[float, float]:
+        slot = self._slots.get(key)
+        if slot is None or slot[0] != subnet:
+            if slot is not None:
+                self._give_back(slot)
+            slot = self._slots[key] = (subnet, self._take(subnet))
+        cx, cy = self.group(subnet)
+        dx, dy = _spiral(slot[1] + 1, _NODE_SPACING)
+        return round(cx + dx, 1), round(cy + dy, 1)
+
+    def retain(self, keys):
+        """Give back the slots of devices not in ``keys`` (every key placed in the current build)."""
+        if len(keys) >= len(self._slots):
+            return  # keys are a subset of the slots: nothing left
+        for key in self._slots.keys() - keys:
+            self._give_back(self._slots.pop(key))
+
+
+class TopologyModel:
+    """
+    Server-side topology, rebuilt from each published snapshot but only
+    versioned when a node, link or group actually changes. Keeps the
+    node/link changes of the last ``history`` versions so clients can
+    fetch a diff instead of the whole graph, and the full graph is
+    rendered at most once per version.
+
+    Fed from the published snapshots, a version is the number of the
+    snapshot the graph changed in, so every worker names one graph the
+    same; standalone, applies are numbered 1, 2, ...
+    """
+
+    def __init__(self, local_ip=None, history=TOPOLOGY_HISTORY):
+        self.local_ip = local_ip
+        self.epoch = secrets.token_hex(4)  # until a snapshot's takes over
+        self.version = 0
+        self._layout = _Layout()
+        self._nodes = {}  # id -> node
+        self._links = {}  # (source, target) -> link
+        self._groups = []
+        self._built = {}  # id(device) -> (device, node, layout key), to reuse nodes of devices carried over unchanged
+        self._changes = deque(maxlen=history)  # (version, node changes, link changes)
+        self._floor = 0  # the changes kept cover every version after this one
+        self._body = None
+        self._lock = threading.Lock()
+
+    @property
+    def etag(self) -> str:
+        return f'"{self.epoch}-topo-{self.version}"'
+
+    @property
+    def version_id(self) -> str:
+        return f"{self.epoch}-{self.version}"
+
+    def _build(self, devices):
+        nodes, links, members, built, placed = {}, {}, {}, {}, set()
+        for d in devices:
+            cached = self._built.get(id(d))
+            if cached is not None and cached[0] is d:
+                node = nodes[cached[1]["id"]] = cached[1]
+                built[id(d)] = cached
+                placed.add(cached[2])
+                members.setdefault(node["group"], []).append(node)
+                continue
+            ip = d["ip"]
+            if not ip:
+                continue
+            site = d.get("site")
+            # sites reuse private address ranges: qualify their nodes and groups
+            node_id = ip if site is None else f"{site}/{ip}"
+            subnet = _group_of(ip) if site is None else f"{site}/{_group_of(ip)}"
+            key = d["mac"] if site is None else (site, d["mac"])
+            x, y = self._layout.place(key, subnet)
+            placed.add(key)
+            nodes[node_id] = {
+                "id":       node_id,
+                "label":    d["name"] or d.get("hostname") or ip,
+                "online":   bool(d["online"]),
+                "mac":      d["mac"],
+                "hostname": d.get("hostname"),
+                "vendor":   d.get("vendor"),
+                "is_gateway": node_id == self.local_ip,
+                "group":    subnet,
+                "site":     site,
+                "x": x,
+                "y": y,
+            }
+            built[id(d)] = (d, nodes[node_id], key)
+            members.setdefault(subnet, []).append(nodes[node_id])
+
+        if self.local_ip:
+            if self.local_ip not in nodes:
+                nodes[self.local_ip] = {
+                    "id": self.local_ip, "label": self.local_ip, "online": True, "mac": None,
+                    "hostname": None, "vendor": None, "is_gateway": True, "group": _group_of(self.local_ip),
+                    "site": None, "x": 0.0, "y": 0.0,
+                }
+            for ip in nodes:
+                if ip != self.local_ip:
+                    links[(self.local_ip, ip)] = {"source": self.local_ip, "target": ip}
+
+        self._layout.retain(placed)
+        groups = []
+        for subnet, group_nodes in members.items():
+            cx, cy = self._layout.group(subnet)
+            groups.append({
+                "id": subnet,
+                "x": cx,
+                "y": cy,
+                "radius": _NODE_SPACING * math.sqrt(self._layout.slots(subnet) + 1.5),
+                "count": len(group_nodes),
+                "online": sum(1 for n in group_nodes if n["online"]),
+            })
+        groups.sort(key=lambda g: g["id"])
+        self._built = built
+        return nodes, links, groups
+
+    def apply(self, devices, version=None, epoch=None) -> bool:
+        """
+        Rebuild from ``devices`` (snapshot ``version`` of ``epoch``, if
+        given); move to a new version and record a diff if anything changed.
+        """
+        with self._lock:
+            if epoch is not None and epoch != self.epoch:
+                # another numbering: no diff can start before this snapshot
+                self.epoch, self.version, self._floor = epoch, version, version
+                self._changes.clear()
+                self._body = None
+            nodes, links, groups = self._build(devices)
+            node_changes = {}
+            for id, node in nodes.items():
+                prev = self._nodes.get(id)
+                if prev is None:
+                    node_changes[id] = "added"
+                elif prev is not node and prev != node:
+                    node_changes[id] = "changed"
+            for id in self._nodes.keys() - nodes.keys():
+                node_changes[id] = "removed"
+            link_changes = {key: "added" for key in links.keys() - self._links.keys()}
+            link_changes.update({key: "removed" for key in self._links.keys() - links.keys()})
+
+            if not node_changes and not link_changes and groups == self._groups:
+                return False
+            self.version = self.version + 1 if version is None else version
+            if len(self._changes) == self._changes.maxlen:
+                self._floor = self._changes[0][0]  # about to be dropped
+            self._nodes, self._links, self._groups = nodes, links, groups
+            self._changes.append((self.version, node_changes, link_changes))
+            self._body = None
+            return True
+
+    def set_local_ip(self, ip):
+        """Use ``ip`` as the gateway from the next snapshot applied on."""
+        with self._lock:
+            self.local_ip = ip
+            self._built = {}  # is_gateway depends on it
+
+    def _full(self) -> dict:
+        return {
+            "version": self.version_id,
+            "nodes": list(self._nodes.values()),
+            "links": list(self._links.values()),
+            "groups": list(self._groups),
+        }
+
+    def full(self) -> dict:
+        with self._lock:
+            return self._full()
+
+    def body(self) -> tuple[bytes, str]:
+        """The full graph as pre-rendered JSON and its ETag."""
+        with self._lock:
+            if self._body is None:
+                self._body = (render_json(self._full()), self.etag)
+            return self._body
+
+    def diff(self, since: str | None) -> dict | None:
+        """
+        Net node/link changes after version ``since`` ("<epoch>-<n>"), or
+        None if it is from another process or older than the history kept.
+        """
+        epoch, _, n = (since or "").rpartition("-")
+        if not n.isdigit():
+            return None
+        since_n = int(n)
+        with self._lock:
+            if epoch != self.epoch or since_n > self.version or since_n < self._floor:
+                return None
+            nodes, links = {}, {}
+            for version, node_changes, link_changes in self._changes:
+                if version <= since_n:
+                    continue
+                for key, change in node_changes.items():
+                    _merge(nodes, key, change)
+                for key, change in link_changes.items():
+                    _merge(links, key, change)
+            return {
+                "version": self.version_id,
+                "since": since,
+                "nodes": {
+                    "added": [self._nodes[id] for id, c in nodes.items() if c == "added"],
+                    "changed": [self._nodes[id] for id, c in nodes.items() if c == "changed"],
+                    "removed": [id for id, c in nodes.items() if c == "removed"],
+                },
+                "links": {
+                    "added": [self._links[key] for key, c in links.items() if c == "added"],
+                    "removed": [{"source": s, "target": t} for (s, t), c in links.items() if c == "removed"],
+                },
+                "groups": list(self._groups),
+            }
+
+
+def _merge(net: dict, key, change: str):
+    """Fold one more change into the net change for ``key`` over a range of versions."""
+    prev = net.get(key)
+    if prev is None:
+        net[key] = change
+    elif change == "removed":
+        if prev == "added":
+            del net[key]  # appeared and went again: nothing to report
+        else:
+            net[key] = "removed"
+    elif change == "added":
+        net[key] = "changed" if prev == "removed" else "added"
+    # "changed" after "added"/"changed" stays as it was
+
+
+model = TopologyModel()
+
+
+def current() -> TopologyModel:
+    """The model, built from the current snapshot if no publish has reached it yet."""
+    snap = snapshot.current()
+    if model.version == 0 and snap.devices:
+        model.apply(snap.devices, snap.version, snap.epoch)
+    return model
+
+
+def _on_publish(previous, snap):
+    model.apply(snap.devices, snap.version, snap.epoch)
+
+
+snapshot.subscribe(_on_publish)
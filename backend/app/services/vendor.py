@@ -0,0 +1,215 @@
+# backend/app/services/vendor.py
+
+import logging
+import threading
+import time
+
+from backend.app.config import (
+    VENDOR_REMOTE_LOOKUP,
+    VENDOR_REMOTE_RATE,
+    VENDOR_REMOTE_BURST,
+    VENDOR_REMOTE_TIMEOUT,
+    VENDOR_CACHE_TTL,
+    VENDOR_NEGATIVE_TTL,
+)
+from backend.app.database import get_vendor_cache, put_vendor_cache
+from backend.app.metrics import LOOKUP_SECONDS, Counter, registry
+from backend.app.registry import mac_to_int
+
+log = logging.getLogger(__name__)
+
+_REMOTE_URL = "https://api.macvendors.com/{}"
+_REMOTE_BACKOFF = 60  # seconds without remote lookups after a transport error
+
+
+def _http_get(url, timeout):
+    # requests takes ~70 ms to import and only the remote fallback needs it
+    import requests
+    return requests.get(url, timeout=timeout)
+
+
+def _oui(mac: str) -> str:
+    return mac.lower().replace("-", ":")[:8]
+
+
+def _is_locally_administered(mac_int: int) -> bool:
+    # randomised/private MACs have no registered vendor
+    return bool((mac_int >> 40) & 0x02)
+
+
+class OuiIndex:
+    """
+    The Wireshark manuf database as one dict per prefix length
+    (24/28/36-bit blocks, plus the odd /16, /40, /48 entries), keyed by
+    the prefix as an int. A lookup is at most one dict probe per length.
+    """
+
+    def __init__(self, path=None):
+        self._tables = {}  # bits -> {prefix: vendor}
+        if path is None:
+            from manuf import manuf
+            path = manuf.MacParser.get_packaged_manuf_file_path()
+        with open(path, encoding="utf-8") as f:
+            for line in f:
+                if not line.strip() or line.startswith("#"):
+                    continue
+                fields = line.rstrip("\n").split("\t")
+                if len(fields) < 2:
+                    continue
+                prefix, _, mask = fields[0].partition("/")
+                digits = prefix.replace(":", "").replace("-", "").replace(".", "")
+                try:
+                    value = int(digits, 16)
+                except ValueError:
+                    continue
+                bits = int(mask) if mask else len(digits) * 4
+                # left-align to 48 bits, then keep the masked prefix
+                key = (value << (48 - len(digits) * 4)) >> (48 - bits)
+                vendor = (fields[2] if len(fields) > 2 else fields[1]).strip() or fields[1].strip()
+                self._tables.setdefault(bits, {})[key] = vendor
+        # most specific match wins
+        self._lengths = sorted(self._tables, reverse=True)
+
+    def __len__(self):
+        return sum(len(t) for t in self._tables.values())
+
+    def lookup(self, mac_int: int) -> str | None:
+        for bits in self._lengths:
+            vendor = self._tables[bits].get(mac_int >> (48 - bits))
+            if vendor is not None:
+                return vendor
+        return None
+
+
+class _TokenBucket:
+    def __init__(self, rate, burst):
+        self.rate = rate
+        self.burst = burst
+        self._tokens = burst
+        self._at = time.monotonic()
+        self._lock = threading.Lock()
+
+    def try_acquire(self) -> bool:
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.burst, self._tokens + (now - self._at) * self.rate)
+            self._at = now
+            if self._tokens >= 1:
+                self._tokens -= 1
+                return True
+            return False
+
+
+class VendorResolver:
+    """
+    OUI-first vendor resolution. The offline index answers almost every
+    MAC in-memory; only misses go to api.macvendors.com, rate-limited and
+    de-duplicated per OUI, with positive and negative results kept in the
+    vendor_cache table. New cache rows are written in one batch by flush().
+    """
+
+    def __init__(self, remote=VENDOR_REMOTE_LOOKUP, rate=VENDOR_REMOTE_RATE,
+                 burst=VENDOR_REMOTE_BURST, timeout=VENDOR_REMOTE_TIMEOUT):
+        self.remote = remote
+        self.timeout = timeout
+        self._bucket = _TokenBucket(rate, burst)
+        self._index = None
+        self._cache = None  # oui -> (vendor, expires_at)
+        self._pending = []
+        self._inflight = set()
+        self._remote_down_until = 0.0
+        self._lock = threading.Lock()
+        self.stats = {"index_hits": 0, "cache_hits": 0, "remote_lookups": 0,
+                      "remote_errors": 0, "rate_limited": 0, "unresolved": 0}
+
+    def load(self):
+        """Build the OUI index and read the persistent cache (once)."""
+        if self._index is not None and self._cache is not None:
+            return
+        with self._lock:
+            if self._index is None:
+                self._index = OuiIndex()
+            if self._cache is None:
+                self._cache = {oui: (v, exp) for oui, v, exp in get_vendor_cache()}
+
+    def lookup_local(self, mac: str) -> tuple[bool, str | None]:
+        """(resolved, vendor) from the index and cache only; never blocks on I/O."""
+        self.load()
+        mac_int = mac_to_int(mac)
+        vendor = self._index.lookup(mac_int)
+        if vendor is not None:
+            self.stats["index_hits"] += 1
+            return True, vendor
+        if _is_locally_administered(mac_int):
+            return True, None
+        cached = self._cache.get(_oui(mac))
+        if cached and cached[1] > time.time():
+            self.stats["cache_hits"] += 1
+            return True, cached[0]
+        return False, None
+
+    def resolve(self, mac: str) -> str | None:
+        """Local lookup, falling back to a (rate-limited) remote query."""
+        found, vendor = self.lookup_local(mac)
+        if found:
+            return vendor
+        if self.needs_remote(mac):
+            return self.lookup_remote(mac)
+        self.stats["unresolved"] += 1
+        return None
+
+    def needs_remote(self, mac: str) -> bool:
+        return self.remote and time.monotonic() >= self._remote_down_until
+
+    def lookup_remote(self, mac: str) -> str | None:
+        oui = _oui(mac)
+        with self._lock:
+            if oui in self._inflight:
+                return None
+            if not self._bucket.try_acquire():
+                self.stats["rate_limited"] += 1
+                return None
+            self._inflight.add(oui)
+        try:
+            self.stats["remote_lookups"] += 1
+            with LOOKUP_SECONDS.time("vendor"):
+                resp = _http_get(_REMOTE_URL.format(mac), timeout=self.timeout)
+            if resp.status_code == 404:
+                vendor, ttl = None, VENDOR_NEGATIVE_TTL
+            else:
+                resp.raise_for_status()
+                vendor, ttl = resp.text.strip() or None, VENDOR_CACHE_TTL
+        except OSError as e:  # requests.RequestException included
+            # network trouble: stop trying for a while, but don't cache the miss
+            self.stats["remote_errors"] += 1
+            self._remote_down_until = time.monotonic() + _REMOTE_BACKOFF
+            log.debug("Remote vendor lookup for %s failed: %s", mac, e)
+            return None
+        finally:
+            with self._lock:
+                self._inflight.discard(oui)
+
+        expires_at = time.time() + ttl
+        with self._lock:
+            self._cache[oui] = (vendor, expires_at)
+            self._pending.append((oui, vendor, expires_at))
+        log.debug("Remote vendor lookup %s -> %s", mac, vendor)
+        return vendor
+
+    def flush(self):
+        """Write cache entries gathered since the last flush in one transaction."""
+        with self._lock:
+            rows, self._pending = self._pending, []
+        if rows:
+            put_vendor_cache(rows)
+
+
+resolver = VendorResolver()
+
+
+@registry.collector
+def _collect():
+    lookups = Counter("netview_vendor_lookups_total", "Vendor lookups by how they were answered", ("result",))
+    for result, value in resolver.stats.items():
+        lookups.inc(result, amount=value)
+    return (lookups,)
@@ -0,0 +1,100 @@
+# backend/app/tracing.py
+"""
+Span instrumentation for scan cycles. Code anywhere in the app wraps its
+steps in ``span()`` and its DB connections in ``traced()``; both are
+no-ops unless services/profiling.py is tracing the current cycle, in
+which case ``current_trace`` holds the Trace the spans are recorded into.
+This module has no dependencies so the core modules can import it.
+"""
+
+import contextvars
+import time
+
+current_trace = contextvars.ContextVar("netview_trace", default=None)
+_parent = contextvars.ContextVar("netview_span", default=None)
+
+
+class _NoSpan:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def set(self, **attrs):
+        pass
+
+
+_NO_SPAN = _NoSpan()
+
+
+class Span:
+    """One timed block, recorded into ``trace`` (anything with ``ids`` and ``add()``) on exit."""
+
+    __slots__ = ("trace", "name", "attrs", "id", "parent", "start", "_token")
+
+    def __init__(self, trace, name, attrs):
+        self.trace = trace
+        self.name = name
+        self.attrs = attrs
+
+    def set(self, **attrs):
+        self.attrs.update(attrs)
+
+    def __enter__(self):
+        self.id = next(self.trace.ids)
+        self.parent = _parent.get()
+        self._token = _parent.set(self.id)
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        end = time.perf_counter()
+        _parent.reset(self._token)
+        if exc_type is not None:
+            self.attrs["error"] = exc_type.__name__
+        self.trace.add(self.id, self.parent, self.name, self.start, end, self.attrs)
+        return False
+
+
+def span(name, **attrs):
+    """
+    Time the block as ``name`` within the scan cycle being traced, if
+    any. Otherwise this returns a shared no-op, so instrumented code
+    costs one ContextVar lookup while tracing is off.
+    """
+    trace = current_trace.get()
+    return _NO_SPAN if trace is None else Span(trace, name, attrs)
+
+
+def _statement(sql) -> str:
+    sql = " ".join(sql.split())
+    return sql if len(sql) <= 80 else sql[:77] + "..."
+
+
+class _TracedConnection:
+    """A sqlite3 connection whose execute/executemany calls are recorded as spans."""
+
+    __slots__ = ("_conn",)
+
+    def __init__(self, conn):
+        self._conn = conn
+
+    def __getattr__(self, name):
+        return getattr(self._conn, name)
+
+    def execute(self, sql, params=()):
+        with span(f"sql {_statement(sql)}"):
+            return self._conn.execute(sql, params)
+
+    def executemany(self, sql, rows):
+        rows = rows if isinstance(rows, list) else list(rows)
+        with span(f"sql {_statement(sql)}", rows=len(rows)):
+            return self._conn.executemany(sql, rows)
+
+
+def traced(conn):
+    """``conn``, recording its statements if a cycle is being traced."""
+    return conn if current_trace.get() is None else _TracedConnection(conn)
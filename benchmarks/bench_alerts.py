@@ -0,0 +1,93 @@
+"""
+Alerts API query and insert time with a large alerts table.
+
+    python -m benchmarks.bench_alerts [alerts]
+
+Seeds a throwaway DB with ``alerts`` (default 1,000,000) alerts spread
+over 5,000 devices and 30 days, then times page queries, filters and a
+sweep's worth of deduplicated inserts, with the indexes and again after
+dropping them (the old schema). The old unpaginated get_alerts() is
+timed once for comparison.
+"""
+import datetime
+import os
+import sys
+import tempfile
+import time
+
+from backend.app import database
+from benchmarks.bench_sweep_writes import _ip, _mac
+
+DEVICES = 5_000
+TYPES = ("new_device", "device_offline", "device_back_online")
+QUERIES = 20
+
+
+def _seed(n):
+    database.init_db()
+    now = datetime.datetime.now(datetime.timezone.utc)
+    step = datetime.timedelta(days=30) / n
+    macs = [_mac(i) for i in range(DEVICES)]
+    with database._writer() as conn:
+        conn.executemany(
+            "INSERT INTO alerts (type, mac, ip, timestamp, message) VALUES (?, ?, ?, ?, ?)",
+            ((TYPES[i % 3], macs[i % DEVICES], _ip(i % DEVICES), now - (n - i) * step, f"alert {i}")
+             for i in range(n)),
+        )
+
+
+def _avg_ms(fn, *args, runs=QUERIES, **kwargs):
+    started = time.perf_counter()
+    for _ in range(runs):
+        fn(*args, **kwargs)
+    return (time.perf_counter() - started) / runs * 1000
+
+
+def _run(n, label):
+    newest = database.get_alerts(limit=1)[0]["id"]
+    hour_ago = time.time() - 3600
+    sweep = [(TYPES[i % 3], _mac(i), _ip(i), f"sweep alert {i}") for i in range(50)]
+    timings = {
+        "first page (100)": _avg_ms(database.get_alerts, limit=100),
+        "deep page (100)": _avg_ms(database.get_alerts, limit=100, before_id=n // 2),
+        "since_id": _avg_ms(database.get_alerts, limit=100, since_id=newest - 10),
+        "by type": _avg_ms(database.get_alerts, limit=100, type="device_offline"),
+        "by mac": _avg_ms(database.get_alerts, limit=100, mac=_mac(42)),
+        "last hour": _avg_ms(database.get_alerts, limit=100, start=hour_ago),
+        "50 deduped inserts": _avg_ms(database.apply_sweep, [], sweep, runs=3),
+    }
+    for name, ms in timings.items():
+        print(f"{label:<10} {name:<22} {ms:>10.3f}")
+
+
+def main(n):
+    original = database.DB_PATH
+    with tempfile.TemporaryDirectory() as tmp:
+        database.DB_PATH = os.path.join(tmp, "bench.db")
+        try:
+            started = time.perf_counter()
+            _seed(n)
+            print(f"seeded {n:,} alerts in {time.perf_counter() - started:.1f}s")
+            print(f"{'schema':<10} {'query':<22} {'avg (ms)':>10}")
+            _run(n, "indexed")
+
+            with database._writer() as conn:
+                for index in ("idx_alerts_mac_type_ts", "idx_alerts_type", "idx_alerts_timestamp"):
+                    conn.execute(f"DROP INDEX {index}")
+            _run(n, "no index")
+
+            started = time.perf_counter()
+            rows = database.get_alerts()
+            print(f"{'old':<10} {'all ' + format(len(rows), ',') + ' rows':<22} "
+                  f"{(time.perf_counter() - started) * 1000:>10.3f}")
+
+            started = time.perf_counter()
+            removed = database.prune_alerts()
+            print(f"prune_alerts removed {removed:,} rows in {time.perf_counter() - started:.2f}s")
+        finally:
+            database.close_pool()
+            database.DB_PATH = original
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000)
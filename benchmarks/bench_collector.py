@@ -0,0 +1,143 @@
+"""
+Multi-site ingest: many site agents pushing deltas to one collector.
+
+    python -m benchmarks.bench_collector [--agents 200] [--processes 8] [--devices 250] [--churn 5] [--rounds 10]
+
+Starts a collector (uvicorn, one worker) on a temporary DB, then runs
+``agents`` agents spread over ``processes`` processes. Each agent first
+pushes a full copy of its site of ``devices`` devices (every site reuses
+the same MACs, as cloned sites do), then for ``rounds`` rounds changes
+``churn`` devices and pushes the delta over HTTP with the real spool and
+client. Reports the initial sync, sustained pushes and deltas per second,
+push latency and the collector's publish time, and checks that the
+collector ends up with every site's devices.
+"""
+import argparse
+import multiprocessing
+import os
+import random
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+
+import httpx
+
+from benchmarks.bench_load import _summary
+
+
+def _serve(port, db):
+    import uvicorn
+
+    from backend.app import database, main as app_main
+    database.DB_PATH = db
+    app_main.COLLECTOR_ENABLED = True
+    uvicorn.run(app_main.app, host="127.0.0.1", port=port, log_level="warning")
+
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def _agents(url, spool_root, sites, devices, churn, rounds, start):
+    from backend.app.registry import Device, DeviceRegistry
+    from backend.app.services.agent import Agent, DeltaSpool
+    from backend.app.services.snapshot import DeviceSnapshot
+
+    rng = random.Random(sites[0])
+    agents, fleets = [], []
+    for site in sites:
+        agents.append(Agent(site=site, url=url, spool=DeltaSpool(os.path.join(spool_root, site)), heartbeat=0))
+        fleets.append([Device(f"02:00:00:00:{i >> 8:02x}:{i & 0xff:02x}", f"10.0.{i // 250}.{i % 250 + 1}", 1,
+                              vendor="Bench") for i in range(devices)])
+
+    def push(i):
+        agents[i].record(DeviceSnapshot(0, DeviceRegistry(fleets[i])))
+        started = time.perf_counter()
+        ok = agents[i].push_once()
+        return ok, time.perf_counter() - started
+
+    start.wait()
+    initial = [push(i)[1] for i in range(len(agents))]
+    latencies, failures = [], 0
+    for _ in range(rounds):
+        for i, fleet in enumerate(fleets):
+            for j in rng.sample(range(devices), churn):
+                dev = fleet[j]
+                fleet[j] = Device(dev.mac, f"10.0.{j // 250}.{rng.randrange(1, 251)}", 1 - dev.online,
+                                  vendor="Bench")
+            ok, elapsed = push(i)
+            latencies.append(elapsed)
+            failures += not ok
+    return initial, latencies, failures, sum(a.metrics()["bytes_sent"] for a in agents)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--agents", type=int, default=200)
+    parser.add_argument("--processes", type=int, default=8)
+    parser.add_argument("--devices", type=int, default=250)
+    parser.add_argument("--churn", type=int, default=5)
+    parser.add_argument("--rounds", type=int, default=10)
+    parser.add_argument("--serve", nargs=2, metavar=("PORT", "DB"), help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+    if args.serve:
+        return _serve(int(args.serve[0]), args.serve[1])
+
+    tmp = tempfile.mkdtemp(prefix="netview-collector-")
+    port = _free_port()
+    url = f"http://127.0.0.1:{port}"
+    server = subprocess.Popen([sys.executable, "-m", "benchmarks.bench_collector", "--serve", str(port),
+                               os.path.join(tmp, "collector.db")])
+    try:
+        for _ in range(100):
+            try:
+                httpx.get(f"{url}/api/sites", timeout=1).raise_for_status()
+                break
+            except httpx.HTTPError:
+                time.sleep(0.1)
+        else:
+            raise SystemExit("collector did not start")
+
+        sites = [f"site-{i:04d}" for i in range(args.agents)]
+        groups = [sites[i::args.processes] for i in range(args.processes)]
+        with multiprocessing.Manager() as manager:
+            start = manager.Event()
+            with multiprocessing.Pool(args.processes) as pool:
+                pending = pool.starmap_async(_agents, [(url, os.path.join(tmp, "spool"), group, args.devices,
+                                                        args.churn, args.rounds, start) for group in groups])
+                time.sleep(1)  # let every worker build its sites
+                started = time.perf_counter()
+                start.set()
+                results = pending.get()
+                elapsed = time.perf_counter() - started
+
+        initial = [t for r in results for t in r[0]]
+        latencies = [t for r in results for t in r[1]]
+        failures = sum(r[2] for r in results)
+        sent = sum(r[3] for r in results)
+        time.sleep(2.5)  # one publish interval, so the snapshot holds every push
+        collector = httpx.get(f"{url}/api/debug/collector").json()
+        devices = len(httpx.get(f"{url}/api/debug/devices", timeout=60).json())
+
+        sync, push = _summary(initial), _summary(latencies)
+        print(f"{args.agents} agents in {args.processes} processes, {args.devices} devices per site, "
+              f"{args.churn} changed per round, {args.rounds} rounds")
+        print(f"initial sync: {len(initial)} full copies, push p50 {sync['p50']:.1f} ms, p99 {sync['p99']:.1f} ms")
+        print(f"deltas: {len(latencies)} in {elapsed:.2f} s (incl. sync) = {len(latencies) / elapsed:.0f} pushes/s, "
+              f"push p50 {push['p50']:.1f} ms, p99 {push['p99']:.1f} ms, {failures} failed")
+        print(f"sent {sent / 1e6:.1f} MB compressed; collector applied {collector['deltas']} deltas, "
+              f"{collector['publishes']} publishes, last publish {collector['last_publish_seconds'] * 1000:.0f} ms")
+        expected = args.agents * args.devices
+        print(f"collector serves {devices} devices (expected {expected})")
+        return 0 if devices == expected and not failures else 1
+    finally:
+        server.terminate()
+        server.wait()
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,96 @@
+"""
+Probe throughput of the service fingerprinter against local stand-ins.
+
+    python -m benchmarks.bench_fingerprint [--hosts 64] [--open 4] [--closed 12] [--delay-ms 20]
+
+Starts ``open`` listeners on each of 127.0.0.1 .. 127.0.0.<hosts>
+(Linux routes all of 127/8 to loopback) that send a banner after
+``delay-ms``, standing in for a LAN round trip and a slow service, leaves
+``closed`` more ports unused and points the mDNS/NetBIOS/SSDP queries at
+closed UDP ports, then runs one probe pass per concurrency setting and
+reports probes per second. The last line repeats the widest setting
+under FINGERPRINT_RATE_PPS to show the rate cap holding.
+"""
+import argparse
+import asyncio
+import socket
+import time
+
+from backend.app.config import FINGERPRINT_RATE_PPS
+from backend.app.services.fingerprint import Fingerprinter
+
+BANNER = b"SSH-2.0-OpenSSH_9.6p1 Debian-4\r\n"
+
+
+def _free_ports(n, kind=socket.SOCK_STREAM) -> list[int]:
+    socks = [socket.socket(socket.AF_INET, kind) for _ in range(n)]
+    try:
+        for s in socks:
+            s.bind(("127.0.0.1", 0))
+        return [s.getsockname()[1] for s in socks]
+    finally:
+        for s in socks:
+            s.close()
+
+
+def _handler(delay):
+    async def handle(reader, writer):
+        await asyncio.sleep(delay)
+        writer.write(BANNER)
+        await writer.drain()
+        writer.close()
+    return handle
+
+
+async def _run(args):
+    ips = [f"127.0.0.{i}" for i in range(1, args.hosts + 1)]
+    open_ports = _free_ports(args.open)
+    closed_ports = _free_ports(args.closed)
+    udp = _free_ports(1, socket.SOCK_DGRAM)[0]
+    handle = _handler(args.delay_ms / 1000)
+    servers = [await asyncio.start_server(handle, ip, port, backlog=1024) for ip in ips for port in open_ports]
+    probes = len(ips) * (len(open_ports) + len(closed_ports) + 3)
+    print(f"{len(ips)} hosts x ({len(open_ports)} open + {len(closed_ports)} closed TCP ports "
+          f"+ 3 name queries) = {probes} probes")
+    print(f"{'concurrency':>11} {'per host':>8} {'rate cap':>8} {'seconds':>8} {'probes/s':>9} {'open found':>10}")
+
+    runs = [(c, args.per_host, 0) for c in args.concurrency]
+    runs.append((args.concurrency[-1], args.per_host, FINGERPRINT_RATE_PPS))
+    try:
+        for concurrency, per_host, rate in runs:
+            fp = Fingerprinter(ports=open_ports + closed_ports, concurrency=concurrency, per_host=per_host,
+                               rate_pps=rate, timeout=2, banner_timeout=2,
+                               name_ports=dict.fromkeys(("mdns", "netbios", "ssdp"), udp))
+            started = time.perf_counter()
+            results = await fp.probe(ips)
+            elapsed = time.perf_counter() - started
+            found = sum(len(r["ports"]) for r in results.values())
+            print(f"{concurrency:>11} {per_host:>8} {rate or '-':>8} {elapsed:>8.2f} "
+                  f"{probes / elapsed:>9.0f} {found:>10}")
+            if found != len(ips) * len(open_ports):
+                print(f"  expected {len(ips) * len(open_ports)} open ports")
+    finally:
+        for server in servers:
+            server.close()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--hosts", type=int, default=64)
+    parser.add_argument("--open", type=int, default=4)
+    parser.add_argument("--closed", type=int, default=12)
+    parser.add_argument("--per-host", type=int, default=8)
+    parser.add_argument("--delay-ms", type=float, default=20)
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 16, 64, 256])
+    args = parser.parse_args(argv)
+    try:
+        import resource
+        soft, hard = resource.getrlimit(resource.RLIMIT_NOFILE)
+        resource.setrlimit(resource.RLIMIT_NOFILE, (hard, hard))
+    except (ImportError, ValueError, OSError):
+        pass
+    asyncio.run(_run(args))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,80 @@
+"""
+Device-history query time with a year of data.
+
+    python -m benchmarks.bench_history [devices] [days]
+
+Seeds a throwaway DB with ``devices`` (default 5,000) devices that each
+come online once a day for ``days`` (default 365) days, plus roll-ups at
+every retained resolution, then times the uptime and online-count
+queries over a day, a month and the whole range, and one sweep write.
+"""
+import os
+import random
+import sys
+import tempfile
+import time
+
+from backend.app import database, history
+from backend.app.config import HISTORY_ROLLUP_RETENTION_DAYS
+from benchmarks.bench_sweep_writes import _ip, _mac
+
+QUERIES = 100
+
+
+def _seed(n, days, now):
+    database.init_db()
+    database.apply_sweep([(_mac(i), _ip(i), None, None) for i in range(n)])
+    start = now - days * 86400
+    macs = [_mac(i) for i in range(n)]
+    with database._writer() as conn:
+        conn.execute("DELETE FROM presence_intervals")
+        for day in range(days):
+            base = start + day * 86400
+            conn.executemany(
+                "INSERT INTO presence_intervals (mac, start, end) VALUES (?, ?, ?)",
+                [(macs[i], base + (i % 12) * 3600, base + (i % 12 + 8) * 3600) for i in range(n)],
+            )
+        for name, res in history.RESOLUTIONS.items():
+            keep = min(days, HISTORY_ROLLUP_RETENTION_DAYS[name]) * 86400
+            conn.executemany(
+                "INSERT OR REPLACE INTO online_counts VALUES (?, ?, 10, ?, ?, ?)",
+                [(res, b, n * 5, n // 3, n) for b in range(int((now - keep) // res) * res, int(now), res)],
+            )
+
+
+def _avg(fn, *args):
+    started = time.perf_counter()
+    for _ in range(QUERIES):
+        fn(*args)
+    return (time.perf_counter() - started) / QUERIES * 1000
+
+
+def main(n, days):
+    original = database.DB_PATH
+    now = time.time()
+    with tempfile.TemporaryDirectory() as tmp:
+        database.DB_PATH = os.path.join(tmp, "bench.db")
+        try:
+            started = time.perf_counter()
+            _seed(n, days, now)
+            print(f"seeded {n * days:,} intervals in {time.perf_counter() - started:.1f}s")
+
+            mac = _mac(random.randrange(n))
+            print(f"{'query':<28} {'avg (ms)':>10}")
+            for label, span in (("day", 86400), ("month", 30 * 86400), ("year", days * 86400)):
+                print(f"{'uptime / ' + label:<28} {_avg(database.get_device_uptime, mac, now - span, now):>10.3f}")
+                print(f"{'online counts / ' + label:<28} {_avg(database.get_online_counts, now - span, now):>10.3f}")
+
+            writes = [(_mac(i), _ip(i), None, None) for i in range(n) if i % 10]
+            started = time.perf_counter()
+            database.apply_sweep(writes)
+            print(f"{'sweep write (' + str(len(writes)) + ' devices)':<28} "
+                  f"{(time.perf_counter() - started) * 1000:>10.3f}")
+        finally:
+            database.close_pool()
+            database.DB_PATH = original
+
+
+if __name__ == "__main__":
+    args = [int(a) for a in sys.argv[1:]]
+    main(*(args + [5_000, 365][len(args):]))
@@ -0,0 +1,226 @@
+"""
+Scanner + API load simulation against a synthetic network.
+
+    python -m benchmarks.bench_load [--hosts N] [--sweeps N] [--clients N] ...
+
+Runs full sweeps (and liveness checks between them) against a
+FakeNetwork with the given size, churn and latencies, while concurrent
+clients hit the API in-process. Reports sweep and request throughput,
+p50/p99 latencies, topology build time and memory (max RSS, plus
+tracemalloc's peak with --tracemalloc), appends the run to
+benchmarks/results/load.jsonl and compares it with the last run that
+used the same parameters.
+"""
+import argparse
+import asyncio
+import datetime
+import json
+import os
+import pathlib
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+
+import httpx
+
+from backend.app import database
+from benchmarks.fakenet import FakeNetwork
+
+RESULTS = pathlib.Path(__file__).parent / "results" / "load.jsonl"
+ENDPOINTS = ("/api/stats", "/api/topology", "/api/debug/devices", "/api/alerts?limit=100")
+REGRESSION = 0.10  # flag metrics more than 10% worse than the last comparable run
+
+
+def _percentile(values, pct):
+    if not values:
+        return None
+    values = sorted(values)
+    return values[min(len(values) - 1, int(round(pct / 100 * (len(values) - 1))))]
+
+
+def _summary(values, unit=1000):
+    return {
+        "count": len(values),
+        "p50": _percentile(values, 50) and _percentile(values, 50) * unit,
+        "p99": _percentile(values, 99) and _percentile(values, 99) * unit,
+        "max": max(values) * unit if values else None,
+    }
+
+
+def _max_rss_mb():
+    try:
+        import resource
+    except ImportError:  # Windows
+        return None
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return rss / (1024 * 1024) if sys.platform == "darwin" else rss / 1024
+
+
+def _git_rev():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+async def _sweeps(net, args, results):
+    from backend.app.services.network_monitor import check_liveness_async, discover_and_update_async
+
+    for _ in range(args.sweeps):
+        timings = {}
+        devices = await discover_and_update_async(timings)
+        results["sweep"].append(timings["total"])
+        results["sweep_phases"].append({k: timings[k] for k in ("arp", "lookups", "db")})
+        net.step()
+        online = [d["mac"] for d in devices if d["online"]]
+        for _ in range(args.liveness):
+            timings = {}
+            await check_liveness_async(online, timings)
+            results["liveness"].append(timings["total"])
+            net.step()
+
+
+async def _client(client, stop, latencies, errors):
+    i = 0
+    while not stop.is_set():
+        path = ENDPOINTS[i % len(ENDPOINTS)]
+        i += 1
+        started = time.perf_counter()
+        resp = await client.get(path)
+        latencies.setdefault(path, []).append(time.perf_counter() - started)
+        if resp.status_code >= 400:
+            errors[path] = errors.get(path, 0) + 1
+        await asyncio.sleep(0)
+
+
+async def _run(net, args):
+    from backend.app.main import app
+    from backend.app.services import snapshot
+
+    results = {"sweep": [], "sweep_phases": [], "liveness": []}
+    latencies, errors = {}, {}
+    stop = asyncio.Event()
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        clients = [asyncio.create_task(_client(client, stop, latencies, errors)) for _ in range(args.clients)]
+        started = time.perf_counter()
+        await _sweeps(net, args, results)
+        elapsed = time.perf_counter() - started
+        stop.set()
+        await asyncio.gather(*clients)
+
+    from backend.app.services.topology import TopologyModel
+    devices = snapshot.current().devices
+    topology = []
+    for _ in range(20):
+        t = time.perf_counter()
+        TopologyModel("10.0.0.1").apply(devices)
+        topology.append(time.perf_counter() - t)
+
+    requests_done = sum(len(v) for v in latencies.values())
+    return {
+        "elapsed_seconds": elapsed,
+        "devices": len(devices),
+        "sweeps_per_second": len(results["sweep"]) / elapsed,
+        "sweep_ms": _summary(results["sweep"]),
+        "sweep_phase_ms": {
+            phase: _summary([p[phase] for p in results["sweep_phases"]])["p50"] for phase in ("arp", "lookups", "db")
+        },
+        "liveness_ms": _summary(results["liveness"]),
+        "requests_per_second": requests_done / elapsed,
+        "request_ms": _summary([x for v in latencies.values() for x in v]),
+        "request_ms_by_endpoint": {path: _summary(v) for path, v in latencies.items()},
+        "request_errors": errors,
+        "topology_ms": _summary(topology),
+        "fake_network_calls": net.calls,
+    }
+
+
+def _compare(entry):
+    """Print metrics that got worse than the last run with the same params."""
+    if not RESULTS.exists():
+        return
+    previous = None
+    for line in RESULTS.read_text().splitlines():
+        row = json.loads(line)
+        if row["params"] == entry["params"]:
+            previous = row
+    if previous is None:
+        print("no previous run with these parameters")
+        return
+    print(f"vs {previous['git']} ({previous['at']}):")
+    checks = [
+        ("sweep p50 ms", previous["results"]["sweep_ms"]["p50"], entry["results"]["sweep_ms"]["p50"], False),
+        ("sweep p99 ms", previous["results"]["sweep_ms"]["p99"], entry["results"]["sweep_ms"]["p99"], False),
+        ("request p50 ms", previous["results"]["request_ms"]["p50"], entry["results"]["request_ms"]["p50"], False),
+        ("request p99 ms", previous["results"]["request_ms"]["p99"], entry["results"]["request_ms"]["p99"], False),
+        ("requests/s", previous["results"]["requests_per_second"], entry["results"]["requests_per_second"], True),
+        ("max RSS MB", previous["memory"]["max_rss_mb"], entry["memory"]["max_rss_mb"], False),
+    ]
+    for name, old, new, higher_is_better in checks:
+        if not old or new is None:
+            continue
+        change = (new - old) / old
+        worse = -change if higher_is_better else change
+        flag = "  REGRESSION" if worse > REGRESSION else ""
+        print(f"  {name:<16} {old:>10.2f} -> {new:>10.2f} ({change:+.0%}){flag}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--hosts", type=int, default=1_000)
+    parser.add_argument("--churn", type=float, default=0.02, help="share of hosts flipping state per step")
+    parser.add_argument("--new-rate", type=float, default=0.002, help="new hosts per step, as a share")
+    parser.add_argument("--loss", type=float, default=0.0)
+    parser.add_argument("--rtt-ms", type=float, default=2.0, help="median ARP reply time")
+    parser.add_argument("--dns-ms", type=float, default=5.0, help="median reverse-DNS time")
+    parser.add_argument("--vendor-ms", type=float, default=80.0, help="median remote vendor lookup time")
+    parser.add_argument("--sweeps", type=int, default=5)
+    parser.add_argument("--liveness", type=int, default=2, help="liveness checks after each sweep")
+    parser.add_argument("--clients", type=int, default=20)
+    parser.add_argument("--tracemalloc", action="store_true",
+                        help="also report peak traced Python memory (slows everything down)")
+    parser.add_argument("--no-save", action="store_true")
+    args = parser.parse_args(argv)
+
+    params = {k: v for k, v in vars(args).items() if k != "no_save"}
+    peak = None
+    original = database.DB_PATH
+    with tempfile.TemporaryDirectory() as tmp:
+        database.DB_PATH = os.path.join(tmp, "bench.db")
+        database.init_db()  # the app's lifespan would; ASGITransport does not run it
+        try:
+            net = FakeNetwork(hosts=args.hosts, churn=args.churn, new_rate=args.new_rate, loss=args.loss,
+                              rtt_ms=args.rtt_ms, dns_ms=args.dns_ms, vendor_ms=args.vendor_ms)
+            if args.tracemalloc:
+                tracemalloc.start()
+            with net.patch():
+                results = asyncio.run(_run(net, args))
+            if args.tracemalloc:
+                peak = tracemalloc.get_traced_memory()[1] / 1024 / 1024
+                tracemalloc.stop()
+        finally:
+            database.close_pool()
+            database.DB_PATH = original
+
+    entry = {
+        "at": datetime.datetime.now(datetime.timezone.utc).isoformat(timespec="seconds"),
+        "git": _git_rev(),
+        "python": sys.version.split()[0],
+        "params": params,
+        "results": results,
+        "memory": {"traced_peak_mb": peak, "max_rss_mb": _max_rss_mb()},
+    }
+    print(json.dumps({k: entry[k] for k in ("params", "results", "memory")}, indent=2))
+    _compare(entry)
+    if not args.no_save:
+        RESULTS.parent.mkdir(exist_ok=True)
+        with RESULTS.open("a") as f:
+            f.write(json.dumps(entry) + "\n")
+
+
+if __name__ == "__main__":
+    main()
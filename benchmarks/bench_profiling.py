@@ -0,0 +1,72 @@
+"""
+Cost of the sweep instrumentation, with tracing off and on.
+
+    python -m benchmarks.bench_profiling [--hosts 254] [--sweeps 15]
+
+Times span() while nothing is traced, then runs full sweeps against a
+FakeNetwork (no simulated latency, so the Python overhead is not hidden
+behind network waits) alternating untraced and traced cycles, and
+reports the median sweep time of each, the spans a traced sweep records
+and the disabled cost those spans add to an untraced sweep.
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import tempfile
+import timeit
+
+from backend.app import database
+from backend.app.services import profiling
+from backend.app.tracing import span
+from backend.app.services.scan_engine import ScanEngine
+from benchmarks.fakenet import FakeNetwork
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--hosts", type=int, default=254)
+    parser.add_argument("--sweeps", type=int, default=15)
+    args = parser.parse_args(argv)
+
+    def disabled():
+        with span("lookup", ip="10.0.0.1"):
+            pass
+
+    n = 1_000_000
+    span_ns = min(timeit.repeat(disabled, number=n, repeat=3)) / n * 1e9
+    print(f"span() with tracing off: {span_ns:.0f} ns")
+
+    database.DB_PATH = os.path.join(tempfile.mkdtemp(), "devices.db")
+    database.init_db()
+    net = FakeNetwork(hosts=args.hosts, churn=0.02, new_rate=0, time_scale=0)
+    engine = ScanEngine(fingerprint=False)
+    off, on, spans = [], [], []
+
+    async def run():
+        await engine.sweep_once()  # warm caches and the DB
+        for i in range(args.sweeps * 2):
+            traced = i % 2 == 1
+            if traced:
+                profiling.tracer.arm(1)
+            timings = await engine.sweep_once()
+            (on if traced else off).append(timings["total"])
+            if traced:
+                spans.append(profiling.tracer.get(timings["trace"]).summary()["spans"])
+            net.step()
+
+    with net.patch():
+        asyncio.run(run())
+    database.close_pool()
+
+    off_ms, on_ms = statistics.median(off) * 1000, statistics.median(on) * 1000
+    per_sweep = statistics.median(spans)
+    print(f"{args.hosts} hosts, {args.sweeps} sweeps each")
+    print(f"  untraced: median {off_ms:7.1f} ms")
+    print(f"  traced:   median {on_ms:7.1f} ms  ({per_sweep:.0f} spans, {on_ms / off_ms - 1:+.0%})")
+    print(f"  disabled spans cost {per_sweep * span_ns / 1e6:.3f} ms per sweep "
+          f"({per_sweep * span_ns / 1e6 / off_ms:.2%} of an untraced sweep)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,71 @@
+"""
+Memory and build/serialize time of the device registry vs dict rows.
+
+    python -m benchmarks.bench_registry [devices]
+
+Builds ``devices`` (default 50,000) rows as they come out of SQLite,
+then measures the traced memory and build time of the old list of dicts
+and of a DeviceRegistry, plus a MAC lookup and a full JSON render of
+each.
+"""
+import json
+import sys
+import time
+import tracemalloc
+
+from backend.app.registry import FIELDS, DeviceRegistry
+from backend.app.services.snapshot import render_json
+from benchmarks.bench_sweep_writes import _ip, _mac
+
+VENDORS = ("Cisco Systems, Inc", "Raspberry Pi Foundation", "Apple, Inc.", "Ubiquiti Inc", None)
+
+
+def _rows(n):
+    # fresh strings per row, as sqlite3 returns them; a sweep stamps every device with one time
+    for i in range(n):
+        yield (_mac(i), _ip(i), i % 3 != 0, f"2024-01-01 00:{i % 60:02d}:00", "".join("2024-01-02 00:00:00"),
+               None, f"host-{i}.lan" if i % 2 else None, "".join(VENDORS[i % 4]) if i % 5 else None, (), None, None)
+
+
+def _measure(build, n):
+    """Traced memory still held after building from ``n`` fresh rows, and the build time alone."""
+    tracemalloc.start()
+    result = build(_rows(n))
+    size = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    rows = list(_rows(n))
+    started = time.perf_counter()
+    build(rows)
+    return result, time.perf_counter() - started, size
+
+
+def main(n=50_000):
+    dicts, dict_s, dict_bytes = _measure(lambda rows: [dict(zip(FIELDS, row)) for row in rows], n)
+    registry, reg_s, reg_bytes = _measure(DeviceRegistry.from_rows, n)
+    print(f"{n} devices")
+    print(f"  list of dicts:  {dict_bytes / n:7.0f} B/device  build {dict_s * 1000:7.1f} ms")
+    print(f"  registry:       {reg_bytes / n:7.0f} B/device  build {reg_s * 1000:7.1f} ms")
+
+    mac = _mac(n // 2)
+    started = time.perf_counter()
+    for _ in range(100):
+        next(d for d in dicts if d["mac"] == mac)
+    scan_us = (time.perf_counter() - started) / 100 * 1e6
+    started = time.perf_counter()
+    for _ in range(10_000):
+        registry.get(mac)
+    get_us = (time.perf_counter() - started) / 10_000 * 1e6
+    print(f"  lookup by MAC:  scan {scan_us:9.1f} us   registry {get_us:5.2f} us")
+
+    started = time.perf_counter()
+    body = render_json(dicts)
+    dict_json = time.perf_counter() - started
+    started = time.perf_counter()
+    reg_body = registry.to_json()
+    reg_json = time.perf_counter() - started
+    assert json.loads(body) == json.loads(reg_body)
+    print(f"  JSON render:    dicts {dict_json * 1000:7.1f} ms   registry {reg_json * 1000:7.1f} ms")
+
+
+if __name__ == "__main__":
+    main(*(int(a) for a in sys.argv[1:2]))
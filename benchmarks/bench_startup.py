@@ -0,0 +1,63 @@
+"""
+Cold-start cost of the API: time to import the app, and which heavy
+libraries that pulls in.
+
+    python -m benchmarks.bench_startup [runs] [--budget-ms N]
+
+Imports ``backend.app.main`` in ``runs`` (default 5) fresh interpreters
+and reports the median wall time. Exits 1 if the median is over budget
+or if scapy, manuf, ping3, requests or psutil were imported: those are loaded
+when the scanner first needs them, never by the import.
+"""
+import argparse
+import statistics
+import subprocess
+import sys
+
+BUDGET_MS = 900
+HEAVY = ("scapy", "manuf", "ping3", "requests", "psutil")
+
+_PROBE = f"""
+import sys, time
+started = time.perf_counter()
+import backend.app.main
+elapsed = time.perf_counter() - started
+print(elapsed * 1000)
+print(",".join(m for m in {HEAVY!r} if m in sys.modules))
+"""
+
+
+def measure() -> tuple[float, list[str]]:
+    out = subprocess.run([sys.executable, "-c", _PROBE], capture_output=True, text=True, check=True).stdout
+    ms, loaded = out.splitlines()[-2:]
+    return float(ms), [m for m in loaded.split(",") if m]
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("runs", type=int, nargs="?", default=5)
+    parser.add_argument("--budget-ms", type=float, default=BUDGET_MS)
+    args = parser.parse_args(argv)
+
+    times, loaded = [], set()
+    for _ in range(args.runs):
+        ms, heavy = measure()
+        times.append(ms)
+        loaded.update(heavy)
+    median = statistics.median(times)
+    print(f"import backend.app.main: median {median:.0f} ms, min {min(times):.0f} ms, "
+          f"max {max(times):.0f} ms over {args.runs} runs (budget {args.budget_ms:.0f} ms)")
+    print(f"heavy modules imported: {', '.join(sorted(loaded)) or 'none'}")
+
+    failed = False
+    if median > args.budget_ms:
+        print(f"FAIL: over budget by {median - args.budget_ms:.0f} ms")
+        failed = True
+    if loaded:
+        print("FAIL: heavy modules must be imported lazily")
+        failed = True
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,84 @@
+"""
+Per-sweep DB write time: per-row upsert_device/add_alert/mark_offline
+versus the single-transaction apply_sweep path.
+
+    python -m benchmarks.bench_sweep_writes [sizes...]
+
+Each run seeds a throwaway DB with N known devices, then times one sweep
+where ~90% of them answer, ~5% are new and the rest went offline.
+"""
+import os
+import sys
+import tempfile
+import time
+
+from backend.app import database
+
+DEFAULT_SIZES = (100, 1_000, 10_000)
+# the per-row path fsyncs on every call, keep it off the biggest sizes
+LEGACY_MAX = 1_000
+
+
+def _mac(i):
+    return ":".join(f"{b:02x}" for b in (0x02, 0, (i >> 24) & 0xFF, (i >> 16) & 0xFF, (i >> 8) & 0xFF, i & 0xFF))
+
+
+def _ip(i):
+    return f"10.{(i >> 16) & 0xFF}.{(i >> 8) & 0xFF}.{i & 0xFF}"
+
+
+def _sweep(n):
+    """Build the writes/alerts for one sweep over n known devices."""
+    answered = [i for i in range(n) if i % 10]
+    new = range(n, n + max(1, n // 20))
+    writes = [(_mac(i), _ip(i), f"host-{i}", "Vendor") for i in (*answered, *new)]
+    alerts = [("new_device", _mac(i), _ip(i), f"New device detected: {_mac(i)}") for i in new]
+    alerts += [("device_offline", _mac(i), _ip(i), f"Device went offline: {_mac(i)}")
+               for i in range(0, n, 10)]
+    return writes, alerts
+
+
+def _seed(n):
+    database.init_db()
+    database.apply_sweep([(_mac(i), _ip(i), None, None) for i in range(n)])
+
+
+def _legacy(writes, alerts):
+    for mac, ip, hostname, vendor in writes:
+        database.upsert_device(mac, ip, hostname, vendor)
+    database.mark_offline({w[0] for w in writes})
+    for alert in alerts:
+        database.add_alert(*alert)
+
+
+def _batched(writes, alerts):
+    database.apply_sweep(writes, alerts)
+
+
+def _time(fn, n):
+    with tempfile.TemporaryDirectory() as tmp:
+        database.DB_PATH = os.path.join(tmp, "bench.db")
+        _seed(n)
+        writes, alerts = _sweep(n)
+        start = time.perf_counter()
+        fn(writes, alerts)
+        return time.perf_counter() - start
+
+
+def main(sizes):
+    original = database.DB_PATH
+    try:
+        print(f"{'devices':>8} {'per-row (s)':>12} {'batched (s)':>12} {'speedup':>8}")
+        for n in sizes:
+            batched = _time(_batched, n)
+            if n <= LEGACY_MAX:
+                legacy = _time(_legacy, n)
+                print(f"{n:>8} {legacy:>12.4f} {batched:>12.4f} {legacy / batched:>7.1f}x")
+            else:
+                print(f"{n:>8} {'skipped':>12} {batched:>12.4f} {'-':>8}")
+    finally:
+        database.DB_PATH = original
+
+
+if __name__ == "__main__":
+    main([int(a) for a in sys.argv[1:]] or DEFAULT_SIZES)
@@ -0,0 +1,157 @@
+"""
+A synthetic network for benchmarks and tests.
+
+FakeNetwork stands in for scapy's srp (broadcast chunks and unicast
+liveness probes), socket.getnameinfo (reverse DNS) and the remote vendor
+API, with a configurable number of hosts, per-step churn and lognormal
+reply/lookup latencies. patch() swaps it in for the real backends:
+
+    net = FakeNetwork(hosts=1_000, churn=0.02)
+    with net.patch():
+        asyncio.run(discover_and_update_async())
+    net.step()  # flip some hosts on/offline, add a few new ones
+"""
+import bisect
+import ipaddress
+import math
+import random
+import socket
+import threading
+import time
+from contextlib import ExitStack
+from types import SimpleNamespace
+from unittest.mock import patch
+
+from scapy.layers.l2 import ARP
+
+# OUIs present in the offline index, and a share with no registered vendor
+_KNOWN_OUIS = (0x00000C, 0x001B63, 0x3C5AB4, 0xB827EB, 0xF4F5D8)
+
+
+def _lognormal(rng, median_ms, sigma):
+    return rng.lognormvariate(math.log(median_ms / 1000), sigma) if median_ms > 0 else 0.0
+
+
+class FakeNetwork:
+    def __init__(self, hosts=254, churn=0.02, new_rate=0.002, loss=0.0,
+                 rtt_ms=2.0, rtt_sigma=0.6, dns_ms=5.0, dns_sigma=0.8, ptr_rate=0.7,
+                 vendor_ms=80.0, unknown_vendor=0.05, subnet=None, time_scale=1.0, seed=1):
+        self.churn = churn
+        self.new_rate = new_rate
+        self.loss = loss
+        self.rtt_ms = rtt_ms
+        self.rtt_sigma = rtt_sigma
+        self.dns_ms = dns_ms
+        self.dns_sigma = dns_sigma
+        self.ptr_rate = ptr_rate
+        self.vendor_ms = vendor_ms
+        self.unknown_vendor = unknown_vendor
+        self.time_scale = time_scale
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+        if subnet is None:
+            prefix = max(16, 32 - math.ceil(math.log2(hosts * 2 + 2)))
+            subnet = f"10.0.0.0/{prefix}"
+        self.network = ipaddress.IPv4Network(subnet)
+        self._free = list(range(int(self.network.network_address) + 1, int(self.network.broadcast_address)))
+        self._rng.shuffle(self._free)
+        self._hosts = {}  # ip int -> [mac, hostname | None, online]
+        self._sorted = []
+        self._next_mac = 0
+        self.calls = {"srp": 0, "packets": 0, "ptr": 0, "vendor": 0}
+        for _ in range(hosts):
+            self._add_host()
+
+    def _add_host(self):
+        if not self._free:
+            return
+        ip = self._free.pop()
+        self._next_mac += 1
+        if self._rng.random() < self.unknown_vendor:
+            oui = 0xFCFFAB  # not in the index, not locally administered
+        else:
+            oui = self._rng.choice(_KNOWN_OUIS)
+        mac_int = (oui << 24) | self._next_mac
+        mac = ":".join(f"{(mac_int >> s) & 0xFF:02x}" for s in range(40, -8, -8))
+        hostname = f"host-{self._next_mac}.lan" if self._rng.random() < self.ptr_rate else None
+        self._hosts[ip] = [mac, hostname, True]
+        bisect.insort(self._sorted, ip)
+
+    @property
+    def online(self) -> int:
+        return sum(1 for h in self._hosts.values() if h[2])
+
+    def step(self):
+        """Advance one sweep interval: churn existing hosts, add new ones."""
+        with self._lock:
+            for host in self._hosts.values():
+                if self._rng.random() < self.churn:
+                    host[2] = not host[2]
+            for _ in range(int(len(self._hosts) * self.new_rate + self._rng.random())):
+                self._add_host()
+
+    def _sleep(self, seconds):
+        if seconds > 0 and self.time_scale > 0:
+            time.sleep(seconds * self.time_scale)
+
+    def _reply(self, ip_int, sent_at):
+        host = self._hosts.get(ip_int)
+        if host is None or not host[2] or (self.loss and self._rng.random() < self.loss):
+            return None
+        rtt = _lognormal(self._rng, self.rtt_ms, self.rtt_sigma)
+        sent = SimpleNamespace(sent_time=sent_at)
+        received = SimpleNamespace(hwsrc=host[0], psrc=str(ipaddress.IPv4Address(ip_int)), time=sent_at + rtt)
+        return sent, received
+
+    def srp(self, pkts, iface=None, timeout=2, retry=0, inter=0, verbose=False, **kwargs):
+        """
+        Answer a broadcast (pdst is a CIDR) or a list of unicast ARP
+        requests. Returns as soon as the slowest reply would arrive
+        rather than waiting out ``timeout``.
+        """
+        sent_at = time.time()
+        answered = []
+        with self._lock:
+            if isinstance(pkts, list):
+                targets = [int(ipaddress.IPv4Address(str(p[ARP].pdst))) for p in pkts]
+                self.calls["packets"] += len(pkts) * (1 + retry)
+            else:
+                pdst = pkts[ARP].pdst  # a scapy Net for a CIDR target
+                net = ipaddress.IPv4Network(f"{pdst.net}/{pdst.mask}", strict=False)
+                lo = bisect.bisect_left(self._sorted, int(net.network_address))
+                hi = bisect.bisect_right(self._sorted, int(net.broadcast_address))
+                targets = self._sorted[lo:hi]
+                self.calls["packets"] += (net.num_addresses - 2) * (1 + retry)
+            self.calls["srp"] += 1
+            for ip in targets:
+                pair = self._reply(ip, sent_at)
+                if pair is not None and pair[1].time - sent_at <= timeout:
+                    answered.append(pair)
+        slowest = max((r.time - sent_at for _, r in answered), default=0.0)
+        self._sleep(slowest)
+        return answered, []
+
+    def getnameinfo(self, sockaddr, flags=0):
+        self.calls["ptr"] += 1
+        self._sleep(_lognormal(self._rng, self.dns_ms, self.dns_sigma))
+        host = self._hosts.get(int(ipaddress.IPv4Address(sockaddr[0])))
+        if host is None or host[1] is None:
+            raise socket.herror(1, "Unknown host")
+        return host[1], "0"
+
+    def vendor_get(self, url, timeout=None, **kwargs):
+        self.calls["vendor"] += 1
+        self._sleep(_lognormal(self._rng, self.vendor_ms, 0.5))
+        return SimpleNamespace(status_code=404, text="", raise_for_status=lambda: None)
+
+    def targets(self):
+        return [("fake0", str(self.network))]
+
+    def patch(self) -> ExitStack:
+        """Swap the fake in for srp, reverse DNS, vendor API and interface discovery."""
+        stack = ExitStack()
+        stack.enter_context(patch("backend.app.services.network_monitor.srp", self.srp))
+        stack.enter_context(patch("backend.app.services.network_monitor.enumerate_targets", self.targets))
+        stack.enter_context(patch("backend.app.services.resolver.socket.getnameinfo", self.getnameinfo))
+        stack.enter_context(patch("backend.app.services.vendor._http_get", self.vendor_get))
+        return stack
@@ -0,0 +1,19 @@
+import pytest
+
+from backend.app import database
+from backend.app.services import alert_rules
+
+
+@pytest.fixture(autouse=True)
+def temp_db(tmp_path, monkeypatch):
+    """Never let a test open the checked-in devices.db."""
+    monkeypatch.setattr(database, "DB_PATH", str(tmp_path / "devices.db"))
+    database.init_db()
+    yield
+    database.close_pool()
+
+
+@pytest.fixture(autouse=True)
+def fresh_alert_rules(monkeypatch):
+    """Alert rules keep per-device state; start every test without any."""
+    monkeypatch.setattr(alert_rules, "rules", alert_rules.AlertRules())
@@ -0,0 +1,51 @@
+from backend.app.services.alert_rules import AlertRules
+
+
+def _off(mac):
+    return ("device_offline", mac, "10.0.0.1", f"Device went offline: {mac}")
+
+
+def _back(mac):
+    return ("device_back_online", mac, "10.0.0.1", f"Device back online: {mac}")
+
+
+def test_offline_needs_consecutive_misses_and_blips_are_silent():
+    rules = AlertRules(offline_after=3, flap_threshold=100)
+
+    assert rules.evaluate([_off("a")], seen=set(), now=0) == []
+    assert rules.evaluate([_back("a")], seen={"a"}, now=10) == []  # back before the 3rd miss
+
+    assert rules.evaluate([_off("a")], seen=set(), now=20) == []
+    assert rules.evaluate([], seen=set(), checked={"b"}, now=30) == []  # "a" not probed: no miss
+    assert rules.evaluate([], seen=set(), now=40) == []
+    assert rules.evaluate([], seen=set(), now=50) == [_off("a")]
+    assert rules.evaluate([_back("a")], seen={"a"}, now=60) == [_back("a")]
+
+
+def test_flapping_device_alerts_once():
+    rules = AlertRules(offline_after=1, flap_window=300, flap_threshold=4)
+    alerts = []
+    for i in range(10):
+        change = _off("a") if i % 2 == 0 else _back("a")
+        alerts += rules.evaluate([change], seen=set() if i % 2 == 0 else {"a"}, now=i * 10)
+
+    assert [a[0] for a in alerts] == ["device_offline", "device_back_online", "device_offline", "device_flapping"]
+    assert rules.state()["flapping"] == ["a"]
+    # stable for a whole window: alerts resume
+    assert rules.evaluate([_off("a")], seen=set(), now=1000) == [_off("a")]
+
+
+def test_mass_outage_is_one_row_and_rate_limit_reports_drops():
+    rules = AlertRules(offline_after=2, coalesce_threshold=5, rate_per_minute=60, burst=2)
+    macs = [f"aa:aa:aa:aa:{i // 256:02x}:{i % 256:02x}" for i in range(1000)]
+
+    assert rules.evaluate([_off(m) for m in macs], seen=set(), now=0) == []
+    [summary] = rules.evaluate([], seen=set(), now=10)
+    assert summary[:3] == ("device_offline", None, None)
+    assert summary[3].startswith("1000 devices went offline: aa:aa:aa:aa:00:00,")
+    assert summary[3].endswith("and 995 more")
+
+    new = [("new_device", f"bb:{i}", "10.0.1.1", "new") for i in range(3)]
+    assert len(rules.evaluate(new, seen=set(), now=10)) == 1  # one token left
+    [report] = rules.evaluate([], seen=set(), now=11)
+    assert report == ("alerts_suppressed", None, None, "2 alerts dropped by the rate limit")
@@ -0,0 +1,61 @@
+from types import SimpleNamespace
+
+from backend.app.services.bandwidth import TOTAL, BandwidthSampler, RateRing
+
+
+def test_ring_keeps_the_newest_samples_in_order():
+    ring = RateRing(4)
+    for i in range(6):
+        ring.append(float(i), i * 10.0, i)
+
+    t, rx, tx = ring.window(10)
+    assert list(t) == [2.0, 3.0, 4.0, 5.0]
+    assert list(rx) == [20.0, 30.0, 40.0, 50.0]
+    summary = ring.summary(interval=1.0, averages=(2,))
+    assert summary["rx_bps"] == 50.0
+    assert summary["averages"]["2s"] == {"rx_bps": 45.0, "tx_bps": 4.5}
+    assert summary["peak_tx_bps"] == 5.0
+
+
+def test_sampler_rates_per_interface_and_total():
+    counters = {"eth0": [0, 0], "wlan0": [0, 0], "lo": [0, 0]}
+
+    def read():
+        return {nic: SimpleNamespace(bytes_recv=c[0], bytes_sent=c[1]) for nic, c in counters.items()}
+
+    sampler = BandwidthSampler(interval=1.0, history=10, counters=read)
+    sampler.sample(now=100.0)
+    for now in (101.0, 102.0):
+        for nic in counters:
+            counters[nic][0] += 1000
+            counters[nic][1] += 100
+        sampler.sample(now=now)
+    counters["eth0"] = [5, 5]  # interface re-created: counters restart
+    counters["wlan0"][0] += 4000
+    sampler.sample(now=104.0)
+
+    assert sampler.interfaces() == ["eth0", "lo", "total", "wlan0"]
+    assert sampler.summary("eth0")["rx_bps"] == 1000.0  # no sample for the reset
+    assert sampler.summary("wlan0")["rx_bps"] == 2000.0
+    assert sampler.summary(TOTAL)["peak_rx_bps"] == 2000.0  # loopback excluded
+    assert sampler.totals == (5 + 6000, 5 + 200)
+
+    body, etag = sampler.history_json(TOTAL, seconds=10, step=1)
+    assert sampler.history_json(TOTAL, seconds=10, step=1) == (body, etag)
+    assert b'"rx_bps":[2000.0,2000.0]' in body  # no total while eth0 reset: it would under-count
+    assert sampler.history_json("eth9") is None
+
+
+def test_sampler_logs_a_counter_outage_once(caplog):
+    calls = []
+
+    def read():
+        calls.append(None)
+        if len(calls) >= 3:
+            sampler._stop.set()
+        raise OSError("no counters")
+
+    sampler = BandwidthSampler(interval=0, counters=read)
+    sampler._run()
+    assert len(calls) == 3
+    assert [r.message for r in caplog.records] == ["Reading the interface counters failed"]
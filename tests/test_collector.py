@@ -0,0 +1,183 @@
+import gzip
+import threading
+import time
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from backend.app import database
+from backend.app.api import routes
+from backend.app.registry import Device, DeviceRegistry
+from backend.app.services import collector as collector_module
+from backend.app.services import snapshot
+from backend.app.services.agent import Agent, DeltaSpool
+from backend.app.services.collector import Collector, decode_batch
+
+MAC = "aa:aa:aa:aa:aa:01"
+
+
+def _snap(*devices, alerts=(), at=None):
+    snap = snapshot.DeviceSnapshot(0, DeviceRegistry(Device(*d) for d in devices), alerts)
+    if at is not None:
+        snap.published_at = at
+    return snap
+
+
+def _agent(tmp_path, site, collector, **kwargs):
+    post = kwargs.pop("post", None) or (lambda url, body, headers, timeout: collector.ingest(decode_batch(body)))
+    return Agent(site=site, url="http://collector", spool=DeltaSpool(str(tmp_path / site)), post=post, **kwargs)
+
+
+@pytest.fixture
+def restore_snapshot():
+    yield
+    snapshot.refresh()
+
+
+def test_sites_with_colliding_macs_replicate(tmp_path, restore_snapshot):
+    c = Collector()
+    a, b = _agent(tmp_path, "a", c), _agent(tmp_path, "b", c)
+    a.record(_snap((MAC, "10.0.0.5", 1), ("aa:aa:aa:aa:aa:02", "10.0.0.6", 1)))
+    b.record(_snap((MAC, "10.0.0.5", 1, None, None, "printer")))
+    assert a.push_once() and b.push_once()
+
+    devices = c.registry()
+    assert len(devices) == 3
+    assert devices.get(MAC, site="b")["name"] == "printer"
+    assert devices.by_ip("10.0.0.5", site="a").site == "a"
+
+    a.record(_snap((MAC, "10.0.0.5", 0), ("aa:aa:aa:aa:aa:03", "10.0.0.7", 1),
+                   alerts=[("new_device", "aa:aa:aa:aa:aa:03", "10.0.0.7", "New device")]))
+    assert a.spool.last_seq == 2
+    a.push_once()
+    devices = c.registry()
+    assert devices.get(MAC, site="a")["online"] == 0
+    assert devices.get(MAC, site="b")["online"] == 1
+    assert devices.get("aa:aa:aa:aa:aa:02", site="a") is None  # gone from the agent's registry
+    assert sorted(r[-1] for r in database.get_site_devices()) == ["a", "a", "b"]
+
+    c.publish()
+    assert snapshot.current().alerts == [("new_device", "aa:aa:aa:aa:aa:03", "10.0.0.7", "[a] New device")]
+    assert {s["site"]: s["seq"] for s in c.sites()} == {"a": 2, "b": 1}
+
+
+def test_spool_survives_outage_and_restart(tmp_path):
+    c = Collector()
+
+    def down(url, body, headers, timeout):
+        raise ConnectionError("collector unreachable")
+
+    first = _agent(tmp_path, "a", c, post=down)
+    first.record(_snap((MAC, "10.0.0.5", 1), at=1000))
+    first.record(_snap((MAC, "10.0.0.5", 1), at=1010))  # unchanged within the heartbeat: not spooled
+    first.record(_snap((MAC, "10.0.0.9", 1), at=1020))
+    assert not first.push_once()
+    assert len(first.spool) == 2
+
+    restarted = _agent(tmp_path, "a", c)
+    assert restarted.spool.agent == first.spool.agent
+    assert restarted.spool.last_seq == 2
+    _, body = restarted.spool.pending(10)
+    assert restarted.push_once()
+    assert len(restarted.spool) == 0 and restarted.spool.acked == 2
+    metrics = restarted.metrics()  # an empty spool is still a spool
+    assert metrics["agent"] == first.spool.agent and metrics["acked"] == 2 and metrics["spooled"] == 0
+    assert c.registry().get(MAC, site="a")["ip"] == "10.0.0.9"
+
+    assert c.ingest(decode_batch(body)) == {"acked": 2, "resync": False}  # a replayed push changes nothing
+    assert c.metrics()["replays"] == 2
+
+
+def test_alerts_published_during_a_slow_push_all_arrive(tmp_path, restore_snapshot):
+    c = Collector()
+    pushing = threading.Event()
+
+    def slow(url, body, headers, timeout):
+        pushing.set()
+        time.sleep(0.3)
+        return c.ingest(decode_batch(body))
+
+    agent = _agent(tmp_path, "a", c, post=slow, push_interval=0.05)
+    agent.start()
+    try:
+        assert pushing.wait(2)
+        for i in range(3):
+            mac = f"aa:aa:aa:aa:aa:1{i}"
+            agent._on_publish(None, _snap((mac, f"10.0.0.1{i}", 1), alerts=[("new_device", mac, None, "New")]))
+        deadline = time.monotonic() + 5
+        while c.registry().get("aa:aa:aa:aa:aa:12", site="a") is None and time.monotonic() < deadline:
+            time.sleep(0.05)
+    finally:
+        agent.stop()
+
+    assert [d.mac for d in c.registry()] == ["aa:aa:aa:aa:aa:12"]  # devices from the latest snapshot only
+    c.publish()
+    assert [a[1] for a in snapshot.current().alerts] == [f"aa:aa:aa:aa:aa:1{i}" for i in range(3)]
+
+
+def test_lost_deltas_trigger_a_full_resync(tmp_path):
+    c = Collector()
+    agent = _agent(tmp_path, "a", c)
+    agent.record(_snap((MAC, "10.0.0.5", 1)))
+    agent.push_once()
+
+    agent.record(_snap((MAC, "10.0.0.5", 1), ("aa:aa:aa:aa:aa:02", "10.0.0.6", 1)))
+    agent.spool.clear()  # seq 2 never reaches the collector
+    agent.record(_snap(("aa:aa:aa:aa:aa:02", "10.0.0.6", 1)))
+    assert agent.push_once()
+    assert agent.metrics()["resyncs"] == 1
+    assert c.registry().get("aa:aa:aa:aa:aa:02", site="a") is None
+
+    agent.push_once()  # the full copy replaces the site
+    assert [d.mac for d in c.registry()] == ["aa:aa:aa:aa:aa:02"]
+
+    reloaded = Collector()
+    reloaded.load()
+    assert [d.mac for d in reloaded.registry()] == ["aa:aa:aa:aa:aa:02"]
+    assert reloaded.sites()[0]["seq"] == agent.spool.acked
+
+
+def test_decode_batch_is_bounded():
+    body = gzip.compress(b'{"site": "a"}\n') + gzip.compress(b'{"site": "a"}\n')
+    assert len(decode_batch(body)) == 2
+    with pytest.raises(ValueError):
+        decode_batch(gzip.compress(b" " * 1000 + b"{}"), limit=100)
+    with pytest.raises(ValueError):
+        decode_batch(body[:-4])
+
+
+def test_ingest_endpoint(tmp_path, monkeypatch, restore_snapshot):
+    c = Collector(publish_interval=60)
+    monkeypatch.setattr(collector_module, "collector", c)
+    monkeypatch.setattr(routes, "COLLECTOR_TOKEN", "secret")
+    app = FastAPI()
+    app.include_router(routes.router, prefix="/api")
+    client = TestClient(app)
+
+    def post(url, body, headers, timeout):
+        resp = client.post(url.removeprefix("http://collector"), content=body, headers=headers)
+        resp.raise_for_status()
+        return resp.json()
+
+    agent = _agent(tmp_path, "a", c, token="secret", post=post)
+    agent.record(_snap((MAC, "10.0.0.5", 1)))
+    assert client.post("/api/collector/ingest", content=b"").status_code == 503
+
+    c.start()
+    try:
+        assert client.post("/api/collector/ingest", content=agent.spool.pending(1)[1]).status_code == 401
+        auth = {"Authorization": "Bearer secret"}
+        assert client.post("/api/collector/ingest", content=b"not gzip", headers=auth).status_code == 400
+        bad_length = client.post("/api/collector/ingest", content=b"x", headers={**auth, "Content-Length": "x"})
+        assert bad_length.status_code == 400 and bad_length.json()["detail"] == "Bad Content-Length"
+        limit = routes.COLLECTOR_MAX_BATCH_BYTES
+        monkeypatch.setattr(routes, "COLLECTOR_MAX_BATCH_BYTES", 100)
+        chunked = client.post("/api/collector/ingest", content=iter([b"x" * 60, b"x" * 60]), headers=auth)
+        assert chunked.status_code == 413
+        monkeypatch.setattr(routes, "COLLECTOR_MAX_BATCH_BYTES", limit)
+        assert agent.push_once() and agent.spool.acked == 1
+        assert client.get("/api/sites").json()[0]["devices"] == 1
+    finally:
+        c.stop()
+    assert [d["mac"] for d in client.get("/api/debug/devices").json()] == [MAC]
@@ -0,0 +1,138 @@
+import sqlite3
+import time
+
+import pytest
+
+from backend.app import database
+
+
+def _by_mac():
+    return {d["mac"]: d for d in database.get_all_devices()}
+
+
+def test_apply_sweep_upserts_and_marks_offline():
+    database.upsert_device("aa:aa:aa:aa:aa:01", "10.0.0.1", "old-host", "OldVendor")
+    database.upsert_device("aa:aa:aa:aa:aa:02", "10.0.0.2")
+
+    database.apply_sweep([
+        ("aa:aa:aa:aa:aa:01", "10.0.0.11", None, None),
+        ("aa:aa:aa:aa:aa:03", "10.0.0.3", "new-host", "NewVendor"),
+    ])
+
+    devices = _by_mac()
+    assert devices["aa:aa:aa:aa:aa:01"]["ip"] == "10.0.0.11"
+    assert devices["aa:aa:aa:aa:aa:01"]["hostname"] == "old-host"
+    assert devices["aa:aa:aa:aa:aa:01"]["vendor"] == "OldVendor"
+    assert devices["aa:aa:aa:aa:aa:01"]["online"] == 1
+    assert devices["aa:aa:aa:aa:aa:02"]["online"] == 0
+    assert devices["aa:aa:aa:aa:aa:03"]["online"] == 1
+    assert devices["aa:aa:aa:aa:aa:03"]["vendor"] == "NewVendor"
+
+
+def test_apply_sweep_writes_and_dedupes_alerts():
+    alert = ("new_device", "aa:aa:aa:aa:aa:01", "10.0.0.1", "New device detected")
+
+    database.apply_sweep([("aa:aa:aa:aa:aa:01", "10.0.0.1", None, None)], [alert])
+    database.apply_sweep([("aa:aa:aa:aa:aa:01", "10.0.0.1", None, None)], [alert])
+
+    alerts = database.get_alerts()
+    assert len(alerts) == 1
+    assert alerts[0]["type"] == "new_device"
+
+
+def test_pool_reuses_connections():
+    database.get_all_devices()
+    database.get_alerts()
+    database.upsert_device("aa:aa:aa:aa:aa:01", "10.0.0.1")
+
+    stats = database.get_pool_stats()
+    assert stats["readers_open"] == 1
+    assert stats["reader_checkouts"] == 2
+    assert stats["writer_checkouts"] >= 2  # init_db + upsert
+
+
+def test_pool_reader_failures_leave_the_slots_usable(monkeypatch):
+    pool = database.ConnectionPool(database.DB_PATH, max_readers=1, reader_timeout=0.05)
+    connect = database._connect
+
+    def fail(path, read_only=False):
+        raise sqlite3.OperationalError("unable to open database file")
+
+    monkeypatch.setattr(database, "_connect", fail)
+    with pytest.raises(sqlite3.OperationalError):
+        with pool.reader():
+            pass
+    monkeypatch.setattr(database, "_connect", connect)
+    with pool.reader():  # the failed open did not use up the only slot
+        with pytest.raises(database.PoolExhausted):
+            with pool.reader():
+                pass
+    assert pool.stats()["reader_timeouts"] == 1
+    pool.close()
+
+
+def _add_alerts(n, mac="aa:aa:aa:aa:aa:01"):
+    database.apply_sweep([], [("new_device" if i % 2 else "device_offline", mac, "10.0.0.1", f"alert {i}")
+                              for i in range(n)])
+
+
+def test_alerts_keyset_pagination_and_filters():
+    _add_alerts(10)
+    _add_alerts(2, mac="aa:aa:aa:aa:aa:02")
+
+    first = database.get_alerts(limit=5)
+    second = database.get_alerts(limit=5, before_id=first[-1]["id"])
+    ids = [a["id"] for a in first + second]
+    assert ids == sorted(ids, reverse=True) and len(set(ids)) == 10
+
+    assert len(database.get_alerts(mac="aa:aa:aa:aa:aa:02")) == 2
+    assert {a["type"] for a in database.get_alerts(type="new_device")} == {"new_device"}
+    newest = first[0]["id"]
+    _add_alerts(1, mac="aa:aa:aa:aa:aa:03")
+    assert [a["mac"] for a in database.get_alerts(since_id=newest)] == ["aa:aa:aa:aa:aa:03"]
+    assert database.get_alerts(end=0) == []
+
+
+def test_prune_alerts_by_age_and_count(monkeypatch):
+    _add_alerts(5)
+    assert database.prune_alerts() == 0
+    monkeypatch.setattr(database, "ALERT_MAX_ROWS", 3)
+    assert database.prune_alerts() == 2
+    assert [a["message"] for a in database.get_alerts()] == ["alert 4", "alert 3", "alert 2"]
+    assert database.prune_alerts(now=time.time() + 31 * 86400) == 3
+
+
+def test_old_devices_table_gains_tags_and_notes(tmp_path, monkeypatch):
+    import sqlite3
+
+    path = tmp_path / "old.db"
+    conn = sqlite3.connect(path)
+    conn.execute("CREATE TABLE devices (mac TEXT PRIMARY KEY, ip TEXT, online INTEGER, first_seen TIMESTAMP,"
+                 " last_seen TIMESTAMP, name TEXT, hostname TEXT, vendor TEXT)")
+    conn.execute("INSERT INTO devices (mac, ip, online) VALUES ('aa:aa:aa:aa:aa:01', '10.0.0.1', 1)")
+    conn.commit()
+    conn.close()
+    monkeypatch.setattr(database, "DB_PATH", str(path))
+
+    database.init_db()
+
+    assert database.device_exists("aa:aa:aa:aa:aa:01")
+    assert not database.device_exists("aa:aa:aa:aa:aa:02")
+    dev = database.get_all_devices()["aa:aa:aa:aa:aa:01"]
+    assert dev["tags"] == () and dev["notes"] is None
+
+
+def test_device_export_streams_in_index_order_without_a_sort():
+    database.apply_sweep([(f"aa:aa:aa:aa:{i // 256:02x}:{i % 256:02x}", "10.0.0.1", None, None) for i in range(1200)])
+    database.apply_site_batch("b", "agent", 1, [("aa:aa:aa:aa:00:01", "10.1.0.1", 1, None, None, None, None,
+                                                 None, None, None, "b")])
+    with database._reader() as conn:
+        for sql in database._EXPORT_DEVICES_SQL:
+            plan = " ".join(row[-1] for row in conn.execute(f"EXPLAIN QUERY PLAN {sql}"))
+            assert "TEMP B-TREE" not in plan, plan
+
+    batches = database.iter_devices(batch_size=500)
+    assert len(next(batches)) == 500  # rows arrive batch by batch, not after reading the table
+    rest = list(batches)
+    assert [len(b) for b in rest] == [500, 200, 1]
+    assert rest[-1][0][0] == "aa:aa:aa:aa:00:01" and rest[-1][0][-1] == "b"
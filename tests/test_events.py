@@ -0,0 +1,65 @@
+import asyncio
+import json
+
+from backend.app.services import events, snapshot
+
+MAC = "aa:aa:aa:aa:aa:0a"
+
+
+def _device(mac, online=1, ip="10.0.0.1", name=None):
+    return {"mac": mac, "ip": ip, "online": online, "name": name, "hostname": None, "vendor": None,
+            "last_seen": None, "first_seen": None}
+
+
+def _parse(frame):
+    lines = dict(line.split(": ", 1) for line in frame.decode().strip().split("\n"))
+    return lines["event"], json.loads(lines["data"])
+
+
+def test_diff_devices():
+    old = [_device("a"), _device("b"), _device("c", online=0)]
+    new = [_device("a", ip="10.0.0.9"), _device("b", online=0), _device("c"), _device("d")]
+
+    delta = events.diff_devices(old, new)
+
+    assert [d["mac"] for d in delta["added"]] == ["d"]
+    assert [d["mac"] for d in delta["changed"]] == ["a", "c"]
+    assert delta["offline"] == ["b"]
+
+
+def test_publish_records_only_changes():
+    snapshot.publish([_device(MAC)])
+    seq = events.log.seq
+
+    snapshot.publish([_device(MAC)])
+    assert events.log.since(seq) == []
+
+    snapshot.publish([_device(MAC, online=0)], [("device_offline", MAC, "10.0.0.1", "gone")])
+    _, payload = _parse(events.log.since(seq)[0][1])
+    assert payload["offline"] == [MAC]
+    assert payload["alerts"][0]["type"] == "device_offline"
+
+
+def test_stream_resumes_from_last_event_id():
+    snapshot.publish([_device("a")])
+    resume_from = events.log.seq
+    snapshot.publish([_device("a", name="renamed")])
+
+    async def first_frame(last_id):
+        gen = events.stream(last_id, lambda: asyncio.sleep(0, True))
+        try:
+            return await gen.__anext__()
+        finally:
+            await gen.aclose()
+
+    event, payload = _parse(asyncio.run(first_frame(f"{events.log.epoch}-{resume_from}")))
+    assert event == "delta"
+    assert payload["changed"][0]["name"] == "renamed"
+
+    event, payload = _parse(asyncio.run(first_frame("stale-epoch-1")))
+    assert event == "reset"
+    assert payload["devices"][0]["name"] == "renamed"
+
+    ahead = events.log.seq + 5  # a plain number this log never reached
+    event, payload = _parse(asyncio.run(first_frame(str(ahead))))
+    assert event == "reset"
@@ -0,0 +1,17 @@
+import asyncio
+
+from backend.app.services.network_monitor import check_liveness_async, discover_and_update_async
+from benchmarks.fakenet import FakeNetwork
+
+
+def test_sweep_and_liveness_against_fake_network():
+    net = FakeNetwork(hosts=60, churn=0.2, new_rate=0, time_scale=0)
+    with net.patch():
+        devices = asyncio.run(discover_and_update_async())
+        assert len(devices) == 60 and all(d["online"] for d in devices)
+        assert any(d["hostname"] for d in devices)
+
+        net.step()
+        devices = asyncio.run(check_liveness_async([d["mac"] for d in devices]))
+    assert sum(d["online"] for d in devices) == net.online < 60
+    assert net.calls["packets"] == 126 + 60 * 2  # one /25 broadcast, then unicast with a retry
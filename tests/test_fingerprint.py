@@ -0,0 +1,147 @@
+import asyncio
+import socket
+import struct
+
+from backend.app import database
+from backend.app.services.fingerprint import (
+    Fingerprinter,
+    guess_os,
+    parse_banner,
+    parse_mdns,
+    parse_netbios,
+    parse_ssdp,
+)
+
+SSH_BANNER = b"SSH-2.0-OpenSSH_9.6p1 Ubuntu-3ubuntu13\r\n"
+
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+async def _listen(banner=SSH_BANNER, delay=0.0, active=None):
+    """A stand-in service on 127.0.0.1 that sends ``banner``; tracks concurrent clients in ``active``."""
+    async def handle(reader, writer):
+        if active is not None:
+            active["now"] += 1
+            active["max"] = max(active["max"], active["now"])
+        await asyncio.sleep(delay)
+        writer.write(banner)
+        await writer.drain()
+        writer.close()
+        if active is not None:
+            active["now"] -= 1
+
+    server = await asyncio.start_server(handle, "127.0.0.1", 0)
+    return server, server.sockets[0].getsockname()[1]
+
+
+def test_open_and_closed_ports_with_banner():
+    closed = _free_port()
+
+    async def scenario():
+        server, port = await _listen()
+        async with server:
+            fp = Fingerprinter(ports=(port, closed), names=(), timeout=0.5, banner_timeout=0.5)
+            return port, await fp.probe(["127.0.0.1"])
+
+    port, results = asyncio.run(scenario())
+    ports = results["127.0.0.1"]["ports"]
+    assert ports == [{"port": port, "service": None, "banner": "SSH-2.0-OpenSSH_9.6p1 Ubuntu-3ubuntu13"}]
+    assert guess_os(ports, {}) == "Linux"
+
+
+def test_per_host_limit():
+    active = {"now": 0, "max": 0}
+
+    async def scenario():
+        servers = [await _listen(delay=0.05, active=active) for _ in range(8)]
+        fp = Fingerprinter(ports=[port for _, port in servers], names=(), concurrency=64, per_host=2,
+                           rate_pps=0, timeout=1, banner_timeout=1)
+        results = await fp.probe(["127.0.0.1"])
+        for server, _ in servers:
+            server.close()
+        return results
+
+    results = asyncio.run(scenario())
+    assert len(results["127.0.0.1"]["ports"]) == 8
+    assert active["max"] == 2
+
+
+def _mdns_reply(hostname: str) -> bytes:
+    question = b"".join(bytes([len(p)]) + p.encode() for p in "1.0.0.127.in-addr.arpa".split(".")) + b"\0"
+    rdata = b"".join(bytes([len(p)]) + p.encode() for p in hostname.split(".")) + b"\0"
+    return (struct.pack(">HHHHHH", 0, 0x8400, 1, 1, 0, 0) + question + struct.pack(">HH", 12, 1)
+            + b"\xc0\x0c" + struct.pack(">HHIH", 12, 0x8001, 120, len(rdata)) + rdata)
+
+
+def test_name_reply_parsers():
+    assert parse_mdns(_mdns_reply("printer.local")) == {"hostname": "printer.local"}
+
+    names = (b"DESKTOP-1      \x00" + struct.pack(">H", 0x0400)
+             + b"WORKGROUP      \x00" + struct.pack(">H", 0x8400))
+    rdata = b"\x02" + names + b"\xaa" * 6
+    nbstat = (struct.pack(">HHHHHH", 0x4E42, 0x8400, 0, 1, 0, 0) + b"\x20" + b"CK" + b"AA" * 15 + b"\0"
+              + struct.pack(">HHIH", 0x21, 1, 0, len(rdata)) + rdata)
+    assert parse_netbios(nbstat) == {"name": "DESKTOP-1", "workgroup": "WORKGROUP"}
+
+    ssdp = b"HTTP/1.1 200 OK\r\nSERVER: Linux/4.9 UPnP/1.0 MiniUPnPd/2.1\r\nLOCATION: http://10.0.0.1:5000/\r\n\r\n"
+    assert parse_ssdp(ssdp) == {"server": "Linux/4.9 UPnP/1.0 MiniUPnPd/2.1", "location": "http://10.0.0.1:5000/"}
+    assert parse_banner(b"HTTP/1.0 200 OK\r\nServer: lighttpd/1.4\r\n\r\n", http=True) == "lighttpd/1.4"
+
+
+def test_mdns_query_round_trip():
+    class Responder(asyncio.DatagramProtocol):
+        def connection_made(self, transport):
+            self.transport = transport
+
+        def datagram_received(self, data, addr):
+            self.transport.sendto(_mdns_reply("nas.local"), addr)
+
+    async def scenario():
+        loop = asyncio.get_running_loop()
+        transport, _ = await loop.create_datagram_endpoint(Responder, local_addr=("127.0.0.1", 0))
+        port = transport.get_extra_info("sockname")[1]
+        fp = Fingerprinter(ports=(), names=("mdns",), timeout=0.5, name_ports={"mdns": port})
+        try:
+            return await fp.probe(["127.0.0.1"])
+        finally:
+            transport.close()
+
+    assert asyncio.run(scenario())["127.0.0.1"]["names"] == {"mdns": {"hostname": "nas.local"}}
+
+
+def test_devices_are_reprobed_only_on_ip_change_or_expiry():
+    fp = Fingerprinter(ttl=100)
+    devices = [
+        {"mac": "aa:aa:aa:aa:aa:01", "ip": "10.0.0.1", "online": 1},
+        {"mac": "aa:aa:aa:aa:aa:02", "ip": "10.0.0.2", "online": 1},
+        {"mac": "aa:aa:aa:aa:aa:03", "ip": "10.0.0.3", "online": 1},
+        {"mac": "aa:aa:aa:aa:aa:04", "ip": "10.0.0.4", "online": 0},
+    ]
+    database.put_fingerprints([
+        ("aa:aa:aa:aa:aa:01", "10.0.0.1", 1000, [], {}, None),
+        ("aa:aa:aa:aa:aa:02", "10.0.0.9", 1000, [], {}, None),
+    ])
+    known = database.get_fingerprints()
+    assert fp.due(devices, known, now=1050) == [("aa:aa:aa:aa:aa:02", "10.0.0.2"), ("aa:aa:aa:aa:aa:03", "10.0.0.3")]
+    assert ("aa:aa:aa:aa:aa:01", "10.0.0.1") in fp.due(devices, known, now=1100)
+
+
+def test_run_stores_results():
+    async def scenario():
+        server, port = await _listen(banner=b"220 Microsoft FTP Service\r\n")
+        async with server:
+            fp = Fingerprinter(ports=(port,), names=(), timeout=0.5)
+            devices = [{"mac": "aa:aa:aa:aa:aa:01", "ip": "127.0.0.1", "online": 1},
+                       {"mac": "aa:aa:aa:aa:aa:02", "ip": "127.0.0.1", "online": 1}]  # two MACs, one IP
+            return await fp.run(devices), await fp.run(devices)
+
+    assert asyncio.run(scenario()) == (2, 0)
+    assert database.get_fingerprint("aa:aa:aa:aa:aa:02")["os_guess"] == "Windows"
+    stored = database.get_fingerprint("aa:aa:aa:aa:aa:01")
+    assert stored["ip"] == "127.0.0.1"
+    assert stored["ports"][0]["banner"] == "220 Microsoft FTP Service"
+    assert stored["os_guess"] == "Windows"
@@ -0,0 +1,54 @@
+import time
+
+from backend.app import database, history
+
+A = "aa:aa:aa:aa:aa:01"
+B = "aa:aa:aa:aa:aa:02"
+
+
+def test_sweeps_record_intervals_not_rows():
+    for _ in range(3):
+        database.apply_sweep([(A, "10.0.0.1", None, None), (B, "10.0.0.2", None, None)])
+    database.apply_sweep([(A, "10.0.0.1", None, None)])  # B goes offline
+    database.apply_sweep([(A, "10.0.0.1", None, None), (B, "10.0.0.2", None, None)])
+
+    with database._reader() as conn:
+        rows = conn.execute("SELECT mac, end IS NULL FROM presence_intervals ORDER BY id").fetchall()
+    assert rows == [(A, 1), (B, 0), (B, 1)]
+
+    now = time.time()
+    uptime = database.get_device_uptime(B, now - 60, now + 1)
+    assert len(uptime["intervals"]) == 2
+    assert 0 < uptime["uptime"] <= 1
+
+    counts = database.get_online_counts(now - 60, now + 60)
+    assert counts["resolution"] == "minute"
+    assert sum(p["samples"] for p in counts["points"]) == 5
+    assert min(p["min"] for p in counts["points"]) == 1
+    assert max(p["max"] for p in counts["points"]) == 2
+
+
+def test_uptime_clips_to_range():
+    with database._writer() as conn:
+        conn.executemany(
+            "INSERT INTO presence_intervals (mac, start, end) VALUES (?, ?, ?)",
+            [(A, 0, 100), (A, 200, 300), (A, 400, None)],
+        )
+        result = history.device_uptime(conn, A, 50, 450)
+    assert result["intervals"] == [(50, 100), (200, 300), (400, 450)]
+    assert result["online_seconds"] == 200
+    assert result["uptime"] == 0.5
+
+
+def test_prune_respects_retention():
+    database.apply_sweep([(A, "10.0.0.1", None, None)])
+    database.apply_sweep([])
+    later = time.time() + 8 * 86400
+    removed = database.prune_history(later)
+    with database._reader() as conn:
+        intervals = conn.execute("SELECT COUNT(*) FROM presence_intervals").fetchone()[0]
+        resolutions = {r for r, in conn.execute("SELECT DISTINCT resolution FROM online_counts")}
+    # minute buckets expire after 7 days; the interval and hour/day buckets are kept
+    assert removed >= 1
+    assert intervals == 1
+    assert resolutions == {3600, 86400}
@@ -0,0 +1,30 @@
+from unittest.mock import patch
+
+from backend.app.services import latency
+from backend.app.services.network_monitor import get_network_stats
+
+
+def test_summarize_window():
+    summary = latency.summarize([10.0, 20.0, None, 30.0])
+
+    assert summary["samples"] == 4
+    assert summary["min"] == 10.0
+    assert summary["avg"] == 20.0
+    assert summary["p95"] == 30.0
+    assert summary["jitter"] == 10.0
+    assert summary["loss"] == 25.0
+
+
+def test_stats_read_window_without_pinging():
+    prober = latency.LatencyProber(targets=["192.0.2.1"])
+    with patch("backend.app.services.latency.ping", side_effect=[42.0, None]):
+        prober.probe_once()
+        prober.probe_once()
+
+    with patch.object(latency, "prober", prober), \
+            patch("backend.app.services.latency.ping") as mock_ping:
+        stats = get_network_stats([{"online": 1}])
+
+    mock_ping.assert_not_called()
+    assert stats["average_latency"] == "42ms"
+    assert stats["latency"]["loss"] == 50.0
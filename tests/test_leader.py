@@ -0,0 +1,91 @@
+import asyncio
+import os
+from unittest.mock import patch
+
+from backend.app import database
+from backend.app.services import events, shared_snapshot, snapshot, topology
+from backend.app.services.leader import ScannerLeader
+
+
+def test_lease_is_exclusive_until_it_expires():
+    assert database.acquire_lease("scanner", "a", ttl=30, now=1000)
+    assert not database.acquire_lease("scanner", "b", ttl=30, now=1010)
+    assert database.acquire_lease("scanner", "a", ttl=30, now=1020)  # renewal
+    assert not database.acquire_lease("scanner", "b", ttl=30, now=1049)
+    assert database.acquire_lease("scanner", "b", ttl=30, now=1051)
+    assert database.get_lease("scanner") == ("b", 1081)
+
+    database.release_lease("scanner", "a")  # not the holder: no effect
+    assert database.get_lease("scanner")[0] == "b"
+    database.release_lease("scanner", "b")
+    assert database.get_lease("scanner") is None
+
+
+def test_watcher_follows_the_shared_file(tmp_path):
+    path = str(tmp_path / "snapshot.json")
+    database.apply_sweep([("aa:aa:aa:aa:aa:01", "10.0.0.1", "host-1", "Vendor")])
+    shared_snapshot.write(snapshot.refresh(), path)
+
+    database.apply_sweep([("aa:aa:aa:aa:aa:02", "10.0.0.2", None, None)])  # not published
+    watcher = shared_snapshot.SnapshotWatcher(path)
+    assert watcher.check()
+    assert [d["mac"] for d in snapshot.current().devices] == ["aa:aa:aa:aa:aa:01"]
+    assert snapshot.current().devices["aa:aa:aa:aa:aa:01"]["hostname"] == "host-1"
+    assert not watcher.check()  # unchanged
+
+    shared_snapshot.write(snapshot.publish(database.get_all_devices(),
+                                           [("new_device", "aa:aa:aa:aa:aa:02", "10.0.0.2", "new")]), path)
+    assert watcher.check()
+    assert len(snapshot.current().devices) == 2
+    assert snapshot.current().alerts == [("new_device", "aa:aa:aa:aa:aa:02", "10.0.0.2", "new")]
+
+
+def test_followers_name_snapshots_as_the_scanner_did(tmp_path):
+    path = str(tmp_path / "snapshot.json")
+    database.apply_sweep([("aa:aa:aa:aa:aa:01", "10.0.0.1", "host-1", "Vendor")])
+    epoch, version = database.next_snapshot_version()  # published by the scanner, in another process
+    shared_snapshot.write(snapshot.DeviceSnapshot(version, database.get_all_devices(), (), epoch), path)
+
+    assert shared_snapshot.SnapshotWatcher(path).check()
+    assert snapshot.current().etag == f'"{epoch}-{version}"'
+    assert topology.model.version_id == f"{epoch}-{version}"
+    assert (events.log.epoch, events.log.seq) == (epoch, version)
+    assert snapshot.refresh().version == version + 1
+
+
+class _Engine:
+    def __init__(self, sniffer=None):
+        self.running = False
+
+    def start(self):
+        self.running = True
+
+    async def stop(self):
+        self.running = False
+
+
+def test_only_one_process_scans_and_a_dead_one_is_replaced():
+    async def scenario():
+        a, b = ScannerLeader(ttl=0.3, sniff=False), ScannerLeader(ttl=0.3, sniff=False)
+        a.start()
+        await asyncio.sleep(0.05)
+        b.start()
+        await asyncio.sleep(0.2)
+        both_started = (a.leading, b.leading)
+
+        a._task.cancel()  # a hangs: it stops renewing but never releases
+        await asyncio.sleep(0.6)
+        after_crash = (a.leading, b.leading)
+
+        await a.stop()
+        await b.stop()
+        return both_started, after_crash
+
+    with patch("backend.app.services.leader.ScanEngine", _Engine), \
+            patch("backend.app.services.leader.get_local_ip", return_value="10.0.0.1"):
+        both_started, after_crash = asyncio.run(scenario())
+
+    assert both_started == (True, False)
+    assert after_crash[1]
+    assert os.path.exists(shared_snapshot.snapshot_path())
+    assert database.get_lease("scanner") is None
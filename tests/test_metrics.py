@@ -0,0 +1,58 @@
+import threading
+
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from backend.app.api.routes import router
+from backend.app.metrics import HttpMetricsMiddleware, Registry, registry
+
+
+def test_histogram_renders_cumulative_buckets():
+    reg = Registry()
+    hist = reg.histogram("demo_seconds", "Demo", ("phase",), buckets=(0.1, 1))
+    for value in (0.05, 0.5, 5):
+        hist.observe(value, "arp")
+    reg.counter("demo_total", "Demo count").inc(amount=3)
+
+    text = reg.render()
+    assert 'demo_seconds_bucket{phase="arp",le="0.1"} 1' in text
+    assert 'demo_seconds_bucket{phase="arp",le="1"} 2' in text
+    assert 'demo_seconds_bucket{phase="arp",le="+Inf"} 3' in text
+    assert 'demo_seconds_count{phase="arp"} 3' in text
+    assert "# TYPE demo_total counter\ndemo_total 3" in text
+
+
+def test_render_while_new_label_sets_are_added():
+    reg = Registry()
+    counter = reg.counter("demo_total", "Demo", ("ip",))
+    hist = reg.histogram("demo_seconds", "Demo", ("ip",))
+
+    def scan():
+        for i in range(20_000):
+            counter.inc(f"10.0.{i // 250}.{i % 250}")
+            hist.observe(0.01, str(i))
+
+    worker = threading.Thread(target=scan)
+    worker.start()
+    while worker.is_alive():
+        reg.render()  # raised "dictionary changed size during iteration"
+    worker.join()
+    assert reg.render().count("demo_seconds_count") == 20_000
+
+
+def test_requests_are_timed_by_route_template():
+    app = FastAPI()
+    app.add_middleware(HttpMetricsMiddleware)
+    app.include_router(router, prefix="/api")
+    client = TestClient(app)
+
+    client.get("/api/alerts")
+    client.get("/api/history/devices/aa:bb:cc:dd:ee:ff/uptime")
+    client.get("/nowhere")
+
+    text = registry.render()
+    assert 'route="/api/alerts",status="200"' in text
+    assert 'route="/api/history/devices/{mac}/uptime"' in text
+    assert 'route="unmatched",status="404"' in text
+    assert 'netview_db_checkout_seconds_count{mode="read"}' in text
+    assert "netview_dns_cache_lookups_total" in text
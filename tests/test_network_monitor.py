@@ -1,6 +1,16 @@
+import asyncio
+import time
 import pytest
 from backend.app.services.network_monitor import _discover_and_update
-from unittest.mock import patch, MagicMock
+from unittest.mock import patch, MagicMock, AsyncMock
+
+from backend.app.services.alert_rules import AlertRules
+
+
+@pytest.fixture(autouse=True)
+def mock_vendor_resolver():
+    with patch("backend.app.services.network_monitor.vendor_resolver") as mock:
+        yield mock
 
 
 @pytest.fixture
@@ -16,27 +26,15 @@ def mock_get_all_devices():
 
 
 @pytest.fixture
-def mock_mark_offline():
-    with patch("backend.app.services.network_monitor.mark_offline") as mock:
-        yield mock
-
-
-@pytest.fixture
-def mock_add_alert():
-    with patch("backend.app.services.network_monitor.add_alert") as mock:
+def mock_apply_sweep():
+    with patch("backend.app.services.network_monitor.apply_sweep") as mock:
         yield mock
 
 
 @pytest.fixture
-def mock_upsert_device():
-    with patch("backend.app.services.network_monitor.upsert_device") as mock:
-        yield mock
-
-
-@pytest.fixture
-def mock_get_default_gateway_subnet():
-    with patch("backend.app.services.network_monitor.get_default_gateway_subnet") as mock:
-        mock.return_value = "192.168.0.0/24"
+def mock_enumerate_targets():
+    with patch("backend.app.services.network_monitor.enumerate_targets") as mock:
+        mock.return_value = [("eth0", "192.168.0.0/24")]
         yield mock
 
 
@@ -44,56 +42,111 @@ def mock_get_default_gateway_subnet():
 def mock_srp():
     with patch("backend.app.services.network_monitor.srp") as mock:
         mock.return_value = [
-            MagicMock(hwsrc="00:11:22:33:44:66", psrc="192.168.0.5"),
-        ], None
+            (MagicMock(sent_time=0.0), MagicMock(hwsrc="00:11:22:33:44:66", psrc="192.168.0.5", time=0.002)),
+        ], []
         yield mock
 
 
 @pytest.fixture
 def mock_do_lookup():
-    with patch("backend.app.services.network_monitor._do_lookup") as mock:
+    with patch("backend.app.services.network_monitor._do_lookup", new_callable=AsyncMock) as mock:
         mock.return_value = ("00:11:22:33:44:66", "192.168.0.5", "mock_hostname", "mock_vendor")
         yield mock
 
 
-def test_discover_and_update_no_gateway(mock_get_all_devices, mock_get_default_gateway_subnet):
-    mock_get_default_gateway_subnet.return_value = None
+def test_discover_and_update_no_gateway(mock_get_all_devices, mock_enumerate_targets):
+    mock_enumerate_targets.return_value = []
 
     result = _discover_and_update()
 
     assert len(result) == len(mock_get_all_devices.return_value)
 
 
-def test_discover_and_update_online_device(mock_get_all_devices, mock_mark_offline, mock_add_alert, mock_upsert_device,
-                                           mock_get_default_gateway_subnet, mock_srp, mock_do_lookup):
+def test_discover_and_update_online_device(mock_get_all_devices, mock_apply_sweep,
+                                           mock_enumerate_targets, mock_srp, mock_do_lookup):
     result = _discover_and_update()
 
-    assert mock_upsert_device.called
-    assert mock_add_alert.called
-    assert mock_mark_offline.called
+    mock_apply_sweep.assert_called_once()
+    writes, alerts, _ = mock_apply_sweep.call_args.args
+    assert writes == [("00:11:22:33:44:66", "192.168.0.5", "mock_hostname", "mock_vendor")]
+    assert alerts
     assert len(result) == len(mock_get_all_devices.return_value)
 
 
-def test_discover_and_update_new_device(mock_get_all_devices, mock_add_alert, mock_upsert_device, mock_srp,
-                                        mock_do_lookup):
+def test_discover_and_update_new_device(mock_get_all_devices, mock_apply_sweep, mock_enumerate_targets,
+                                        mock_srp, mock_do_lookup):
     new_device_mac = "00:11:22:33:44:66"
     new_device_ip = "192.168.0.5"
     mock_do_lookup.return_value = (new_device_mac, new_device_ip, "new_hostname", "new_vendor")
 
     _discover_and_update()
 
-    mock_add_alert.assert_any_call("new_device", new_device_mac, new_device_ip,
-                                   "New device detected: 00:11:22:33:44:66 @ new_hostname")
-    mock_upsert_device.assert_called_with(new_device_mac, new_device_ip, "new_hostname", "new_vendor")
+    writes, alerts, _ = mock_apply_sweep.call_args.args
+    assert ("new_device", new_device_mac, new_device_ip,
+            "New device detected: 00:11:22:33:44:66 @ new_hostname") in alerts
+    assert writes == [(new_device_mac, new_device_ip, "new_hostname", "new_vendor")]
 
 
-def test_discover_and_update_offline_device(mock_get_all_devices, mock_mark_offline, mock_add_alert,
-                                            mock_get_default_gateway_subnet, mock_srp):
+def test_discover_and_update_offline_device(mock_get_all_devices, mock_apply_sweep,
+                                            mock_enumerate_targets, mock_srp):
     mock_get_all_devices.return_value[0]["online"] = True
-    mock_srp.return_value = []
-
-    _discover_and_update()
-
-    mock_mark_offline.assert_called()
-    mock_add_alert.assert_any_call("device_offline", "00:11:22:33:44:55", "192.168.0.2",
-                                   "Device went offline: 00:11:22:33:44:55 @ None")
+    mock_srp.return_value = [], []
+
+    with patch("backend.app.services.alert_rules.rules", AlertRules(offline_after=1)):
+        _discover_and_update()
+
+    writes, alerts, _ = mock_apply_sweep.call_args.args
+    assert writes == []
+    assert alerts == [("device_offline", "00:11:22:33:44:55", "192.168.0.2",
+                       "Device went offline: 00:11:22:33:44:55 @ 192.168.0.2")]
+
+
+def test_failed_chunk_cancels_the_rest_of_the_sweep(mock_get_all_devices, mock_enumerate_targets):
+    from backend.app.services.network_monitor import discover_and_update_async
+    cancelled = []
+
+    def arp_scan(chunk):
+        if str(chunk.network) == "192.168.0.0/25":
+            return chunk, [(MagicMock(sent_time=0.0), MagicMock(hwsrc="00:11:22:33:44:66", psrc="192.168.0.5",
+                                                                time=0.002))], 0.0
+        time.sleep(0.05)
+        raise OSError("interface went away")
+
+    async def lookup(mac, *args):
+        try:
+            await asyncio.sleep(10)
+        except asyncio.CancelledError:
+            cancelled.append(mac)
+            raise
+
+    with patch("backend.app.services.network_monitor._arp_scan", arp_scan), \
+            patch("backend.app.services.network_monitor._do_lookup", lookup):
+        async def sweep():
+            with pytest.raises(OSError):
+                await discover_and_update_async()
+            return list(cancelled)  # before asyncio.run() would cancel leftovers itself
+
+        assert asyncio.run(sweep()) == ["00:11:22:33:44:66"]
+
+
+def test_scan_engine_counts_failures_and_stops():
+    from backend.app.services.scan_engine import ScanEngine
+    from backend.app.services.scheduler import ScanScheduler
+
+    async def scenario():
+        engine = ScanEngine(ScanScheduler(full_interval=0.01))
+        with patch("backend.app.services.scan_engine.discover_and_update_async",
+                   side_effect=RuntimeError("boom")), \
+                patch("backend.app.services.scan_engine.check_liveness_async",
+                      side_effect=RuntimeError("boom")):
+            engine.start()
+            await asyncio.sleep(0.05)
+            await engine.stop()
+        return engine.metrics()
+
+    metrics = asyncio.run(scenario())
+
+    assert metrics["cycles"]["full"] >= 1
+    assert metrics["failures"] == sum(metrics["cycles"].values())
+    assert metrics["last_error"] == "RuntimeError: boom"
+    assert not metrics["running"]
@@ -0,0 +1,105 @@
+import asyncio
+import json
+import threading
+import time
+
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from backend.app import database
+from backend.app.api import routes
+from backend.app.services import profiling
+from backend.app.services.profiling import Tracer
+from backend.app.tracing import _TracedConnection, span
+from backend.app.services.scan_engine import ScanEngine
+from benchmarks.fakenet import FakeNetwork
+
+
+def test_untraced_code_gets_shared_no_ops():
+    assert span("anything", ip="10.0.0.1") is span("else")
+    with database._writer() as conn:
+        assert not isinstance(conn, _TracedConnection)
+
+
+def test_traced_sweep_records_lookups_and_statements(monkeypatch):
+    tracer = Tracer(history=2)
+    monkeypatch.setattr("backend.app.services.scan_engine.tracer", tracer)
+    net = FakeNetwork(hosts=20, new_rate=0, time_scale=0)
+    engine = ScanEngine(fingerprint=False)
+    with net.patch():
+        tracer.arm(1, ["full"])
+        timings = asyncio.run(engine.sweep_once())
+        asyncio.run(engine.sweep_once())  # not armed any more
+
+    assert [t["id"] for t in tracer.traces()] == [timings["trace"]]
+    trace = tracer.get(timings["trace"])
+    names = [s["name"] for s in trace.to_dict()["spans"]]
+    assert names.count("lookup") == 20
+    assert any(n.startswith("sql INSERT INTO devices") for n in names)
+    assert "publish" in names and "arp chunk" in names
+
+    folded = trace.folded().splitlines()
+    assert any(line.startswith("cycle full;apply sweep;db write;sql ") for line in folded)
+    events = json.loads(json.dumps(trace.chrome()))["traceEvents"]
+    assert len(events) == len(names) and all(e["ph"] == "X" for e in events)
+
+
+def test_failed_cycle_keeps_the_traceback(monkeypatch):
+    tracer = Tracer()
+    monkeypatch.setattr("backend.app.services.scan_engine.tracer", tracer)
+
+    async def broken(timings, sightings=None):
+        with span("load devices"):
+            raise OSError("interface went away")
+
+    monkeypatch.setattr("backend.app.services.scan_engine.discover_and_update_async", broken)
+    tracer.arm(1)
+    timings = asyncio.run(ScanEngine(fingerprint=False).sweep_once())
+    trace = tracer.get(timings["trace"])
+    assert trace.error == "OSError: interface went away"
+    assert "interface went away" in trace.traceback
+    assert trace.to_dict()["spans"][0]["error"] == "OSError"
+
+
+def test_stack_sampling_sees_busy_threads():
+    stop = threading.Event()
+
+    def spin_for_test():
+        while not stop.is_set():
+            sum(range(1000))
+
+    worker = threading.Thread(target=spin_for_test, name="spinner")
+    worker.start()
+    try:
+        profile = profiling.sample_stacks(0.2, interval=0.005)
+    finally:
+        stop.set()
+        worker.join()
+    assert profile["samples"] > 5
+    assert any(stack.startswith("spinner;") and "spin_for_test" in stack for stack in profile["stacks"])
+
+
+def test_allocation_profile_finds_growth():
+    held = []
+
+    def allocate():
+        time.sleep(0.05)
+        held.extend(bytearray(1024) for _ in range(2000))
+
+    threading.Thread(target=allocate).start()
+    report = profiling.trace_allocations(0.3, top=5)
+    assert report["size_diff"] > 2_000_000
+    assert report["top"][0]["where"].startswith("tests/test_profiling.py:")
+
+
+def test_profiling_routes_are_off_unless_enabled(monkeypatch):
+    app = FastAPI()
+    app.include_router(routes.router, prefix="/api")
+    client = TestClient(app)
+    assert client.get("/api/debug/profile/traces").status_code == 403
+
+    monkeypatch.setattr(routes, "PROFILING_ENABLED", True)
+    monkeypatch.setattr(routes, "PROFILING_TOKEN", "secret")
+    assert client.get("/api/debug/profile/traces").status_code == 401
+    resp = client.get("/api/debug/profile/traces", headers={"Authorization": "Bearer secret"})
+    assert resp.status_code == 200 and resp.json()["armed"] == 0
@@ -0,0 +1,42 @@
+import json
+
+from backend.app.registry import Device, DeviceRegistry
+from backend.app.services.snapshot import render_json
+
+
+def _row(i, ip=None, online=1, vendor="Cisco Systems, Inc", hostname=None):
+    return (f"aa:aa:aa:aa:aa:{i:02x}", ip or f"10.0.0.{i}", online, "2024-01-01 00:00:00",
+            "2024-01-02 00:00:00", None, hostname, vendor)
+
+
+def test_device_reads_like_a_row():
+    dev = Device(*_row(1, hostname='quote"d'))
+
+    assert dev["mac"] == "aa:aa:aa:aa:aa:01"
+    assert dev["ip"] == "10.0.0.1"
+    assert dev.get("vendor") == "Cisco Systems, Inc"
+    assert dev.get("missing", "x") == "x"
+    assert dict(dev) == dev.to_dict()
+    assert json.loads(dev.to_json()) == json.loads(render_json(dev.to_dict()))
+
+
+def test_registry_indexes():
+    devices = DeviceRegistry.from_rows([_row(1), _row(2, vendor=None), _row(3, ip="10.0.0.1", online=0)])
+
+    assert len(devices) == 3
+    assert "AA-AA-AA-AA-AA-02" in devices
+    assert devices.get("not a mac") is None
+    assert devices.by_ip("10.0.0.1")["mac"] == "aa:aa:aa:aa:aa:01"  # the online holder wins
+    assert devices.online_macs() == {"aa:aa:aa:aa:aa:01", "aa:aa:aa:aa:aa:02"}
+
+    devices.add(Device(*_row(1, ip="10.0.0.9", vendor="Apple, Inc.")))
+    assert devices.by_ip("10.0.0.1")["mac"] == "aa:aa:aa:aa:aa:03"  # the remaining holder takes over
+    assert devices.by_ip("10.0.0.9")["mac"] == "aa:aa:aa:aa:aa:01"
+
+
+def test_registry_json_matches_dict_rows():
+    rows = [_row(1), _row(2, vendor=None, hostname="nas.lan")]
+    dicts = [Device(*row).to_dict() for row in rows]
+
+    assert json.loads(DeviceRegistry.from_rows(rows).to_json()) == json.loads(render_json(dicts))
+    assert DeviceRegistry.of(dicts)["aa:aa:aa:aa:aa:02"]["hostname"] == "nas.lan"
@@ -0,0 +1,76 @@
+import asyncio
+import socket
+import time
+from unittest.mock import patch
+
+from backend.app.services.resolver import ReverseResolver
+
+
+def test_names_and_misses_are_cached():
+    resolver = ReverseResolver()
+
+    def fake_getnameinfo(addr, flags):
+        if addr[0] == "10.0.0.1":
+            return "printer.lan", "0"
+        raise socket.herror("no PTR")
+
+    async def scenario():
+        first = await resolver.resolve_many(["10.0.0.1", "10.0.0.2"])
+        second = await resolver.resolve_many(["10.0.0.1", "10.0.0.2"])
+        return first, second
+
+    with patch("backend.app.services.resolver.socket.getnameinfo", side_effect=fake_getnameinfo) as mock:
+        first, second = asyncio.run(scenario())
+
+    assert first == second == {"10.0.0.1": "printer.lan", "10.0.0.2": None}
+    assert mock.call_count == 2
+    stats = resolver.stats()
+    assert (stats["misses"], stats["hits"], stats["negative_hits"], stats["errors"]) == (2, 1, 1, 1)
+
+
+def test_gaierror_and_timeouts_do_not_escape():
+    resolver = ReverseResolver(timeout=0.05)
+
+    def fake_getnameinfo(addr, flags):
+        if addr[0] == "10.0.0.1":
+            raise socket.gaierror("resolver down")
+        time.sleep(0.2)
+        return "slow.lan", "0"
+
+    with patch("backend.app.services.resolver.socket.getnameinfo", side_effect=fake_getnameinfo):
+        names = asyncio.run(resolver.resolve_many(["10.0.0.1", "10.0.0.2"]))
+
+    assert names == {"10.0.0.1": None, "10.0.0.2": None}
+    assert resolver.stats()["timeouts"] == 1
+    assert resolver.stats()["errors"] == 1
+
+
+def test_cache_is_bounded():
+    resolver = ReverseResolver(maxsize=2)
+
+    with patch("backend.app.services.resolver.socket.getnameinfo", return_value=("h", "0")):
+        asyncio.run(resolver.resolve_many(["10.0.0.1", "10.0.0.2", "10.0.0.3"]))
+
+    assert resolver.stats()["cached"] == 2
+
+
+def test_stuck_lookups_do_not_poison_later_ones():
+    resolver = ReverseResolver(timeout=0.05, concurrency=2)
+
+    def fake_getnameinfo(addr, flags):
+        if addr[0].startswith("10.0.1."):
+            time.sleep(0.4)  # outlives the timeout and keeps its thread
+        return "fast.lan", "0"
+
+    async def scenario():
+        stuck = await resolver.resolve_many(["10.0.1.1", "10.0.1.2"])
+        during = await resolver.resolve("10.0.0.9")  # no free thread
+        await asyncio.sleep(0.5)
+        return stuck, during, await resolver.resolve("10.0.0.9")
+
+    with patch("backend.app.services.resolver.socket.getnameinfo", side_effect=fake_getnameinfo):
+        stuck, during, after = asyncio.run(scenario())
+
+    assert stuck == {"10.0.1.1": None, "10.0.1.2": None}
+    assert during is None and after == "fast.lan"
+    assert (resolver.stats()["timeouts"], resolver.stats()["busy"]) == (2, 1)
@@ -0,0 +1,122 @@
+import csv
+import io
+import json
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from backend.app import database
+from backend.app.api.routes import router
+from backend.app.services import snapshot
+
+
+@pytest.fixture
+def client():
+    database.apply_sweep([("aa:aa:aa:aa:aa:01", "10.0.0.1", "host-1", "Vendor")])
+    snapshot.refresh()
+
+    app = FastAPI()
+    app.include_router(router, prefix="/api")
+    return TestClient(app)
+
+
+def test_topology_etag_roundtrip(client):
+    first = client.get("/api/topology")
+    assert first.status_code == 200
+    assert first.json()["nodes"][0]["mac"] == "aa:aa:aa:aa:aa:01"
+
+    again = client.get("/api/topology", headers={"If-None-Match": first.headers["etag"]})
+    assert again.status_code == 304
+    assert again.content == b""
+
+
+def test_publish_invalidates_etag(client):
+    etag = client.get("/api/debug/devices").headers["etag"]
+
+    database.apply_sweep([("aa:aa:aa:aa:aa:02", "10.0.0.2", None, None)])
+    snapshot.refresh()
+
+    resp = client.get("/api/debug/devices", headers={"If-None-Match": etag})
+    assert resp.status_code == 200
+    assert {d["mac"] for d in resp.json()} == {"aa:aa:aa:aa:aa:01", "aa:aa:aa:aa:aa:02"}
+
+
+def test_alerts_pages_with_cursor(client):
+    database.apply_sweep([], [("new_device", "aa:aa:aa:aa:aa:01", "10.0.0.1", f"alert {i}") for i in range(5)])
+
+    first = client.get("/api/alerts", params={"limit": 3})
+    assert len(first.json()) == 3
+    cursor = first.headers["x-next-cursor"]
+
+    rest = client.get("/api/alerts", params={"limit": 3, "before_id": cursor})
+    assert [a["message"] for a in rest.json()] == ["alert 1", "alert 0"]
+    assert "x-next-cursor" not in rest.headers
+
+
+def test_topology_diff_falls_back_to_full_graph(client):
+    version = client.get("/api/topology").json()["version"]
+    database.apply_sweep([("aa:aa:aa:aa:aa:02", "10.0.0.2", None, None)], offline=())
+    snapshot.refresh()
+
+    diff = client.get("/api/topology/diff", params={"since": version}).json()
+    assert [n["mac"] for n in diff["nodes"]["added"]] == ["aa:aa:aa:aa:aa:02"]
+    reset = client.get("/api/topology/diff", params={"since": "stale-1"}).json()
+    assert reset["reset"] and len(reset["nodes"]) == 2
+
+
+def test_rename_updates_the_snapshot(client):
+    assert client.put("/api/devices/aa:aa:aa:aa:aa:09/rename", json={"name": "x"}).status_code == 404
+    resp = client.put("/api/devices/AA:AA:AA:AA:AA:01/rename", json={"name": "nas"})
+    assert resp.json() == {"mac": "aa:aa:aa:aa:aa:01", "name": "nas"}
+    assert snapshot.current().devices["aa:aa:aa:aa:aa:01"]["name"] == "nas"
+
+
+def test_bulk_update_is_all_or_nothing(client):
+    database.apply_sweep([("aa:aa:aa:aa:aa:02", "10.0.0.2", None, None)], offline=())
+    updates = [
+        {"mac": "AA:AA:AA:AA:AA:01", "name": "nas", "tags": ["storage", "lab"]},
+        {"mac": "aa:aa:aa:aa:aa:02", "notes": "desk", "add_tags": ["lab"]},
+        {"mac": "aa:aa:aa:aa:aa:01", "remove_tags": ["lab"]},
+    ]
+
+    resp = client.post("/api/devices/bulk", json={"updates": updates + [{"mac": "aa:aa:aa:aa:aa:09", "name": "x"}]})
+    assert resp.status_code == 404
+    assert resp.json()["detail"]["missing"] == ["aa:aa:aa:aa:aa:09"]
+    assert snapshot.refresh().devices["aa:aa:aa:aa:aa:01"]["name"] is None
+
+    assert client.post("/api/devices/bulk", json={"updates": updates}).json() == {"updated": 2}
+    devices = {d["mac"]: d for d in client.get("/api/debug/devices").json()}
+    assert devices["aa:aa:aa:aa:aa:01"]["name"] == "nas"
+    assert devices["aa:aa:aa:aa:aa:01"]["tags"] == ["storage"]
+    assert devices["aa:aa:aa:aa:aa:02"]["tags"] == ["lab"]
+    assert devices["aa:aa:aa:aa:aa:02"]["notes"] == "desk"
+
+
+def test_exports_stream_ndjson_and_csv(client):
+    database.update_devices([{"mac": "aa:aa:aa:aa:aa:01", "tags": ["a", "b"]}])
+    database.apply_sweep([], [("new_device", "aa:aa:aa:aa:aa:01", "10.0.0.1", f"alert {i}") for i in range(3)])
+
+    lines = client.get("/api/export/devices").text.splitlines()
+    assert [json.loads(line)["tags"] for line in lines] == [["a", "b"]]
+
+    resp = client.get("/api/export/devices", params={"format": "csv"})
+    assert resp.headers["content-disposition"] == 'attachment; filename="devices.csv"'
+    rows = list(csv.DictReader(io.StringIO(resp.text)))
+    assert rows[0]["mac"] == "aa:aa:aa:aa:aa:01" and rows[0]["tags"] == "a;b"
+
+    alerts = [json.loads(line) for line in client.get("/api/export/alerts").text.splitlines()]
+    assert [a["message"] for a in alerts] == ["alert 2", "alert 1", "alert 0"]
+    empty = client.get("/api/export/alerts", params={"format": "csv", "type": "nope"}).text
+    assert empty.strip() == "id,type,mac,ip,timestamp,message"
+
+
+def test_exhausted_reader_pool_answers_503(monkeypatch):
+    from backend.app.main import app
+
+    def busy(*args):
+        raise database.PoolExhausted("all DB readers busy")
+
+    monkeypatch.setattr("backend.app.api.routes.get_alerts", busy)
+    resp = TestClient(app).get("/api/alerts")
+    assert resp.status_code == 503 and resp.headers["retry-after"] == "1"
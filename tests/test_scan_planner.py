@@ -0,0 +1,63 @@
+import socket
+from types import SimpleNamespace
+from unittest.mock import patch, MagicMock
+
+from backend.app.services import scan_planner
+from backend.app.services.scan_planner import ScanPlanner
+
+
+def _reply(ip, rtt):
+    return MagicMock(sent_time=0.0), MagicMock(psrc=ip, time=rtt)
+
+
+def test_plan_splits_large_ranges_and_shares_rate():
+    planner = ScanPlanner(chunk_prefix=24, parallel=4, rate_pps=1000)
+
+    chunks = planner.plan([("eth0", "10.0.0.0/22"), ("eth1", "192.168.1.0/26")])
+
+    assert [c.network for c in chunks] == [
+        "10.0.0.0/24", "10.0.1.0/24", "10.0.2.0/24", "10.0.3.0/24", "192.168.1.0/26",
+    ]
+    assert chunks[-1].iface == "eth1"
+    assert chunks[0].inter == 4 / 1000
+
+
+def test_timeout_and_retries_adapt():
+    planner = ScanPlanner(chunk_prefix=24)
+    chunk = planner.plan([("eth0", "10.0.0.0/24")])[0]
+    assert chunk.timeout == scan_planner.SCAN_TIMEOUT_MAX
+
+    report = planner.record(chunk, [_reply("10.0.0.1", 0.01)], {"10.0.0.1", "10.0.0.2"}, 0.5)
+    assert report["missed_known"] == 1
+
+    chunk = planner.plan([("eth0", "10.0.0.0/24")])[0]
+    assert chunk.timeout == scan_planner.SCAN_TIMEOUT_MIN
+    assert chunk.retries == 1
+
+    planner.record(chunk, [_reply("10.0.0.1", 0.01), _reply("10.0.0.2", 0.01)], {"10.0.0.1", "10.0.0.2"}, 0.5)
+    assert planner.plan([("eth0", "10.0.0.0/24")])[0].retries == 0
+
+
+def test_group_by_chunk():
+    planner = ScanPlanner(chunk_prefix=25)
+    chunks = planner.plan([("eth0", "10.0.0.0/24"), ("eth1", "10.1.0.0/26")])
+
+    groups = planner.group_by_chunk(chunks, ["10.0.0.5", "10.0.0.200", "10.1.0.9", "172.16.0.1"])
+
+    assert groups == {"10.0.0.0/25": {"10.0.0.5"}, "10.0.0.128/25": {"10.0.0.200"}, "10.1.0.0/26": {"10.1.0.9"}}
+
+
+def test_enumerate_targets_uses_every_up_interface():
+    addrs = {
+        "lo": [SimpleNamespace(family=socket.AF_INET, address="127.0.0.1", netmask="255.0.0.0")],
+        "eth0": [SimpleNamespace(family=socket.AF_INET, address="192.168.0.10", netmask="255.255.255.0")],
+        "eth1": [SimpleNamespace(family=socket.AF_INET, address="10.20.30.40", netmask="255.0.0.0")],
+        "eth2": [SimpleNamespace(family=socket.AF_INET, address="172.16.0.1", netmask="255.255.255.0")],
+    }
+    stats = {name: SimpleNamespace(isup=name != "eth2") for name in addrs}
+
+    with patch("psutil.net_if_addrs", return_value=addrs), \
+            patch("psutil.net_if_stats", return_value=stats):
+        targets = scan_planner.enumerate_targets()
+
+    assert targets == [("eth0", "192.168.0.0/24"), ("eth1", "10.20.0.0/16")]
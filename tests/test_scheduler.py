@@ -0,0 +1,64 @@
+import asyncio
+from unittest.mock import patch, MagicMock
+
+from backend.app.services.alert_rules import AlertRules
+from backend.app.services.network_monitor import check_liveness_async
+from backend.app.services.scheduler import FULL, LIVENESS, PRIORITY, ScanScheduler
+
+
+def _dev(mac, online):
+    return {"mac": mac, "ip": "192.168.0.2", "online": online, "name": None, "hostname": None, "vendor": None,
+            "last_seen": None}
+
+
+def test_cadence_full_then_liveness_then_priority():
+    sched = ScanScheduler(full_interval=300, liveness_interval=10, priority_interval=3, recent=60)
+
+    assert sched.next_cycle(now=0) == (FULL, [])
+    sched.mark_ran(FULL, now=0)
+    sched.observe([_dev("a", 1), _dev("b", 0)], now=0)
+
+    assert sched.next_cycle(now=5) == (None, [])
+    assert sched.next_cycle(now=10) == (LIVENESS, ["a"])
+    sched.mark_ran(LIVENESS, now=10)
+
+    # "a" drops: it becomes a priority recheck until it has been stable for a while
+    sched.observe([_dev("a", 0), _dev("b", 0)], now=10)
+    assert sched.next_cycle(now=13) == (PRIORITY, ["a"])
+    sched.mark_ran(PRIORITY, now=13)
+    assert sched.next_cycle(now=300) == (FULL, [])
+
+
+def test_flapping_devices_are_detected():
+    sched = ScanScheduler(flap_window=100, flap_threshold=3)
+    for t, online in enumerate([1, 0, 1, 0]):
+        sched.observe([_dev("a", online), _dev("b", 1)], now=t)
+
+    assert sched.flapping(now=5) == {"a"}
+    assert sched.flapping(now=500) == set()
+
+
+def test_liveness_check_only_touches_probed_devices():
+    devices = [
+        {**_dev("00:11:22:33:44:55", 1), "ip": "192.168.0.2"},
+        {**_dev("00:11:22:33:44:66", 1), "ip": "192.168.0.3"},
+    ]
+    reply = (MagicMock(), MagicMock(hwsrc="00:11:22:33:44:55", psrc="192.168.0.2"))
+
+    with patch("backend.app.services.network_monitor.get_all_devices", return_value=devices), \
+            patch("backend.app.services.network_monitor.enumerate_targets",
+                  return_value=[("eth0", "192.168.0.0/24")]), \
+            patch("backend.app.services.network_monitor.srp", return_value=([reply], [])) as mock_srp, \
+            patch("backend.app.services.network_monitor.vendor_resolver"), \
+            patch("backend.app.services.network_monitor.apply_sweep") as mock_apply, \
+            patch("backend.app.services.alert_rules.rules", AlertRules(offline_after=1)):
+        timings = {}
+        asyncio.run(check_liveness_async(["00:11:22:33:44:55", "00:11:22:33:44:66"], timings))
+
+    packets = mock_srp.call_args.args[0]
+    assert [p.dst for p in packets] == ["00:11:22:33:44:55", "00:11:22:33:44:66"]
+    writes, alerts, offline = mock_apply.call_args.args
+    assert [w[0] for w in writes] == ["00:11:22:33:44:55"]
+    assert offline == {"00:11:22:33:44:66"}
+    assert [a[0] for a in alerts] == ["device_offline"]
+    assert timings["packets"] == 4
@@ -0,0 +1,101 @@
+import asyncio
+
+from scapy.layers.dhcp import BOOTP, DHCP
+from scapy.layers.inet import IP, UDP
+from scapy.layers.l2 import ARP, Ether
+from scapy.utils import wrpcap
+
+from backend.app.database import get_all_devices, get_alerts
+from backend.app.services.network_monitor import apply_sightings_async
+from backend.app.services.scan_engine import ScanEngine
+from backend.app.services.sniffer import PassiveSniffer, parse_packet
+from benchmarks.fakenet import FakeNetwork
+
+
+def _dhcp_ack(mac, ip, hostname=None):
+    options = [("message-type", "ack")]
+    if hostname:
+        options.append(("hostname", hostname.encode()))
+    chaddr = bytes.fromhex(mac.replace(":", ""))
+    # round-trip through bytes so options decode as they would off the wire
+    return Ether(bytes(Ether(src="00:11:22:33:44:55", dst=mac) / IP(src="192.168.0.1", dst=ip)
+            / UDP(sport=67, dport=68) / BOOTP(op=2, yiaddr=ip, chaddr=chaddr)
+            / DHCP(options=options + ["end"])))
+
+
+def test_parse_arp_and_dhcp():
+    reply = Ether() / ARP(op=2, hwsrc="AA:BB:CC:00:00:01", psrc="192.168.0.10")
+    assert parse_packet(reply) == ("aa:bb:cc:00:00:01", "192.168.0.10", None)
+    garp = Ether() / ARP(op=1, hwsrc="aa:bb:cc:00:00:02", psrc="192.168.0.11", pdst="192.168.0.11")
+    assert parse_packet(garp) == ("aa:bb:cc:00:00:02", "192.168.0.11", None)
+    probe = Ether() / ARP(op=1, hwsrc="aa:bb:cc:00:00:03", psrc="0.0.0.0", pdst="192.168.0.12")
+    assert parse_packet(probe) is None
+    ack = _dhcp_ack("aa:bb:cc:00:00:04", "192.168.0.13", "laptop")
+    assert parse_packet(ack) == ("aa:bb:cc:00:00:04", "192.168.0.13", "laptop")
+
+
+def test_pcap_replay_updates_devices(tmp_path):
+    pcap = str(tmp_path / "capture.pcap")
+    wrpcap(pcap, [
+        Ether() / ARP(op=2, hwsrc="aa:bb:cc:00:00:01", psrc="192.168.0.10"),
+        Ether() / ARP(op=1, hwsrc="aa:bb:cc:00:00:01", psrc="192.168.0.20", pdst="192.168.0.1"),
+        _dhcp_ack("aa:bb:cc:00:00:02", "192.168.0.30", "printer"),
+    ])
+    sniffer = PassiveSniffer(pcap=pcap, flush_interval=0.05)
+    sniffer.start()
+    sniffer.join(5)
+    sniffer.stop()
+    assert get_all_devices().get("aa:bb:cc:00:00:01") is None  # the sniffer itself writes nothing
+    asyncio.run(apply_sightings_async(sniffer.take()))
+
+    devices = {d["mac"]: d for d in get_all_devices()}
+    assert devices["aa:bb:cc:00:00:01"]["ip"] == "192.168.0.20"
+    assert devices["aa:bb:cc:00:00:02"]["hostname"] == "printer"
+    assert all(d["online"] for d in devices.values())
+    assert sum(1 for a in get_alerts() if a["type"] == "new_device") == 2
+    metrics = sniffer.metrics()
+    assert metrics["packets"] == 3 and metrics["dropped"] == 0 and metrics["queue_depth"] == 0
+    assert metrics["taken"] == 2 and metrics["pending"] == 0
+
+
+class _Sightings:
+    def __init__(self):
+        self.pending = {}
+
+    def take(self):
+        taken, self.pending = self.pending, {}
+        return taken
+
+
+def test_sightings_during_a_sweep_share_its_write():
+    net = FakeNetwork(hosts=3, churn=0, new_rate=0, time_scale=0)  # 4 alerts: below the coalescing threshold
+    answering = [host[0] for host in net._hosts.values()]
+    sniffed = _Sightings()
+    # one host the sweep also finds, one that stays quiet on ARP
+    sniffed.pending = {answering[0]: ("10.0.0.200", None), "02:00:00:00:00:99": ("10.0.0.99", None)}
+    engine = ScanEngine(fingerprint=False, sniffer=sniffed)
+    with net.patch():
+        asyncio.run(engine.sweep_once())
+
+        new = [a["mac"] for a in get_alerts() if a["type"] == "new_device"]
+        assert sorted(new) == sorted(answering + ["02:00:00:00:00:99"])  # one alert each
+        assert get_all_devices()["02:00:00:00:00:99"]["online"] == 1  # not marked offline by the sweep
+
+        sniffed.pending = {"02:00:00:00:00:99": ("10.0.0.99", "phone")}
+        timings = asyncio.run(engine.run_cycle("passive"))
+    assert timings["hosts_answered"] == 1 and timings["alerts"] == 0
+    assert get_all_devices()["02:00:00:00:00:99"]["hostname"] == "phone"
+    assert engine.metrics()["cycles"] == {"full": 1, "passive": 1}
+    sniffed.pending = {"02:00:00:00:00:98": ("10.0.0.98", None)}
+    assert 0 < engine._passive_due() <= engine.passive_interval  # written at most once per interval
+
+
+def test_full_queue_drops_instead_of_blocking():
+    sniffer = PassiveSniffer(queue_size=5)
+    pkt = Ether() / ARP(op=2, hwsrc="aa:bb:cc:00:00:01", psrc="192.168.0.10")
+    for _ in range(20):
+        sniffer._on_packet(pkt)
+    metrics = sniffer.metrics()
+    assert metrics["queue_depth"] == 5
+    assert metrics["dropped"] == 15
+    assert metrics["max_queue_depth"] == 5
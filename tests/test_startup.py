@@ -0,0 +1,13 @@
+import os
+
+from benchmarks.bench_startup import measure
+
+CHECKED_IN_DB = os.path.join(os.path.dirname(__file__), "..", "backend", "app", "devices.db")
+
+
+def test_importing_the_app_is_cheap_and_has_no_side_effects():
+    before = os.stat(CHECKED_IN_DB).st_mtime_ns
+    _, heavy = measure()
+    assert heavy == []  # scapy, manuf, ping3, requests and psutil wait until they are used
+    assert os.stat(CHECKED_IN_DB).st_mtime_ns == before  # init_db runs in the lifespan
+
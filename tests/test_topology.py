@@ -0,0 +1,78 @@
+from backend.app.services.topology import TopologyModel
+
+
+def _dev(i, online=1, ip=None):
+    return {"mac": f"aa:aa:aa:aa:aa:{i:02x}", "ip": ip or f"10.0.0.{i}", "online": online,
+            "name": None, "hostname": None, "vendor": None}
+
+
+def _positions(model):
+    return {n["mac"]: (n["x"], n["y"]) for n in model.full()["nodes"] if n["mac"]}
+
+
+def test_positions_are_stable_and_grouped():
+    model = TopologyModel("10.0.0.254")
+    model.apply([_dev(i) for i in range(1, 11)])
+    before = _positions(model)
+
+    model.apply([_dev(i) for i in range(1, 31)] + [_dev(99, ip="10.0.5.7")])
+    after = _positions(model)
+    assert all(after[mac] == pos for mac, pos in before.items())
+    assert len(set(after.values())) == len(after)
+
+    groups = {g["id"]: g for g in model.full()["groups"]}
+    assert groups["10.0.0.0/24"]["count"] == 30
+    assert groups["10.0.5.0/24"]["count"] == 1
+    gateway = [n for n in model.full()["nodes"] if n["is_gateway"]]
+    assert gateway[0]["id"] == "10.0.0.254" and (gateway[0]["x"], gateway[0]["y"]) == (0.0, 0.0)
+
+
+def test_churned_macs_give_their_slots_back():
+    model = TopologyModel("10.0.0.254")
+    keep = _dev(1)
+    for round in range(50):  # randomised MACs: a new set of 20 every sweep
+        model.apply([keep] + [{**_dev(i + 2), "mac": f"02:00:00:00:{round:02x}:{i:02x}"} for i in range(20)])
+        if round == 0:
+            first = _positions(model)[keep["mac"]]
+
+    assert len(model._layout._slots) == 21
+    assert _positions(model)[keep["mac"]] == first
+    group = next(g for g in model.full()["groups"] if g["id"] == "10.0.0.0/24")
+    assert group["count"] == 21
+    assert model._layout.slots("10.0.0.0/24") <= 2 * 21  # slots freed in one build are reused in the next
+
+
+def test_version_only_moves_on_real_changes():
+    model = TopologyModel("10.0.0.254")
+    assert model.apply([_dev(1), _dev(2)])
+    body, etag = model.body()
+    assert not model.apply([_dev(1), _dev(2)])
+    assert model.body() == (body, etag)
+
+
+def test_diff_nets_out_changes_across_versions():
+    model = TopologyModel("10.0.0.254")
+    model.apply([_dev(1), _dev(2), _dev(3)])
+    since = model.version_id
+    model.apply([_dev(1, online=0), _dev(2), _dev(3), _dev(4)])
+    model.apply([_dev(1, online=0), _dev(3), _dev(4), _dev(5)])
+    model.apply([_dev(1, online=0), _dev(3), _dev(4)])  # 5 came and went
+
+    diff = model.diff(since)
+    assert [n["mac"] for n in diff["nodes"]["added"]] == ["aa:aa:aa:aa:aa:04"]
+    assert [n["mac"] for n in diff["nodes"]["changed"]] == ["aa:aa:aa:aa:aa:01"]
+    assert diff["nodes"]["removed"] == ["10.0.0.2"]
+    assert diff["links"]["added"] == [{"source": "10.0.0.254", "target": "10.0.0.4"}]
+    assert diff["links"]["removed"] == [{"source": "10.0.0.254", "target": "10.0.0.2"}]
+
+    assert model.diff(model.version_id)["nodes"] == {"added": [], "changed": [], "removed": []}
+    assert model.diff("deadbeef-1") is None
+    assert model.diff(f"{model.epoch}-{model.version + 1}") is None
+
+
+def test_diff_needs_history():
+    model = TopologyModel("10.0.0.254", history=2)
+    for i in range(1, 6):
+        model.apply([_dev(j) for j in range(1, i + 1)])
+    assert model.diff(f"{model.epoch}-1") is None
+    assert model.diff(f"{model.epoch}-3") is not None
@@ -0,0 +1,50 @@
+import time
+from unittest.mock import patch, MagicMock
+
+import requests
+
+from backend.app import database
+from backend.app.services.vendor import VendorResolver
+
+
+def test_offline_index_resolves_without_network():
+    resolver = VendorResolver(remote=False)
+    macs = [f"00:1b:63:{i >> 8 & 0xFF:02x}:{i & 0xFF:02x}:01" for i in range(1000)]
+
+    with patch("backend.app.services.vendor._http_get") as mock_get:
+        started = time.perf_counter()
+        vendors = {resolver.resolve(mac) for mac in macs}
+        elapsed = time.perf_counter() - started
+
+    mock_get.assert_not_called()
+    assert vendors == {"Apple, Inc."}
+    assert elapsed < 0.5
+
+
+def test_most_specific_prefix_wins():
+    resolver = VendorResolver(remote=False)
+
+    assert resolver.resolve("00:1b:c5:00:10:05") == "OpenRB.com, Direct SIA"
+
+
+def test_remote_misses_are_negative_cached_and_persisted():
+    resolver = VendorResolver(remote=True)
+    unknown = "fc:ff:ff:00:00:01"  # not in the manuf database
+    with patch("backend.app.services.vendor._http_get",
+               return_value=MagicMock(status_code=404)) as mock_get:
+        assert resolver.resolve(unknown) is None
+        assert resolver.resolve("fc:ff:ff:00:00:02") is None
+    assert mock_get.call_count == 1
+
+    resolver.flush()
+    assert [row[:2] for row in database.get_vendor_cache()] == [("fc:ff:ff", None)]
+
+
+def test_transport_errors_back_off_remote():
+    resolver = VendorResolver(remote=True)
+    with patch("backend.app.services.vendor._http_get",
+               side_effect=requests.ConnectionError) as mock_get:
+        assert resolver.resolve("fc:ff:ff:00:00:01") is None
+        assert resolver.resolve("fc:ff:fe:00:00:01") is None
+    assert mock_get.call_count == 1
+    assert database.get_vendor_cache() == []